@@ -0,0 +1,258 @@
+# --------------------------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------------------------
+from plantuml_validator import ValidationSeverity, has_errors, validate_plantuml_code
+from render_backend import RenderBackend, RenderBackendType, RenderError, HttpRenderBackend
+from render_backend import PLANTUML_JAR, PLANTUML_PORT, create_render_backend
+from render_cache import RenderCache
+
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+# --------------------------------------------------------------------------------------------------
+# Constants
+# --------------------------------------------------------------------------------------------------
+
+BATCH_RENDER_JOBS = 4
+PLANTUML_FILE_EXTENSION = ".puml"
+MANIFEST_FILE_NAME = ".batch_render_manifest.json"
+IMAGE_FORMATS = ["png", "svg"]
+
+# --------------------------------------------------------------------------------------------------
+# Enums
+# --------------------------------------------------------------------------------------------------
+
+class BatchRenderStatus(Enum):
+    RENDERED = "rendered"
+    UNCHANGED = "unchanged"
+    INVALID = "invalid"
+    FAILED = "failed"
+
+# --------------------------------------------------------------------------------------------------
+# BatchRenderResult
+# --------------------------------------------------------------------------------------------------
+
+class BatchRenderResult:
+
+    # ----------------------------------------------------------------------------------------------
+    def __init__(self, path: str, status: BatchRenderStatus, duration: float, message: str = ""):
+        self.path = path
+        self.status = status
+        self.duration = duration
+        self.message = message
+
+    # ----------------------------------------------------------------------------------------------
+    def __str__(self) -> str:
+        message = f"  {self.message}" if self.message else ""
+        return f"{self.status.name:<9} {self.duration * 1000:8.1f} ms  {self.path}{message}"
+
+# --------------------------------------------------------------------------------------------------
+# BatchRenderer
+# --------------------------------------------------------------------------------------------------
+
+class BatchRenderer:
+
+    # ----------------------------------------------------------------------------------------------
+    # Renders PlantUML files with one shared render backend. A file is skipped when the hash of its
+    # code, the backend and the image format is the one in the manifest and its image still exists.
+    # ----------------------------------------------------------------------------------------------
+
+    def __init__(self,
+                 render_backend: RenderBackend,
+                 output_directory: str | None = None,
+                 manifest_path: str | None = None,
+                 validate: bool = True,
+                 force: bool = False):
+        self.render_backend = render_backend
+        self.image_format = render_backend.image_format
+        self.output_directory = output_directory
+        self.manifest_path = manifest_path or os.path.join(output_directory or ".", MANIFEST_FILE_NAME)
+        self.validate = validate
+        self.force = force
+        self.manifest = self.read_manifest()
+
+    # ----------------------------------------------------------------------------------------------
+    def read_manifest(self) -> dict:
+        try:
+            with open(self.manifest_path, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    # ----------------------------------------------------------------------------------------------
+    def write_manifest(self):
+        directory = os.path.dirname(self.manifest_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w") as file:
+            json.dump(self.manifest, file, indent=2, sort_keys=True)
+        os.replace(temporary_path, self.manifest_path)
+
+    # ----------------------------------------------------------------------------------------------
+    def get_output_path(self, path: str, root_directory: str) -> str:
+        image_name = os.path.splitext(os.path.relpath(path, root_directory))[0] + "." + self.image_format
+        if self.output_directory is None:
+            return os.path.join(root_directory, image_name)
+        return os.path.join(self.output_directory, image_name)
+
+    # ----------------------------------------------------------------------------------------------
+    def render_files(self, paths: list[str], jobs: int = BATCH_RENDER_JOBS) -> list[BatchRenderResult]:
+        if not paths:
+            return []
+        root_directory = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in paths])
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(self.render_file, path, root_directory) for path in paths]
+            results = []
+            for future in futures:
+                result = future.result()
+                print(result)
+                results.append(result)
+        self.prune_manifest()
+        self.write_manifest()
+        return results
+
+    # ----------------------------------------------------------------------------------------------
+    def prune_manifest(self):
+        # Files that were deleted or renamed keep no entry, so the manifest does not grow. The entries
+        # of files that are merely not among the inputs of this run are kept for the other runs.
+        for manifest_key in list(self.manifest):
+            if not os.path.exists(manifest_key):
+                del self.manifest[manifest_key]
+
+    # ----------------------------------------------------------------------------------------------
+    def render_file(self, path: str, root_directory: str) -> BatchRenderResult:
+        start_time = time.perf_counter()
+        try:
+            with open(path, "r") as file:
+                plantuml_code = file.read()
+        except OSError as e:
+            return BatchRenderResult(path, BatchRenderStatus.FAILED, time.perf_counter() - start_time, str(e))
+
+        manifest_key = os.path.abspath(path)
+        output_path = self.get_output_path(manifest_key, root_directory)
+        code_hash = RenderCache.get_key(plantuml_code, self.render_backend.get_cache_namespace(), self.image_format)
+        manifest_entry = self.manifest.get(manifest_key)
+        if (not self.force and manifest_entry is not None and manifest_entry["hash"] == code_hash
+                and manifest_entry["output"] == output_path and os.path.exists(output_path)):
+            return BatchRenderResult(path, BatchRenderStatus.UNCHANGED, time.perf_counter() - start_time)
+
+        if self.validate:
+            _, issues = validate_plantuml_code(plantuml_code)
+            if has_errors(issues):
+                errors = [str(issue) for issue in issues if issue.severity == ValidationSeverity.ERROR]
+                return BatchRenderResult(path, BatchRenderStatus.INVALID, time.perf_counter() - start_time,
+                                         "; ".join(errors))
+
+        try:
+            raw_image_data = self.render_backend.render(plantuml_code)
+        except RenderError as e:
+            return BatchRenderResult(path, BatchRenderStatus.FAILED, time.perf_counter() - start_time, str(e))
+
+        try:
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            with open(output_path, "wb") as file:
+                file.write(raw_image_data)
+        except OSError as e:
+            return BatchRenderResult(path, BatchRenderStatus.FAILED, time.perf_counter() - start_time, str(e))
+
+        # Every file has its own key, so the worker threads never update the same entry.
+        self.manifest[manifest_key] = {"hash": code_hash, "output": output_path}
+        return BatchRenderResult(path, BatchRenderStatus.RENDERED, time.perf_counter() - start_time)
+
+# --------------------------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------------------------
+
+def find_plantuml_files(inputs: list[str]) -> tuple[list[str], list[str]]:
+    # The files, and the inputs that matched no file, e.g. a mistyped path or an empty directory.
+    paths = []
+    unmatched_inputs = []
+    for input_path in inputs:
+        if os.path.isdir(input_path):
+            input_paths = [os.path.join(directory, file_name)
+                           for directory, _, file_names in os.walk(input_path)
+                           for file_name in file_names if file_name.endswith(PLANTUML_FILE_EXTENSION)]
+        else:
+            input_paths = glob.glob(input_path, recursive=True)
+        if not input_paths:
+            unmatched_inputs.append(input_path)
+        paths.extend(input_paths)
+    # A file that is matched by several inputs is only rendered once.
+    return sorted(set(paths)), unmatched_inputs
+
+# --------------------------------------------------------------------------------------------------
+def print_summary(results: list[BatchRenderResult], duration: float):
+    counts = {status: 0 for status in BatchRenderStatus}
+    for result in results:
+        counts[result.status] += 1
+    summary = ", ".join(f"{count} {status.value}" for status, count in counts.items())
+    print(f"{len(results)} files in {duration:.2f} s: {summary}")
+    rendered = [result for result in results if result.status == BatchRenderStatus.RENDERED]
+    if rendered:
+        slowest = max(rendered, key=lambda result: result.duration)
+        average = sum(result.duration for result in rendered) / len(rendered)
+        print(f"render time: average {average * 1000:.1f} ms, slowest {slowest.duration * 1000:.1f} ms ({slowest.path})")
+
+# --------------------------------------------------------------------------------------------------
+def create_arguments_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Validate and render PlantUML state diagrams.")
+    parser.add_argument("inputs", nargs="+", help="directories or glob patterns of .puml files")
+    parser.add_argument("-f", "--format", choices=IMAGE_FORMATS, default="png", help="image format")
+    parser.add_argument("-o", "--output-directory", help="directory of the images, next to the files by default")
+    parser.add_argument("-j", "--jobs", type=int, default=BATCH_RENDER_JOBS, help="number of files rendered at once")
+    parser.add_argument("--manifest", help=f"path of the manifest, {MANIFEST_FILE_NAME} by default")
+    parser.add_argument("--force", action="store_true", help="also render the files that have not changed")
+    parser.add_argument("--no-validate", action="store_true", help="do not validate the files before rendering")
+    backend = parser.add_mutually_exclusive_group()
+    backend.add_argument("--server", help="URL of a running PlantUML server, e.g. http://localhost:8080/plantuml")
+    backend.add_argument("--pipe", action="store_true", help="render with PlantUML pipe processes instead of a server")
+    parser.add_argument("--port", type=int, default=PLANTUML_PORT, help="port of the local PlantUML server")
+    parser.add_argument("--jar", default=PLANTUML_JAR, help="path of plantuml.jar")
+    return parser
+
+# --------------------------------------------------------------------------------------------------
+def main(arguments: list[str] | None = None) -> int:
+    options = create_arguments_parser().parse_args(arguments)
+    paths, unmatched_inputs = find_plantuml_files(options.inputs)
+    for input_path in unmatched_inputs:
+        print(f"WARNING: no files matched '{input_path}'")
+    if not paths:
+        print("ERROR: no PlantUML files found")
+        return 1
+
+    if options.server:
+        render_backend, plantuml_server = HttpRenderBackend(f"{options.server.rstrip('/')}/{options.format}/"), None
+    else:
+        # The images are written as they are, so SVG needs no rasterization and no fallback to PNG.
+        render_backend_type = RenderBackendType.PIPE if options.pipe else RenderBackendType.HTTP
+        render_backend, plantuml_server = create_render_backend(render_backend_type, options.jobs, options.format,
+                                                                options.port, options.jar)
+        if plantuml_server is not None and not plantuml_server.is_ready():
+            render_backend.close()
+            plantuml_server.stop()
+            return 1
+
+    start_time = time.perf_counter()
+    try:
+        batch_renderer = BatchRenderer(render_backend, options.output_directory, options.manifest,
+                                       validate=not options.no_validate, force=options.force)
+        results = batch_renderer.render_files(paths, options.jobs)
+    finally:
+        render_backend.close()
+        if plantuml_server is not None:
+            plantuml_server.stop()
+    print_summary(results, time.perf_counter() - start_time)
+
+    failed = [result for result in results if result.status in (BatchRenderStatus.INVALID, BatchRenderStatus.FAILED)]
+    return 1 if failed or unmatched_inputs else 0
+
+# --------------------------------------------------------------------------------------------------
+if __name__ == "__main__":
+    sys.exit(main())
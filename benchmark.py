@@ -0,0 +1,215 @@
+# --------------------------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------------------------
+from diagram_generator import generate_plantuml_code
+from elements import CodeType
+from plantuml_manager import PlantUMLManager, EditActionType
+from render_backend import RenderBackend, RenderBackendType
+
+from PIL import Image, ImageDraw
+import argparse
+import io
+import json
+import math
+import random
+import re
+import statistics
+import sys
+import time
+
+# --------------------------------------------------------------------------------------------------
+# Constants
+# --------------------------------------------------------------------------------------------------
+
+BENCHMARK_SIZES = [10, 50, 200, 1000]
+BENCHMARK_REPEAT = 5
+BENCHMARK_HIT_TESTS = 1000
+BENCHMARK_HISTORY_EDITS = 20
+
+# The layout of the stub images: every element gets a block in a grid.
+STUB_BLOCK_SIZE = 24
+STUB_BLOCK_SPACING = 8
+STUB_COLUMNS = 20
+
+MASK_COLOR_PATTERN = re.compile(r'#([0-9A-F]{6})[;,]')
+
+# --------------------------------------------------------------------------------------------------
+# StubRenderBackend
+# --------------------------------------------------------------------------------------------------
+
+class StubRenderBackend(RenderBackend):
+
+    # ----------------------------------------------------------------------------------------------
+    # Renders without Java: every mask colour in the code becomes a block of that colour, so that
+    # the MASKED images can be indexed and hit-tested like real ones. Other code renders white.
+    # ----------------------------------------------------------------------------------------------
+
+    def __init__(self, delay: float = 0.0):
+        super().__init__("png")
+        self.delay = delay
+        self.render_count = 0
+
+    # ----------------------------------------------------------------------------------------------
+    def get_cache_namespace(self) -> str:
+        return "stub"
+
+    # ----------------------------------------------------------------------------------------------
+    def render(self, code: str) -> bytes:
+        self.render_count += 1
+        if self.delay:
+            time.sleep(self.delay)
+        element_count = code.count("\nstate ") + code.count(" -")
+        image = Image.new("RGB", get_stub_image_size(element_count), "white")
+        if "FontColor #00000000" in code:
+            draw = ImageDraw.Draw(image)
+            for index, color in enumerate(MASK_COLOR_PATTERN.findall(code)):
+                x, y = get_stub_block_position(index)
+                draw.rectangle((x, y, x + STUB_BLOCK_SIZE - 1, y + STUB_BLOCK_SIZE - 1), fill=f"#{color}")
+        output = io.BytesIO()
+        image.save(output, "PNG")
+        return output.getvalue()
+
+# --------------------------------------------------------------------------------------------------
+# BenchmarkManager
+# --------------------------------------------------------------------------------------------------
+
+class BenchmarkManager(PlantUMLManager):
+
+    # ----------------------------------------------------------------------------------------------
+    def __init__(self, render_backend: RenderBackend | None = None, **arguments):
+        self.stub_render_backend = render_backend
+        super().__init__(**arguments)
+
+    # ----------------------------------------------------------------------------------------------
+    def create_render_backend(self, render_backend_type: RenderBackendType, render_concurrency: int) -> RenderBackend:
+        if self.stub_render_backend is not None:
+            return self.stub_render_backend
+        return super().create_render_backend(render_backend_type, render_concurrency)
+
+# --------------------------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------------------------
+
+def get_stub_block_position(index: int) -> tuple[int, int]:
+    step = STUB_BLOCK_SIZE + STUB_BLOCK_SPACING
+    return STUB_BLOCK_SPACING + (index % STUB_COLUMNS) * step, STUB_BLOCK_SPACING + (index // STUB_COLUMNS) * step
+
+# --------------------------------------------------------------------------------------------------
+def get_stub_image_size(element_count: int) -> tuple[int, int]:
+    step = STUB_BLOCK_SIZE + STUB_BLOCK_SPACING
+    rows = max(math.ceil(element_count / STUB_COLUMNS), 1)
+    return STUB_BLOCK_SPACING + STUB_COLUMNS * step, STUB_BLOCK_SPACING + rows * step
+
+# --------------------------------------------------------------------------------------------------
+def measure(function, repeat: int) -> list[float]:
+    durations = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start_time)
+    return durations
+
+# --------------------------------------------------------------------------------------------------
+def get_statistics(durations: list[float], operations: int = 1) -> dict:
+    # Times in milliseconds per operation.
+    return {
+        "median": statistics.median(durations) * 1000 / operations,
+        "minimum": min(durations) * 1000 / operations,
+        "maximum": max(durations) * 1000 / operations,
+    }
+
+# --------------------------------------------------------------------------------------------------
+def get_diagram_code(size: int, seed: int) -> str:
+    # The other counts scale with the number of states, like in a typical component.
+    return generate_plantuml_code(state_count=size,
+                                  choice_point_count=max(size // 5, 1),
+                                  interface_count=max(size // 10, 1),
+                                  message_count=max(size // 2, 1),
+                                  seed=seed)
+
+# --------------------------------------------------------------------------------------------------
+def run_size(plantuml_manager: PlantUMLManager, size: int, repeat: int, seed: int) -> dict:
+    plantuml_code = get_diagram_code(size, seed)
+    results = {}
+
+    results["set_elements"] = get_statistics(measure(lambda: plantuml_manager.set_elements(plantuml_code), repeat))
+
+    def generate_code():
+        plantuml_manager.invalidate_plantuml_code()
+        plantuml_manager.get_plantuml_code(CodeType.STANDARD)
+    results["get_plantuml_code"] = get_statistics(measure(generate_code, repeat))
+    results["get_plantuml_code_cached"] = get_statistics(
+        measure(lambda: plantuml_manager.get_plantuml_code(CodeType.STANDARD), repeat))
+
+    def update_diagrams():
+        # Without the render cache every update renders, like an edit does.
+        plantuml_manager.render_cache.clear()
+        plantuml_manager.update_diagrams(EditActionType.VISUAL)
+    results["update_diagrams"] = get_statistics(measure(update_diagrams, repeat))
+
+    def build_selection_index():
+        plantuml_manager.selection_index_source = None
+        plantuml_manager.get_selection_index()
+    results["get_selection_index"] = get_statistics(measure(build_selection_index, repeat))
+
+    width, height = plantuml_manager.selection_mask_diagram.rendered_image.size
+    randomizer = random.Random(seed)
+    points = [(randomizer.randrange(width), randomizer.randrange(height)) for _ in range(BENCHMARK_HIT_TESTS)]
+    def hit_test():
+        for x, y in points:
+            plantuml_manager.get_element_at_coordinates(x, y)
+    results["get_element_at_coordinates"] = get_statistics(measure(hit_test, repeat), len(points))
+
+    for index in range(BENCHMARK_HISTORY_EDITS):
+        plantuml_manager.add_state(f"Edit{index}")
+        plantuml_manager.update_diagrams(EditActionType.NON_VISUAL)
+    def undo_redo():
+        plantuml_manager.undo()
+        plantuml_manager.redo()
+    results["undo_redo"] = get_statistics(measure(undo_redo, repeat))
+    return results
+
+# --------------------------------------------------------------------------------------------------
+def print_results(all_results: dict):
+    operations = list(next(iter(all_results.values())))
+    sizes = list(all_results)
+    print(f"{'operation (median ms)':<30}" + "".join(f"{size:>12}" for size in sizes))
+    for operation in operations:
+        print(f"{operation:<30}" + "".join(f"{all_results[size][operation]['median']:>12.3f}" for size in sizes))
+
+# --------------------------------------------------------------------------------------------------
+def main(arguments: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Time the hot paths of the PlantUMLManager.")
+    parser.add_argument("-s", "--sizes", type=int, nargs="+", default=BENCHMARK_SIZES, help="numbers of states")
+    parser.add_argument("-r", "--repeat", type=int, default=BENCHMARK_REPEAT, help="repetitions per operation")
+    parser.add_argument("--backend", choices=["stub", "http", "pipe"], default="stub",
+                        help="render backend; the stub renders without Java")
+    parser.add_argument("--render-delay", type=float, default=0.0, help="seconds that the stub takes per render")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the generated diagrams")
+    parser.add_argument("-o", "--output", help="JSON file to write the results to")
+    options = parser.parse_args(arguments)
+
+    match options.backend:
+        case "stub":
+            plantuml_manager = BenchmarkManager(StubRenderBackend(options.render_delay))
+        case "http":
+            plantuml_manager = BenchmarkManager(render_backend_type=RenderBackendType.HTTP)
+        case "pipe":
+            plantuml_manager = BenchmarkManager(render_backend_type=RenderBackendType.PIPE)
+
+    all_results = {}
+    try:
+        for size in options.sizes:
+            all_results[size] = run_size(plantuml_manager, size, options.repeat, options.seed)
+    finally:
+        plantuml_manager.cleanup()
+
+    print_results(all_results)
+    if options.output:
+        with open(options.output, "w") as file:
+            json.dump({"backend": options.backend, "results": all_results}, file, indent=2)
+    return 0
+
+# --------------------------------------------------------------------------------------------------
+if __name__ == "__main__":
+    sys.exit(main())
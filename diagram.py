@@ -1,7 +1,11 @@
-from plantuml import PlantUML
 from PIL import Image
 import io
 
+from render_backend import RenderBackend, HttpRenderBackend, RenderError
+from render_cache import RenderCache
+from svg_geometry import SvgGeometry, SVG_GEOMETRY_INFO_KEY, rasterize_svg
+from tracing import span, count
+
 # Constants
 DEFAULT_PLANTUML_CODE = """
 @startuml
@@ -12,32 +16,85 @@ DEFAULT_PLANTUML_CODE = """
 # Diagram class
 # -----------------------------------------------------------------------------
 class Diagram:
-    def __init__(self, plantuml_endpoint: str):
-        self.plantuml_client = PlantUML(url=plantuml_endpoint)
+    def __init__(self,
+                 plantuml_endpoint: str | None = None,
+                 render_cache: RenderCache | None = None,
+                 render_backend: RenderBackend | None = None):
+        if render_backend is None:
+            render_backend = HttpRenderBackend(plantuml_endpoint)
+        self.render_backend = render_backend
+        self.image_format = render_backend.image_format
+        self.render_cache = render_cache
         self.plantuml_code = DEFAULT_PLANTUML_CODE
+        self.render_error = None
+        self.svg_geometry = None
         self.rendered_image = self.render_image(self.plantuml_code)
     # -------------------------------------------------------------------------
-    def render_image(self, code: str) -> Image.Image | None:
-        
-        succeeded = False
-
-        while not succeeded:
-            try:
-                raw_image_data = self.plantuml_client.processes(code)
-                succeeded = True
-                return Image.open(io.BytesIO(raw_image_data))
-            except Exception as e:
-                if e.args[0] == 54:
-                    print("PlantUML server is busy, retrying...")
-                else:
-                    print(f"ERROR: failed rendering image: {e}\nCode: {code}")
-                    return None
-        
+    def render_image(self, code: str, cached_only: bool = False) -> Image.Image | None:
+        raw_image_data = self.render_raw_image_data(code, cached_only)
+        if raw_image_data is None:
+            return None
+        if self.image_format == "svg":
+            return self.render_svg_image(raw_image_data)
+        # Image.open() only reads the header; load() decodes here, on the rendering thread.
+        with span("diagram.decode", "render"):
+            image = Image.open(io.BytesIO(raw_image_data))
+            image.load()
+        return image
+
+    # -------------------------------------------------------------------------
+    def render_svg_image(self, svg_data: bytes) -> Image.Image | None:
+        # The geometry travels with the image, so that both are committed together.
+        try:
+            with span("diagram.svg_geometry", "render"):
+                geometry = SvgGeometry.from_svg(svg_data)
+            with span("diagram.rasterize_svg", "render"):
+                image = rasterize_svg(svg_data)
+        except (ValueError, RuntimeError) as e:
+            self.render_error = RenderError(e)
+            return None
+        image.info[SVG_GEOMETRY_INFO_KEY] = geometry
+        return image
+
+    # -------------------------------------------------------------------------
+    def render_raw_image_data(self, code: str, cached_only: bool = False) -> bytes | None:
+        # With cached_only a cache miss returns None without rendering; it is not an error.
+        self.render_error = None
+        if self.render_cache is not None:
+            cache_key = RenderCache.get_key(code,
+                                            self.render_backend.get_cache_namespace(),
+                                            self.image_format)
+            raw_image_data = self.render_cache.get(cache_key)
+            if raw_image_data is not None:
+                count("diagram.render_cache_hits")
+                return raw_image_data
+        if cached_only:
+            return None
+
+        # A failed render leaves the error for the caller, which decides how to degrade.
+        try:
+            with span("diagram.render_request", "render"):
+                raw_image_data = self.render_backend.render(code)
+        except RenderError as e:
+            count("diagram.render_errors")
+            self.render_error = e
+            return None
+        count("diagram.render_requests")
+
+        if self.render_cache is not None:
+            self.render_cache.put(cache_key, raw_image_data)
+        return raw_image_data
+
     # -------------------------------------------------------------------------
     def set_plantuml_code(self, code: str) -> bool:
         temp_rendered_image = self.render_image(code)
         if not temp_rendered_image:
             return False
+        self.set_rendered_image(code, temp_rendered_image)
+        return True
+
+    # -------------------------------------------------------------------------
+    def set_rendered_image(self, code: str, rendered_image: Image.Image):
         self.plantuml_code = code
-        self.rendered_image = temp_rendered_image
-        return True
\ No newline at end of file
+        self.rendered_image = rendered_image
+        self.svg_geometry = rendered_image.info.get(SVG_GEOMETRY_INFO_KEY)
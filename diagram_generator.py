@@ -0,0 +1,100 @@
+# --------------------------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------------------------
+from elements import Interface, Message, State, ChoicePoint, Transition, ConnectorType
+from plantuml_manager import HEADER_PLANTUML_CODE, DEFAULT_INTERFACES_PLANTUML_CODE, DEFAULT_MESSAGES_PLANTUML_CODE
+from plantuml_manager import INTERFACES_PLANTUML_CODE, MESSAGES_PLANTUML_CODE, COMPONENT_PLANTUML_CODE
+from plantuml_manager import STATES_PLANTUML_CODE, CHOICE_POINTS_PLANTUML_CODE, TRANSITIONS_PLANTUML_CODE
+from plantuml_manager import FOOTER_PLANTUML_CODE
+
+import argparse
+import random
+import sys
+
+# --------------------------------------------------------------------------------------------------
+# Constants
+# --------------------------------------------------------------------------------------------------
+
+GENERATED_COMPONENT_NAME = "Generated Component"
+MAX_MESSAGES_PER_TRANSITION = 2
+
+# --------------------------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------------------------
+
+def generate_plantuml_code(state_count: int,
+                           choice_point_count: int = 0,
+                           interface_count: int = 1,
+                           message_count: int = 1,
+                           transition_count: int | None = None,
+                           seed: int = 0) -> str:
+    # The code has the exact section layout of diagrams/node.puml, i.e. of get_plantuml_code().
+    # Every choice-point is entered from a state and left with $Yes and $No; the other transitions
+    # connect random nodes. Without a transition_count every state gets about two transitions.
+    if state_count < 1:
+        raise ValueError("at least one state is needed")
+    randomizer = random.Random(seed)
+
+    interfaces = [Interface(f"Interface{index}") for index in range(interface_count)]
+    messages = [Message(f"Message{index}", interfaces[index % interface_count].name)
+                for index in range(message_count if interfaces else 0)]
+    states = [State(f"State{index}") for index in range(state_count)]
+    choice_points = [ChoicePoint(f"Check{index}", f"Check {index}?") for index in range(choice_point_count)]
+    message_variable_names = [f"${message.get_variable_name()}" for message in messages] or ["$Timeout"]
+
+    transitions = [Transition("START", states[0].get_variable_name(), ConnectorType.DOWN, 1)]
+    for choice_point in choice_points:
+        transitions.append(create_transition(randomizer, randomizer.choice(states), choice_point,
+                                             {randomizer.choice(message_variable_names)}))
+        transitions.append(create_transition(randomizer, choice_point, randomizer.choice(states), {"$Yes"}))
+        transitions.append(create_transition(randomizer, choice_point, randomizer.choice(states), {"$No"}))
+    if transition_count is None:
+        transition_count = len(transitions) + 2 * state_count
+    nodes = states + choice_points
+    while len(transitions) < transition_count:
+        message_number = randomizer.randint(1, MAX_MESSAGES_PER_TRANSITION)
+        transitions.append(create_transition(randomizer, randomizer.choice(states), randomizer.choice(nodes),
+                                             set(randomizer.sample(message_variable_names,
+                                                                   min(message_number, len(message_variable_names))))))
+    transitions = transitions[:max(transition_count, 1)]
+
+    return "\n".join([HEADER_PLANTUML_CODE + DEFAULT_INTERFACES_PLANTUML_CODE + DEFAULT_MESSAGES_PLANTUML_CODE,
+                      get_section_code(INTERFACES_PLANTUML_CODE, interfaces),
+                      get_section_code(MESSAGES_PLANTUML_CODE, messages),
+                      f"{COMPONENT_PLANTUML_CODE}state component as \"{GENERATED_COMPONENT_NAME}\" {{\n"
+                      f"state START <<start>> #000000\n",
+                      get_section_code(STATES_PLANTUML_CODE, states),
+                      get_section_code(CHOICE_POINTS_PLANTUML_CODE, choice_points),
+                      get_section_code(TRANSITIONS_PLANTUML_CODE, transitions),
+                      FOOTER_PLANTUML_CODE])
+
+# --------------------------------------------------------------------------------------------------
+def create_transition(randomizer: random.Random,
+                      source: State | ChoicePoint,
+                      target: State | ChoicePoint,
+                      messages: set[str]) -> Transition:
+    connector_type = randomizer.choice(list(ConnectorType))
+    # A sorted list instead of a set, so that the same seed always gives the same code.
+    return Transition(source.get_variable_name(), target.get_variable_name(), connector_type, 1, sorted(messages))
+
+# --------------------------------------------------------------------------------------------------
+def get_section_code(section_header: str, elements: list) -> str:
+    return "".join([section_header] + [f"{element.get_plantuml_code()}\n" for element in elements])
+
+# --------------------------------------------------------------------------------------------------
+def main(arguments: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate a synthetic PlantUML state diagram.")
+    parser.add_argument("states", type=int, help="number of states")
+    parser.add_argument("-c", "--choice-points", type=int, default=0, help="number of choice-points")
+    parser.add_argument("-i", "--interfaces", type=int, default=1, help="number of interfaces")
+    parser.add_argument("-m", "--messages", type=int, default=1, help="number of messages")
+    parser.add_argument("-t", "--transitions", type=int, help="number of transitions")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="seed of the random choices")
+    options = parser.parse_args(arguments)
+    sys.stdout.write(generate_plantuml_code(options.states, options.choice_points, options.interfaces,
+                                            options.messages, options.transitions, options.seed))
+    return 0
+
+# --------------------------------------------------------------------------------------------------
+if __name__ == "__main__":
+    sys.exit(main())
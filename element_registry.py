@@ -0,0 +1,168 @@
+# --------------------------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------------------------
+from elements import Element, ElementType, MASK_RESERVED_IDENTIFIERS
+
+# --------------------------------------------------------------------------------------------------
+# ElementRegistry
+# --------------------------------------------------------------------------------------------------
+
+class ElementRegistry:
+
+    # ----------------------------------------------------------------------------------------------
+    # Every element is indexed by its identifier. Interfaces, messages, states and choice-points are
+    # also indexed by their names, so that look-ups and duplicate checks do not scan the lists.
+    # Transitions are grouped by the variable names of their source, target and messages, so that
+    # the transitions touching a node cost time proportional to its degree.
+    # ----------------------------------------------------------------------------------------------
+
+    def __init__(self):
+        self.elements_by_identifier = {}
+        self.interfaces_by_name = {}
+        self.messages_by_key = {}
+        self.messages_by_variable_name = {}
+        self.states_by_variable_name = {}
+        self.choice_points_by_variable_name = {}
+        self.transitions_by_source = {}
+        self.transitions_by_target = {}
+        self.transitions_by_message = {}
+        self.next_identifier = 0
+
+    # ----------------------------------------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self.elements_by_identifier)
+
+    # ----------------------------------------------------------------------------------------------
+    def clear(self):
+        self.elements_by_identifier.clear()
+        self.interfaces_by_name.clear()
+        self.messages_by_key.clear()
+        self.messages_by_variable_name.clear()
+        self.states_by_variable_name.clear()
+        self.choice_points_by_variable_name.clear()
+        self.transitions_by_source.clear()
+        self.transitions_by_target.clear()
+        self.transitions_by_message.clear()
+        self.next_identifier = 0
+
+    # ----------------------------------------------------------------------------------------------
+    def get_elements(self) -> list[Element]:
+        return list(self.elements_by_identifier.values())
+
+    # ----------------------------------------------------------------------------------------------
+    def allocate_identifier(self) -> int:
+        while self.next_identifier in MASK_RESERVED_IDENTIFIERS:
+            self.next_identifier += 1
+        identifier = self.next_identifier
+        self.next_identifier += 1
+        return identifier
+
+    # ----------------------------------------------------------------------------------------------
+    def add(self, element: Element):
+        self.elements_by_identifier[element.identifier] = element
+        self.next_identifier = max(self.next_identifier, element.identifier + 1)
+        self.index_names(element)
+
+    # ----------------------------------------------------------------------------------------------
+    def remove(self, element: Element):
+        if self.elements_by_identifier.get(element.identifier) is element:
+            del self.elements_by_identifier[element.identifier]
+        self.unindex_names(element)
+
+    # ----------------------------------------------------------------------------------------------
+    def index_names(self, element: Element):
+        match element.element_type:
+            case ElementType.INTERFACE:
+                self.interfaces_by_name[element.name] = element
+            case ElementType.MESSAGE:
+                self.messages_by_key[(element.interface, element.name)] = element
+                self.messages_by_variable_name[element.get_variable_name()] = element
+            case ElementType.STATE:
+                self.states_by_variable_name[element.get_variable_name()] = element
+            case ElementType.CHOICE_POINT:
+                self.choice_points_by_variable_name[element.get_variable_name()] = element
+            case ElementType.TRANSITION:
+                self.transitions_by_source.setdefault(element.source, {})[element.identifier] = element
+                self.transitions_by_target.setdefault(element.target, {})[element.identifier] = element
+                for message_variable_name in element.messages:
+                    self.transitions_by_message.setdefault(message_variable_name.removeprefix("$"), {})[
+                        element.identifier] = element
+
+    # ----------------------------------------------------------------------------------------------
+    def unindex_names(self, element: Element):
+        # Only remove an entry that still refers to this element, not to a duplicate.
+        match element.element_type:
+            case ElementType.INTERFACE:
+                self.discard(self.interfaces_by_name, element.name, element)
+            case ElementType.MESSAGE:
+                self.discard(self.messages_by_key, (element.interface, element.name), element)
+                self.discard(self.messages_by_variable_name, element.get_variable_name(), element)
+            case ElementType.STATE:
+                self.discard(self.states_by_variable_name, element.get_variable_name(), element)
+            case ElementType.CHOICE_POINT:
+                self.discard(self.choice_points_by_variable_name, element.get_variable_name(), element)
+            case ElementType.TRANSITION:
+                self.discard_from_group(self.transitions_by_source, element.source, element)
+                self.discard_from_group(self.transitions_by_target, element.target, element)
+                for message_variable_name in element.messages:
+                    self.discard_from_group(self.transitions_by_message, message_variable_name.removeprefix("$"), element)
+
+    # ----------------------------------------------------------------------------------------------
+    @staticmethod
+    def discard(index: dict, key, element: Element):
+        if index.get(key) is element:
+            del index[key]
+
+    # ----------------------------------------------------------------------------------------------
+    @staticmethod
+    def discard_from_group(index: dict, key, element: Element):
+        group = index.get(key)
+        if group is None or group.get(element.identifier) is not element:
+            return
+        del group[element.identifier]
+        if not group:
+            del index[key]
+
+    # ----------------------------------------------------------------------------------------------
+    def get_element_by_identifier(self, identifier: int) -> Element | None:
+        return self.elements_by_identifier.get(identifier)
+
+    # ----------------------------------------------------------------------------------------------
+    def get_interface(self, name: str) -> Element | None:
+        return self.interfaces_by_name.get(name)
+
+    # ----------------------------------------------------------------------------------------------
+    def get_message(self, interface_name: str, message_name: str) -> Element | None:
+        return self.messages_by_key.get((interface_name, message_name))
+
+    # ----------------------------------------------------------------------------------------------
+    def get_message_by_variable_name(self, variable_name: str) -> Element | None:
+        # Transitions refer to messages by their PlantUML variable, which includes the "$".
+        return self.messages_by_variable_name.get(variable_name.removeprefix("$"))
+
+    # ----------------------------------------------------------------------------------------------
+    def get_state_by_variable_name(self, variable_name: str) -> Element | None:
+        return self.states_by_variable_name.get(variable_name)
+
+    # ----------------------------------------------------------------------------------------------
+    def get_choice_point_by_variable_name(self, variable_name: str) -> Element | None:
+        return self.choice_points_by_variable_name.get(variable_name)
+
+    # ----------------------------------------------------------------------------------------------
+    def get_transitions_from(self, variable_name: str) -> list[Element]:
+        return list(self.transitions_by_source.get(variable_name, {}).values())
+
+    # ----------------------------------------------------------------------------------------------
+    def get_transitions_to(self, variable_name: str) -> list[Element]:
+        return list(self.transitions_by_target.get(variable_name, {}).values())
+
+    # ----------------------------------------------------------------------------------------------
+    def get_transitions_touching(self, variable_name: str) -> list[Element]:
+        # A self-transition is both outgoing and incoming, but must only be returned once.
+        transitions = dict(self.transitions_by_source.get(variable_name, {}))
+        transitions.update(self.transitions_by_target.get(variable_name, {}))
+        return list(transitions.values())
+
+    # ----------------------------------------------------------------------------------------------
+    def get_transitions_with_message(self, variable_name: str) -> list[Element]:
+        return list(self.transitions_by_message.get(variable_name.removeprefix("$"), {}).values())
@@ -2,7 +2,9 @@
 # Imports
 # --------------------------------------------------------------------------------------------------
 from enum import Enum
+from typing import Iterable
 import re
+import sys
 
 # --------------------------------------------------------------------------------------------------
 # Enums
@@ -26,16 +28,111 @@ class CodeType(Enum):
     SELECTED = "Selected"
     MASKED = "Masked"
 
+# --------------------------------------------------------------------------------------------------
+# Mask colour encoding
+# --------------------------------------------------------------------------------------------------
+
+# Each channel only uses 32 evenly spaced levels, so a blended pixel can be recognised by its
+# distance to the nearest level. The identifiers are scattered over the codes with a modular
+# multiplication, so that neighbouring identifiers get very different colours. The modulus excludes
+# the code of white, which is reserved for the background.
+MASK_CHANNEL_BITS = 5
+MASK_CHANNEL_MAXIMUM = (1 << MASK_CHANNEL_BITS) - 1
+MASK_CODE_MODULUS = (1 << (3 * MASK_CHANNEL_BITS)) - 1
+MASK_CODE_MULTIPLIER = 9973
+MASK_CODE_INVERSE = pow(MASK_CODE_MULTIPLIER, -1, MASK_CODE_MODULUS)
+MASK_CHANNEL_TOLERANCE = 2
+
+# --------------------------------------------------------------------------------------------------
+def get_mask_level_value(level: int) -> int:
+    return (level * 255 + MASK_CHANNEL_MAXIMUM // 2) // MASK_CHANNEL_MAXIMUM
+
+# --------------------------------------------------------------------------------------------------
+def get_mask_value_level(value: int) -> int:
+    return (value * MASK_CHANNEL_MAXIMUM + 127) // 255
+
+# --------------------------------------------------------------------------------------------------
+def get_mask_color(identifier: int) -> str:
+    if not 0 <= identifier < MASK_CODE_MODULUS:
+        raise ValueError(f"Identifier {identifier} cannot be encoded in the selection mask")
+    code = identifier * MASK_CODE_MULTIPLIER % MASK_CODE_MODULUS
+    levels = [(code >> shift) & MASK_CHANNEL_MAXIMUM for shift in (2 * MASK_CHANNEL_BITS, MASK_CHANNEL_BITS, 0)]
+    return "".join(f"{get_mask_level_value(level):02X}" for level in levels)
+
+# --------------------------------------------------------------------------------------------------
+def get_mask_identifier(rgb_color: tuple) -> int | None:
+    code = 0
+    for value in rgb_color[:3]:
+        level = get_mask_value_level(value)
+        if abs(value - get_mask_level_value(level)) > MASK_CHANNEL_TOLERANCE:
+            return None
+        code = (code << MASK_CHANNEL_BITS) | level
+    if code == MASK_CODE_MODULUS:
+        return None
+    return code * MASK_CODE_INVERSE % MASK_CODE_MODULUS
+
+# PlantUML draws the lines and the fill of the component in its default colours, even in the mask.
+# The identifiers those colours decode to are never allocated, so such pixels are background.
+# Black is not reserved: it is the colour of identifier 0, the START state, which is black anyway.
+MASK_RESERVED_COLORS = [(0x18, 0x18, 0x18), (0x20, 0x20, 0x20), (0xF1, 0xF1, 0xF1), (0xFE, 0xFE, 0xCE)]
+MASK_RESERVED_IDENTIFIERS = frozenset(get_mask_identifier(rgb_color) for rgb_color in MASK_RESERVED_COLORS) - {None}
+
+# --------------------------------------------------------------------------------------------------
+# Names
+# --------------------------------------------------------------------------------------------------
+
+def intern_name(name: str | None) -> str | None:
+    # The same names occur in many elements and history entries; interned they are stored once.
+    return sys.intern(name) if isinstance(name, str) else name
+
+# --------------------------------------------------------------------------------------------------
+# Revisions
+# --------------------------------------------------------------------------------------------------
+
+# Every change of an attribute that appears in the code of an element bumps the revision of its
+# class, so that code that is cached per class of elements can tell that it is out of date, however
+# the element was changed.
+element_revisions = {}
+
+# --------------------------------------------------------------------------------------------------
+def get_element_revision(element_class: type) -> int:
+    return element_revisions.get(element_class, 0)
+
+# --------------------------------------------------------------------------------------------------
+def create_revised_attribute(slot) -> property:
+    # Reading goes straight to the slot; only writing costs the bump of the revision.
+    def set_value(element, value):
+        slot.__set__(element, value)
+        element_class = type(element)
+        element_revisions[element_class] = element_revisions.get(element_class, 0) + 1
+    return property(slot.__get__, set_value)
+
 # --------------------------------------------------------------------------------------------------
 # Base class
 # --------------------------------------------------------------------------------------------------
 class Element:
 
+    __slots__ = ("element_type", "identifier")
+
+    PLANTUML_CODE_PATTERN = None
+
     # ----------------------------------------------------------------------------------------------
     def __init__(self, element_type: ElementType, identifier: int):
         self.element_type = element_type
         self.identifier = identifier
 
+    # ----------------------------------------------------------------------------------------------
+    # A slot that starts with an underscore gets a public property of the same name that bumps the
+    # revision of the class when it is set. The constructors set the slots themselves, so making
+    # many elements, e.g. when parsing, costs nothing extra.
+    # ----------------------------------------------------------------------------------------------
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for slot_name in cls.__dict__.get("__slots__", ()):
+            if slot_name.startswith("_"):
+                setattr(cls, slot_name[1:], create_revised_attribute(cls.__dict__[slot_name]))
+
     # ----------------------------------------------------------------------------------------------
     def get_plantuml_code(self, code_type: CodeType = CodeType.STANDARD) -> str:
         raise NotImplementedError
@@ -49,8 +146,39 @@ class Element:
         raise NotImplementedError
 
     # ----------------------------------------------------------------------------------------------
+    # Every subclass has a compiled PLANTUML_CODE_PATTERN that matches one line of its section, so
+    # that a whole section can be parsed in one finditer() sweep instead of line by line.
+    # ----------------------------------------------------------------------------------------------
+
     @classmethod
     def from_plantuml_code(cls, plantuml_code: str):
+        match = cls.PLANTUML_CODE_PATTERN.match(plantuml_code)
+        if match is None:
+            raise ValueError(f"no {cls.__name__.lower()} in '{plantuml_code}'")
+        return cls.from_match(match)
+
+    # ----------------------------------------------------------------------------------------------
+    @classmethod
+    def from_plantuml_section(cls, plantuml_code: str) -> list[tuple[int, "Element"]]:
+        # The elements with the 0-based index of their line; lines that do not match are left out.
+        # The patterns end at the end of a line, so the lines in between only need to be counted when
+        # a match does not start on the next line.
+        elements = []
+        from_match = cls.from_match
+        line_index = 0
+        next_line_start = 0
+        for match in cls.PLANTUML_CODE_PATTERN.finditer(plantuml_code):
+            start = match.start()
+            if start != next_line_start:
+                line_index += plantuml_code.count("\n", next_line_start, start)
+            elements.append((line_index, from_match(match)))
+            line_index += 1
+            next_line_start = match.end() + 1
+        return elements
+
+    # ----------------------------------------------------------------------------------------------
+    @classmethod
+    def from_match(cls, match: re.Match):
         raise NotImplementedError
 
 # --------------------------------------------------------------------------------------------------
@@ -58,10 +186,15 @@ class Element:
 # --------------------------------------------------------------------------------------------------
 class Interface(Element):
 
+    __slots__ = ("_name",)
+
+    # For example: !$RTx = "RTx"
+    PLANTUML_CODE_PATTERN = re.compile(r'^[^=\n]*=[ \t]*(?P<name>[^=\n]*?)[ \t]*$', re.MULTILINE)
+
     # ----------------------------------------------------------------------------------------------
     def __init__(self, name: str, identifier: int = 0):
         super().__init__(ElementType.INTERFACE, identifier)
-        self.name = name
+        self._name = intern_name(name)
     
     # ----------------------------------------------------------------------------------------------
     def get_plantuml_code(self, code_type: CodeType = CodeType.STANDARD) -> str:
@@ -77,20 +210,24 @@ class Interface(Element):
 
     # ----------------------------------------------------------------------------------------------
     @classmethod
-    def from_plantuml_code(cls, plantuml_code: str):
-        name = plantuml_code.split("=")[1].strip()
-        return cls(name)
+    def from_match(cls, match: re.Match):
+        return cls(match["name"])
 
 # --------------------------------------------------------------------------------------------------
 # Message class
 # --------------------------------------------------------------------------------------------------
 class Message(Element):
 
+    __slots__ = ("_name", "_interface")
+
+    # For example: !$RTx_ConnectReq = $RTx + ":" + ConnectReq
+    PLANTUML_CODE_PATTERN = re.compile(r'^[ \t]*!?\$?(?P<interface>\w*)_(?P<name>\w+)[ \t]*=[^\n]*$', re.MULTILINE)
+
     # ----------------------------------------------------------------------------------------------
     def __init__(self, name: str, interface: str, identifier: int = 0):
         super().__init__(ElementType.MESSAGE, identifier)
-        self.name = name
-        self.interface = interface
+        self._name = intern_name(name)
+        self._interface = intern_name(interface)
 
     # ----------------------------------------------------------------------------------------------
     def get_plantuml_code(self, code_type: CodeType = CodeType.STANDARD) -> str:
@@ -108,22 +245,25 @@ class Message(Element):
 
     # ----------------------------------------------------------------------------------------------
     @classmethod
-    def from_plantuml_code(cls, plantuml_code: str):
-        name = plantuml_code[plantuml_code.rfind("_") + 1:plantuml_code.find("=")].strip()
-        interface = plantuml_code[:plantuml_code.rfind("_")].strip()
-        interface = interface[2:]
-        return cls(name, interface)
+    def from_match(cls, match: re.Match):
+        return cls(match["name"], match["interface"])
 
 # --------------------------------------------------------------------------------------------------
 # State class
 # --------------------------------------------------------------------------------------------------
 class State(Element):
 
+    __slots__ = ("_name", "_display_name")
+
+    # For example: state Connecting as "Connecting to server"
+    PLANTUML_CODE_PATTERN = re.compile(r'^[ \t]*state[ \t]+(?P<name>\w+)(?:[ \t]+as[ \t]+"(?P<display_name>[^"\n]+)")?[^\n]*$',
+                                       re.MULTILINE)
+
     # ----------------------------------------------------------------------------------------------
     def __init__(self, name: str, display_name: str = "", identifier: int = 0):
         super().__init__(ElementType.STATE, identifier)
-        self.name = name
-        self.display_name = display_name
+        self._name = intern_name(name)
+        self._display_name = display_name
 
     # ----------------------------------------------------------------------------------------------
     def get_plantuml_code(self, code_type: CodeType = CodeType.STANDARD) -> str:
@@ -136,7 +276,8 @@ class State(Element):
             case CodeType.SELECTED:
                 return f"{standard_code} #line:FF0000;line.bold"
             case CodeType.MASKED:
-                return f"{standard_code} #0000{self.identifier:02X};line:0000{self.identifier:02X}"
+                mask_color = get_mask_color(self.identifier)
+                return f"{standard_code} #{mask_color};line:{mask_color}"
 
     # ----------------------------------------------------------------------------------------------
     def get_variable_name(self) -> str:
@@ -148,36 +289,37 @@ class State(Element):
 
     # ----------------------------------------------------------------------------------------------
     @classmethod
-    def from_plantuml_code(cls, plantuml_code: str):
-        match = re.search(r'state\s+(\w+)', plantuml_code)
-        name = match.group(1) if match else None
-        display_match = re.search(r'as\s+"([^"]+)"', plantuml_code)
-        display_name = display_match.group(1) if display_match else None
-        return cls(name, display_name)
+    def from_match(cls, match: re.Match):
+        return cls(match["name"], match["display_name"])
 
 # --------------------------------------------------------------------------------------------------
 # ChoicePoint class
 # --------------------------------------------------------------------------------------------------
 class ChoicePoint(Element):
 
+    __slots__ = ("_name", "_question")
+
+    # For example: state CP_Whitelisted as "Whitelisted?"
+    PLANTUML_CODE_PATTERN = re.compile(r'^[ \t]*state[ \t]+CP_(?P<name>\w+)(?:[ \t]+as[ \t]+"(?P<question>[^"\n]+)")?[^\n]*$',
+                                       re.MULTILINE)
+
     # ----------------------------------------------------------------------------------------------
     def __init__(self, name: str, question: str, identifier: int = 0):
         super().__init__(ElementType.CHOICE_POINT, identifier)
-        self.name = name
-        self.question = question
+        self._name = intern_name(name)
+        self._question = question
 
     # ----------------------------------------------------------------------------------------------
     def get_plantuml_code(self, code_type: CodeType = CodeType.STANDARD) -> str:
-        if not self.question.endswith("?"):
-            self.question += "?"
-        standard_code = f"state {self.get_variable_name()} as \"{self.question}\""
+        standard_code = f"state {self.get_variable_name()} as \"{self.get_question()}\""
         match code_type:
             case CodeType.STANDARD:
                 return standard_code
             case CodeType.SELECTED:
                 return f"{standard_code} #line:FF0000;line.bold"
             case CodeType.MASKED:
-                return f"{standard_code} #0000{self.identifier:02X};line:0000{self.identifier:02X}"
+                mask_color = get_mask_color(self.identifier)
+                return f"{standard_code} #{mask_color};line:{mask_color}"
 
     # ----------------------------------------------------------------------------------------------
     def get_variable_name(self) -> str:
@@ -185,36 +327,65 @@ class ChoicePoint(Element):
 
     # ----------------------------------------------------------------------------------------------
     def get_string_representation(self) -> str:
-        return f"{self.question}"
+        return self.get_question()
+
+    # ----------------------------------------------------------------------------------------------
+    def get_question(self) -> str:
+        # The question always ends with a question mark; generating code leaves the element as it is.
+        return self.question if self.question.endswith("?") else f"{self.question}?"
 
     # ----------------------------------------------------------------------------------------------
     @classmethod
-    def from_plantuml_code(cls, plantuml_code: str):
-        match = re.search(r'state\s+CP_(\w+)', plantuml_code)
-        name = match.group(1) if match else None
-        question_match = re.search(r'as\s+"([^"]+)"', plantuml_code)
-        question = question_match.group(1) if question_match else None
-        return cls(name, question)
+    def from_match(cls, match: re.Match):
+        return cls(match["name"], match["question"])
 
 # --------------------------------------------------------------------------------------------------
 # Transition class
 # --------------------------------------------------------------------------------------------------
 class Transition(Element):
 
+    __slots__ = ("_source", "_target", "_connector_type", "_connector_length", "_message_names")
+
+    # For example: Advertising -up-> CP_Whitelisted : $RTx_ConnectReq\n$RTx_ConnectedInd
+    PLANTUML_CODE_PATTERN = re.compile(r'^(?P<source>[^ \n]+) (?P<connector>[^ \n]+) (?P<target>[^ \n]+)'
+                                       r'(?: : (?P<messages>[^\n]*))?$', re.MULTILINE)
+
+    # Several messages of one transition are separated by a literal "\n" in the label.
+    MESSAGE_SEPARATOR = "\\n"
+
     # ----------------------------------------------------------------------------------------------
     def __init__(self, 
                  source: str, 
                  target: str, 
                  connector_type: ConnectorType, 
                  connector_length: int, 
-                 messages: set[Message] = set(),
+                 messages: Iterable[str] = (),
                  identifier: int = 0):
         super().__init__(ElementType.TRANSITION, identifier)
-        self.source = source
-        self.target = target
-        self.connector_type = connector_type
-        self.connector_length = connector_length
-        self.messages = messages if messages is not None else set()
+        self._source = intern_name(source)
+        self._target = intern_name(target)
+        self._connector_type = connector_type
+        self._connector_length = connector_length
+        self._message_names = self.get_message_names(messages if messages is not None else ())
+
+    # ----------------------------------------------------------------------------------------------
+    # The message variable names are kept as a tuple of interned names, in the order in which they
+    # were given. An interned name is shared by all transitions and freed with the last of them.
+    # ----------------------------------------------------------------------------------------------
+
+    @property
+    def messages(self) -> tuple[str, ...]:
+        return self.message_names
+
+    # ----------------------------------------------------------------------------------------------
+    @messages.setter
+    def messages(self, messages: Iterable[str]):
+        self.message_names = self.get_message_names(messages)
+
+    # ----------------------------------------------------------------------------------------------
+    @staticmethod
+    def get_message_names(messages: Iterable[str]) -> tuple[str, ...]:
+        return tuple(dict.fromkeys(intern_name(message) for message in messages))
 
     # ----------------------------------------------------------------------------------------------
     def get_plantuml_code(self, code_type: CodeType = CodeType.STANDARD) -> str:
@@ -225,7 +396,7 @@ class Transition(Element):
             case CodeType.SELECTED:
                 arrow_code_type = "[#FF0000,bold]"
             case CodeType.MASKED:
-                arrow_code_type = f"[#0000{self.identifier:02X},thickness=8]"
+                arrow_code_type = f"[#{get_mask_color(self.identifier)},thickness=8]"
 
         connector_code = ""
         match self.connector_type:
@@ -244,9 +415,9 @@ class Transition(Element):
 
         transition_code = f"{self.source} {connector_code} {self.target}"
 
-        if len(self.messages) > 0:
+        if self.message_names:
             transition_code += " : "
-            for message in self.messages:
+            for message in self.message_names:
                 transition_code += f"{message}\\n"
             transition_code = transition_code[:-2]
         return transition_code
@@ -254,19 +425,20 @@ class Transition(Element):
     # ----------------------------------------------------------------------------------------------
     @classmethod
     def from_plantuml_code(cls, plantuml_code: str):
-        parts = plantuml_code.split(" ")
-        source = parts[0]
-        connector = parts[1]
+        # A single line may still separate its messages by real new line characters.
+        return super().from_plantuml_code(plantuml_code.replace("\n", cls.MESSAGE_SEPARATOR))
+
+    # ----------------------------------------------------------------------------------------------
+    @classmethod
+    def from_match(cls, match: re.Match):
+        source, connector, target, messages = match.groups()
         connector_type = ConnectorType.UP if "-up-" in connector else \
                          ConnectorType.LEFT if "-left-" in connector else \
                          ConnectorType.DOWN if "-down-" in connector else \
                          ConnectorType.RIGHT
         connector_length = connector.count("-") - 1 if connector_type in [ConnectorType.UP, ConnectorType.DOWN] else 1
-        target = parts[2]
-        if len(parts) == 5:
-            messages_list = parts[4].split("\n")
-        else:
-            messages_list = []
-        messages = set(message for message in messages_list)
-        return cls(source, target, connector_type, connector_length, messages)
+        message_list = []
+        if messages:
+            message_list = [message.strip() for message in messages.split(cls.MESSAGE_SEPARATOR)]
+        return cls(source, target, connector_type, connector_length, [message for message in message_list if message])
 
@@ -0,0 +1,164 @@
+# --------------------------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------------------------
+from collections import deque
+import sys
+
+# --------------------------------------------------------------------------------------------------
+# Constants
+# --------------------------------------------------------------------------------------------------
+
+HISTORY_MAX_ENTRIES = 1000
+HISTORY_MAX_BYTES = 16 * 1024 * 1024
+HISTORY_CHECKPOINT_INTERVAL = 16
+
+# Rough per-line bookkeeping cost, so that many small lines are not counted as free.
+LINE_OVERHEAD_BYTES = 8
+
+# --------------------------------------------------------------------------------------------------
+# HistoryEntry
+# --------------------------------------------------------------------------------------------------
+
+class HistoryEntry:
+
+    # ----------------------------------------------------------------------------------------------
+    # A checkpoint holds all lines, a delta holds the lines that replace everything between the
+    # common prefix and the common suffix of the previous entry.
+    # ----------------------------------------------------------------------------------------------
+
+    def __init__(self, lines: tuple, prefix_length: int = 0, suffix_length: int = 0, is_checkpoint: bool = True):
+        self.lines = lines
+        self.prefix_length = prefix_length
+        self.suffix_length = suffix_length
+        self.is_checkpoint = is_checkpoint
+        self.size = sum(len(line) for line in lines) + LINE_OVERHEAD_BYTES * (len(lines) + 1)
+
+    # ----------------------------------------------------------------------------------------------
+    def apply(self, previous_lines: tuple) -> tuple:
+        if self.is_checkpoint:
+            return self.lines
+        suffix_start = len(previous_lines) - self.suffix_length
+        return previous_lines[:self.prefix_length] + self.lines + previous_lines[suffix_start:]
+
+    # ----------------------------------------------------------------------------------------------
+    @classmethod
+    def create_delta(cls, previous_lines: tuple, lines: tuple):
+        maximum_length = min(len(previous_lines), len(lines))
+        prefix_length = 0
+        while prefix_length < maximum_length and previous_lines[prefix_length] == lines[prefix_length]:
+            prefix_length += 1
+        suffix_length = 0
+        while (suffix_length < maximum_length - prefix_length and
+               previous_lines[-1 - suffix_length] == lines[-1 - suffix_length]):
+            suffix_length += 1
+        return cls(lines[prefix_length:len(lines) - suffix_length], prefix_length, suffix_length, False)
+
+# --------------------------------------------------------------------------------------------------
+# History
+# --------------------------------------------------------------------------------------------------
+
+class History:
+
+    # ----------------------------------------------------------------------------------------------
+    # Constructor
+    # ----------------------------------------------------------------------------------------------
+
+    def __init__(self,
+                 max_entries: int = HISTORY_MAX_ENTRIES,
+                 max_bytes: int = HISTORY_MAX_BYTES,
+                 checkpoint_interval: int = HISTORY_CHECKPOINT_INTERVAL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.checkpoint_interval = checkpoint_interval
+        self.entries = deque()
+        self.size = 0
+        self.current_index = -1
+        self.deltas_since_checkpoint = 0
+        self.last_lines = ()
+
+    # ----------------------------------------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    # ----------------------------------------------------------------------------------------------
+    def __getitem__(self, index: int) -> str:
+        return "\n".join(self.get_lines(index))
+
+    # ----------------------------------------------------------------------------------------------
+    def add(self, plantuml_code: str):
+        self.truncate(self.current_index + 1)
+
+        # Interned, so that unchanged lines are shared by the entries instead of stored again.
+        lines = tuple(sys.intern(line) for line in plantuml_code.split("\n"))
+        if not self.entries or self.deltas_since_checkpoint + 1 >= self.checkpoint_interval:
+            entry = HistoryEntry(lines)
+            self.deltas_since_checkpoint = 0
+        else:
+            entry = HistoryEntry.create_delta(self.last_lines, lines)
+            self.deltas_since_checkpoint += 1
+
+        self.entries.append(entry)
+        self.size += entry.size
+        self.last_lines = lines
+        self.current_index = len(self.entries) - 1
+        self.evict()
+
+    # ----------------------------------------------------------------------------------------------
+    def get_current(self) -> str | None:
+        if self.current_index < 0:
+            return None
+        return self[self.current_index]
+
+    # ----------------------------------------------------------------------------------------------
+    def undo(self) -> str | None:
+        if self.current_index <= 0:
+            return None
+        self.current_index -= 1
+        return self[self.current_index]
+
+    # ----------------------------------------------------------------------------------------------
+    def redo(self) -> str | None:
+        if self.current_index >= len(self.entries) - 1:
+            return None
+        self.current_index += 1
+        return self[self.current_index]
+
+    # ----------------------------------------------------------------------------------------------
+    def get_lines(self, index: int) -> tuple:
+        if not 0 <= index < len(self.entries):
+            raise IndexError("history index out of range")
+        checkpoint_index = index
+        while not self.entries[checkpoint_index].is_checkpoint:
+            checkpoint_index -= 1
+        lines = self.entries[checkpoint_index].lines
+        for entry_index in range(checkpoint_index + 1, index + 1):
+            lines = self.entries[entry_index].apply(lines)
+        return lines
+
+    # ----------------------------------------------------------------------------------------------
+    def truncate(self, length: int):
+        if length >= len(self.entries):
+            return
+        while len(self.entries) > length:
+            self.size -= self.entries.pop().size
+        self.last_lines = self.get_lines(length - 1) if length > 0 else ()
+        self.deltas_since_checkpoint = 0
+        for entry in reversed(self.entries):
+            if entry.is_checkpoint:
+                break
+            self.deltas_since_checkpoint += 1
+
+    # ----------------------------------------------------------------------------------------------
+    def evict(self):
+        while len(self.entries) > 1 and (len(self.entries) > self.max_entries or self.size > self.max_bytes):
+            evicted_entry = self.entries.popleft()
+            self.size -= evicted_entry.size
+            self.current_index = max(self.current_index - 1, 0)
+            # The new oldest entry must be able to stand on its own.
+            next_entry = self.entries[0]
+            if not next_entry.is_checkpoint:
+                checkpoint = HistoryEntry(next_entry.apply(evicted_entry.lines))
+                self.size += checkpoint.size - next_entry.size
+                self.entries[0] = checkpoint
+                if self.deltas_since_checkpoint >= len(self.entries):
+                    self.deltas_since_checkpoint = len(self.entries) - 1
@@ -1,39 +1,83 @@
+import os
 import tkinter as tk
-from PIL import Image, ImageTk
 from plantuml_manager import PlantUMLManager
+from render_scheduler import RENDER_POLL_INTERVAL
+from tracing import tracer, TRACE_ENVIRONMENT_VARIABLE
+from viewport import TiledViewport, ZOOM_STEP
+
+TRACE_FILE = "trace.json"
 
 class DiagramApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Diagram Viewer")
 
-        # Create a canvas to display the diagram
+        # Create a canvas to display the diagram; it grows with the window
         self.canvas = tk.Canvas(root, width=800, height=600)
-        self.canvas.pack()
+        self.canvas.pack(fill=tk.BOTH, expand=True)
+
+        # The viewport only converts the visible tiles; the wheel zooms and dragging pans
+        self.viewport = TiledViewport(self.canvas)
+        self.root.bind("<plus>", lambda event: self.zoom_at_center(ZOOM_STEP))
+        self.root.bind("<minus>", lambda event: self.zoom_at_center(1 / ZOOM_STEP))
+        self.root.bind("<Key-0>", lambda event: self.viewport.zoom_to_fit())
+        self.root.bind("<Key-1>", lambda event: self.viewport.set_zoom(1.0))
 
-        # Initialize PlantUMLManager
-        self.plantuml_manager = PlantUMLManager()
+        # Initialize PlantUMLManager, rendering in the background so that the UI stays responsive
+        self.plantuml_manager = PlantUMLManager(background_rendering=True)
+        self.plantuml_manager.on_diagrams_updated = self.display_diagram
+        self.poll_renders()
+
+        # F12 switches tracing on and off; switching it off writes the trace
+        self.root.bind("<F12>", self.toggle_tracing)
 
         # Load and render the diagram
         self.load_and_display_diagram()
 
+    def poll_renders(self):
+        # Finished renders are delivered here, on the Tk thread
+        self.plantuml_manager.render_scheduler.process_completions()
+        self.root.after(RENDER_POLL_INTERVAL, self.poll_renders)
+
+    def toggle_tracing(self, event=None):
+        if not tracer.enabled:
+            tracer.clear()
+            tracer.enable()
+            print("Tracing enabled")
+            return
+        tracer.disable()
+        self.export_trace(TRACE_FILE)
+
+    def export_trace(self, path):
+        tracer.export_chrome_trace(path)
+        tracer.print_statistics()
+        print(f"Trace written to {path}")
+
     def load_and_display_diagram(self):
         with open("diagrams/node.puml", "r") as file:
             plantuml_code = file.read()
 
-        # Load the diagram
+        # Load the diagram; it is displayed once it has been rendered
         self.plantuml_manager.load_diagram(plantuml_code)
 
-        # Get the rendered image
-        image = self.plantuml_manager.state_diagram.rendered_image
+    def display_diagram(self):
+        # Get the rendered image, or the provisional frame while a render is in flight
+        image = self.plantuml_manager.get_display_image()
+        if image is None:
+            return
 
-        # Convert the image to a format Tkinter can use
-        self.tk_image = ImageTk.PhotoImage(image)
+        # The viewport keeps the zoom and scroll position and only converts the visible tiles
+        self.viewport.set_image(image)
 
-        # Display the image on the canvas
-        self.canvas.create_image(0, 0, anchor=tk.NW, image=self.tk_image)
+    def zoom_at_center(self, factor):
+        width, height = self.viewport.get_viewport_size()
+        self.viewport.zoom_at(factor, width // 2, height // 2)
 
 if __name__ == "__main__":
     root = tk.Tk()
     app = DiagramApp(root)
     root.mainloop()
+
+    # With the environment variable set, the trace of the whole session is written on exit
+    if tracer.enabled and os.environ.get(TRACE_ENVIRONMENT_VARIABLE):
+        app.export_trace(os.environ[TRACE_ENVIRONMENT_VARIABLE])
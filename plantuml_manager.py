@@ -1,19 +1,32 @@
 from diagram import Diagram
+from element_registry import ElementRegistry
 from elements import *
-
+from history import History, HISTORY_MAX_ENTRIES, HISTORY_MAX_BYTES
+from plantuml_parser import PlantUMLDocument, parse_plantuml_code
+from plantuml_validator import has_errors, validate_plantuml_code
+from render_backend import RenderBackend, RenderBackendType, RenderError, RenderSyntaxError, RenderUnavailableError
+from render_backend import PLANTUML_PORT, create_render_backend, get_supported_image_format
+from render_cache import RenderCache
+from render_scheduler import RenderScheduler
+from selection_highlight import compose_provisional_image, compose_selection_image
+from selection_index import FrameSnapshot, SelectionIndex, SvgSelectionIndex
+from svg_geometry import get_link_name
+from tracing import span
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from PIL import Image
 from enum import Enum
-import atexit
-import subprocess
-import time
+from typing import Callable, Iterable, TextIO
 
 # --------------------------------------------------------------------------------------------------
 # Constants
 # --------------------------------------------------------------------------------------------------
 
-PLANTUML_PORT = 9000
+RENDER_CACHE_SIZE = 64
+RENDER_CONCURRENCY = 4
 
-SECTION_START_INDICATOR = "'== "
-SECTION_END_INDICATOR = " =="
+NEAREST_ELEMENT_DISTANCE = 8
 
 # --------------------------------------------------------------------------------------------------
 HEADER_PLANTUML_CODE = """@startuml
@@ -84,9 +97,6 @@ FOOTER_PLANTUML_CODE = """'== Footer ==
 }
 @enduml"""
 
-# --------------------------------------------------------------------------------------------------
-SECTIONS = [HEADER_PLANTUML_CODE, DEFAULT_INTERFACES_PLANTUML_CODE, DEFAULT_MESSAGES_PLANTUML_CODE, INTERFACES_PLANTUML_CODE, MESSAGES_PLANTUML_CODE, COMPONENT_PLANTUML_CODE, STATES_PLANTUML_CODE, CHOICE_POINTS_PLANTUML_CODE, TRANSITIONS_PLANTUML_CODE, FOOTER_PLANTUML_CODE]
-
 # --------------------------------------------------------------------------------------------------
 # Enums
 # --------------------------------------------------------------------------------------------------
@@ -96,6 +106,33 @@ class EditActionType(Enum):
     VISUAL = "visual"
     SELECTION = "selection"
 
+# The order in which the actions are merged in a transaction; a stronger action includes the weaker.
+EDIT_ACTION_STRENGTHS = {
+    EditActionType.NON_VISUAL: 0,
+    EditActionType.SELECTION: 1,
+    EditActionType.VISUAL: 2,
+}
+
+class CodeSection(Enum):
+    INTERFACES = "interfaces"
+    MESSAGES = "messages"
+    STATES = "states"
+    CHOICE_POINTS = "choice_points"
+    TRANSITIONS = "transitions"
+
+# The class of the elements of each section, whose revision tells whether its cached code is valid.
+CODE_SECTION_ELEMENT_CLASSES = {
+    CodeSection.INTERFACES: Interface,
+    CodeSection.MESSAGES: Message,
+    CodeSection.STATES: State,
+    CodeSection.CHOICE_POINTS: ChoicePoint,
+    CodeSection.TRANSITIONS: Transition,
+}
+
+class SelectionIndicationMode(Enum):
+    LOCAL = "local"
+    SERVER = "server"
+
 # --------------------------------------------------------------------------------------------------
 # PlantUMLManager
 # --------------------------------------------------------------------------------------------------
@@ -106,76 +143,158 @@ class PlantUMLManager:
     # Constructor
     # ----------------------------------------------------------------------------------------------
 
-    def __init__(self):
-
-        self.process = self.start_plantuml_server(PLANTUML_PORT)
-        self.plantuml_endpoint = f"http://localhost:{PLANTUML_PORT}/png/"
+    def __init__(self,
+                 render_cache_directory: str | None = None,
+                 render_concurrency: int = RENDER_CONCURRENCY,
+                 render_backend_type: RenderBackendType = RenderBackendType.HTTP,
+                 selection_indication_mode: SelectionIndicationMode = SelectionIndicationMode.LOCAL,
+                 history_max_entries: int = HISTORY_MAX_ENTRIES,
+                 history_max_bytes: int = HISTORY_MAX_BYTES,
+                 background_rendering: bool = False,
+                 image_format: str = "png",
+                 port: int = PLANTUML_PORT,
+                 render_backend: RenderBackend | None = None,
+                 render_cache: RenderCache | None = None,
+                 render_executor: ThreadPoolExecutor | None = None,
+                 render_scheduler: RenderScheduler | None = None,
+                 visible: bool = True):
+
+        # A render backend, cache, executor and scheduler that are passed in are shared, e.g. by
+        # the components of a Workspace; the manager only closes what it created itself.
+        self.port = port
+        self.plantuml_server = None
+        self.plantuml_endpoint = None
+        if render_backend is not None:
+            self.image_format = render_backend.image_format
+            self.render_backend = render_backend
+        else:
+            self.image_format = get_supported_image_format(image_format)
+            self.render_backend = self.create_render_backend(render_backend_type, render_concurrency)
+        self.owns_render_backend = render_backend is None
 
         self.component_name = "Component Name"
-
-        self.state_diagram = Diagram(self.plantuml_endpoint)
-        self.selection_mask_diagram = Diagram(self.plantuml_endpoint)
-        self.selection_indication_diagram = Diagram(self.plantuml_endpoint)
+        self.selection_indication_mode = selection_indication_mode
+
+        self.render_cache = render_cache if render_cache is not None else RenderCache(RENDER_CACHE_SIZE,
+                                                                                     render_cache_directory)
+        self.owns_render_executor = render_executor is None
+        self.render_executor = render_executor if render_executor is not None else \
+                               ThreadPoolExecutor(max_workers=render_concurrency)
+        self.syntax_check_cache = RenderCache(RENDER_CACHE_SIZE)
+        self.state_diagram = Diagram(render_cache=self.render_cache, render_backend=self.render_backend)
+        self.selection_mask_diagram = Diagram(render_cache=self.render_cache, render_backend=self.render_backend)
+        self.selection_indication_diagram = Diagram(render_cache=self.render_cache, render_backend=self.render_backend)
+        self.selection_index = None
+        self.selection_index_source = None
+        self.owns_render_scheduler = render_scheduler is None
+        if render_scheduler is None and background_rendering:
+            render_scheduler = RenderScheduler(self.render_diagram_images)
+        self.render_scheduler = render_scheduler
+        self.on_diagrams_updated = None
+        # A manager that is not visible defers its renders until it is shown.
+        self.visible = visible
+        self.deferred_refresh = False
+        self.frame_snapshot = None
+        self.pending_frame_snapshot = None
+        self.provisional_image = None
 
         self.interfaces = []
         self.messages = []
         self.states = []
         self.choice_points = []
         self.transitions = []
-        self.elements = []
+        self.registry = ElementRegistry()
         self.selected_element_identifiers = set()
+        self.section_code_cache = {}
+        self.transaction_depth = 0
+        self.transaction_action = None
         
-        self.history = [self.get_plantuml_code(CodeType.STANDARD)]
-        self.current_history_index = 0
+        self.history = History(history_max_entries, history_max_bytes)
+        self.history.add(self.get_plantuml_code(CodeType.STANDARD))
 
     # ----------------------------------------------------------------------------------------------
-    def start_plantuml_server(self, port: int) -> subprocess.Popen:
-        command = ["java", "-jar", "plantuml.jar", f"-picoweb:{port}"]
-        process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        time.sleep(3)
-        atexit.register(self.cleanup)
-        return process
-    
+    @property
+    def elements(self) -> list[Element]:
+        return self.registry.get_elements()
+
     # ----------------------------------------------------------------------------------------------
-    def cleanup(self):
-        if self.process.poll():
-            return
-        self.process.terminate()
-        try:
-            self.process.wait(timeout=5)
-        except subprocess.TimeoutExpired:
-            self.process.kill()
+    @property
+    def current_history_index(self) -> int:
+        return self.history.current_index
+
+    # ----------------------------------------------------------------------------------------------
+    def create_render_backend(self,
+                              render_backend_type: RenderBackendType,
+                              render_concurrency: int) -> RenderBackend:
+        render_backend, self.plantuml_server = create_render_backend(render_backend_type, render_concurrency,
+                                                                     self.image_format, self.port)
+        if self.plantuml_server is not None:
+            self.plantuml_endpoint = self.plantuml_server.get_endpoint(self.image_format)
+        return render_backend
 
     # ----------------------------------------------------------------------------------------------
-    def set_elements(self, plantuml_code: str):
+    def cleanup(self):
+        if self.render_scheduler is not None:
+            if self.owns_render_scheduler:
+                self.render_scheduler.close()
+            else:
+                # Renders of this manager that are still pending are dropped by the shared scheduler,
+                # which keeps no generations of its diagrams either.
+                self.render_scheduler.forget([self.state_diagram,
+                                              self.selection_mask_diagram,
+                                              self.selection_indication_diagram])
+        if self.owns_render_executor:
+            self.render_executor.shutdown(wait=False)
+        if self.owns_render_backend:
+            self.render_backend.close()
+        if self.plantuml_server is not None:
+            self.plantuml_server.stop()
+
+    # ----------------------------------------------------------------------------------------------
+    def set_visible(self, visible: bool):
+        # Showing a manager renders the diagrams of the edits made while it was hidden, once.
+        self.visible = visible
+        if visible and self.deferred_refresh:
+            self.deferred_refresh = False
+            self.refresh_diagrams(self.get_diagram_codes())
+
+    # ----------------------------------------------------------------------------------------------
+    def get_render_cache_statistics(self) -> dict:
+        return self.render_cache.get_statistics()
+
+    # ----------------------------------------------------------------------------------------------
+    def set_elements(self, plantuml_code: str | TextIO | Iterable[str] | PlantUMLDocument):
+        if isinstance(plantuml_code, PlantUMLDocument):
+            document = plantuml_code
+        else:
+            with span("manager.parse", "parse"):
+                document = parse_plantuml_code(plantuml_code)
+
         self.interfaces.clear()
         self.messages.clear()
         self.states.clear()
         self.choice_points.clear()
         self.transitions.clear()
-        self.elements.clear()
+        self.registry.clear()
         self.selected_element_identifiers.clear()
-
-        previous_history = self.history.copy()
-        previous_current_history_index = self.current_history_index
+        self.invalidate_plantuml_code()
 
         self.add_default_interfaces()
         self.add_default_messages()
         self.add_default_states()
 
-        self.history = previous_history
-        self.current_history_index = previous_current_history_index
-
-        self.states.append(State(0, "START"))
-        self.interfaces += self.get_interfaces_from_plantuml_code(plantuml_code)
-        self.messages += self.get_messages_from_plantuml_code(plantuml_code)
-        self.component_name = self.get_component_from_plantuml_code(plantuml_code)
-        self.states += self.get_states_from_plantuml_code(plantuml_code)
-        self.choice_points += self.get_choice_points_from_plantuml_code(plantuml_code)
-        self.transitions += self.get_transitions_from_plantuml_code(plantuml_code)
-        self.elements = self.states + self.choice_points + self.transitions + self.interfaces + self.messages
-        for i, element in enumerate(self.elements):
-            element.identifier = i
+        self.interfaces += document.interfaces
+        self.messages += document.messages
+        if document.component_name is not None:
+            self.component_name = document.component_name
+        self.states += document.states
+        self.choice_points += document.choice_points
+        self.transitions += document.transitions
+        self.registry.clear()
+        with span("manager.index_elements", "parse"):
+            for element in self.states + self.choice_points + self.transitions + self.interfaces + self.messages:
+                element.identifier = self.registry.allocate_identifier()
+                self.registry.add(element)
 
     # ----------------------------------------------------------------------------------------------
     def add_default_interfaces(self):
@@ -192,220 +311,452 @@ class PlantUMLManager:
     def add_default_states(self):
         self.add_state("START")
 
-    # ----------------------------------------------------------------------------------------------
-    def get_interfaces_from_plantuml_code(self, plantuml_code: str):
-        interfaces_index = plantuml_code.find(INTERFACES_PLANTUML_CODE) + len(INTERFACES_PLANTUML_CODE)
-        lines = []
-        for line in plantuml_code[interfaces_index:].split("\n"):
-            if line == "" or line.startswith(SECTION_START_INDICATOR):
-                break
-            lines.append(line)
-        interfaces = []
-        for line in lines:
-            interface = Interface.from_plantuml_code(line)
-            interfaces.append(interface)
-        return interfaces
-
-    # ----------------------------------------------------------------------------------------------
-    def get_messages_from_plantuml_code(self, plantuml_code: str):
-        messages_index = plantuml_code.find(MESSAGES_PLANTUML_CODE) + len(MESSAGES_PLANTUML_CODE)
-        lines = []
-        for line in plantuml_code[messages_index:].split("\n"):
-            if line == "" or line.startswith(SECTION_START_INDICATOR):
-                break
-            lines.append(line)
-        messages = []
-        for line in lines:
-            message = Message.from_plantuml_code(line)
-            messages.append(message)
-        return messages
-
-    # ----------------------------------------------------------------------------------------------
-    def get_component_from_plantuml_code(self, plantuml_code: str):
-        component_index = plantuml_code.find(COMPONENT_PLANTUML_CODE)
-        component_name_line = plantuml_code[component_index+len(COMPONENT_PLANTUML_CODE):].split("\n")[0]
-        component_name = component_name_line.split('"')[1]
-        return component_name
-
-    # ----------------------------------------------------------------------------------------------
-    def get_states_from_plantuml_code(self, plantuml_code: str):
-        states_index = plantuml_code.find(STATES_PLANTUML_CODE) + len(STATES_PLANTUML_CODE)
-        lines = []
-        for line in plantuml_code[states_index:].split("\n"):
-            if line == "" or line.startswith(SECTION_START_INDICATOR):
-                break
-            lines.append(line)
-        states = []
-        for line in lines:
-            state = State.from_plantuml_code(line)
-            states.append(state)
-        return states
-
-    # ----------------------------------------------------------------------------------------------
-    def get_choice_points_from_plantuml_code(self, plantuml_code: str):
-        choice_points_index = plantuml_code.find(CHOICE_POINTS_PLANTUML_CODE) + len(CHOICE_POINTS_PLANTUML_CODE)
-        lines = []
-        for line in plantuml_code[choice_points_index:].split("\n"):
-            if line == "" or line.startswith(SECTION_START_INDICATOR):
-                break
-            lines.append(line)
-        choice_points = []
-        for line in lines:
-            choice_point = ChoicePoint.from_plantuml_code(line)
-            choice_points.append(choice_point)
-        return choice_points
-
-    # ----------------------------------------------------------------------------------------------
-    def get_transitions_from_plantuml_code(self, plantuml_code: str):
-        transitions_index = plantuml_code.find(TRANSITIONS_PLANTUML_CODE) + len(TRANSITIONS_PLANTUML_CODE)
-        lines = []
-        for line in plantuml_code[transitions_index:].split("\n"):
-            if line == "" or line.startswith(SECTION_START_INDICATOR):
-                break
-            lines.append(line)
-        transitions = []
-        for line in lines:
-            transition = Transition.from_plantuml_code(line)
-            transitions.append(transition)
-        return transitions
-
     # ----------------------------------------------------------------------------------------------
     def load_diagram(self, plantuml_code: str) -> bool:
-        if not self.validate_plantuml_code(plantuml_code):
+        document = self.validate_plantuml_code(plantuml_code)
+        if document is None:
             return False
-        self.set_elements(plantuml_code)
-        if not self.state_diagram.set_plantuml_code(self.get_plantuml_code(CodeType.STANDARD)):
-            return False
-        if not self.selection_mask_diagram.set_plantuml_code(self.get_plantuml_code(CodeType.MASKED)):
-            return False
-        if not self.selection_indication_diagram.set_plantuml_code(self.get_plantuml_code(CodeType.SELECTED)):
+        self.set_elements(document)
+        if self.render_scheduler is not None and self.visible:
+            # In the background a failing render is only known later. The code is added to the
+            # history now, so that edits made meanwhile come after it, and rolled back on failure.
+            self.add_history(plantuml_code)
+            self.refresh_diagrams(self.get_diagram_codes(),
+                                  on_refreshed=lambda loaded: loaded or self.roll_back_load(plantuml_code))
+            return True
+        if not self.refresh_diagrams(self.get_diagram_codes()):
+            print("Diagram detected invalid PlantUML code!")
+            self.set_elements(self.history.get_current())
             return False
         self.add_history(plantuml_code)
         return True
+
+    # ----------------------------------------------------------------------------------------------
+    def roll_back_load(self, plantuml_code: str):
+        print("Diagram detected invalid PlantUML code!")
+        # Edits made since the load are built on the loaded code, so then it is kept.
+        if self.history.get_current() != plantuml_code or self.history.undo() is None:
+            return
+        self.history.truncate(self.history.current_index + 1)
+        self.set_elements(self.history.get_current())
     
     # ----------------------------------------------------------------------------------------------
     def set_plantuml_code(self, plantuml_code: str):
         self.set_elements(plantuml_code)
-        self.state_diagram.set_plantuml_code(self.get_plantuml_code(CodeType.STANDARD))
-        self.selection_mask_diagram.set_plantuml_code(self.get_plantuml_code(CodeType.MASKED))
-        self.selection_indication_diagram.set_plantuml_code(self.get_plantuml_code(CodeType.SELECTED))
+        self.refresh_diagrams(self.get_diagram_codes())
+
+    # ----------------------------------------------------------------------------------------------
+    def get_diagram_codes(self, action: EditActionType = EditActionType.VISUAL) -> list[tuple[Diagram, str]]:
+        diagram_codes = []
+        if action == EditActionType.VISUAL:
+            diagram_codes.append((self.state_diagram, self.get_plantuml_code(CodeType.STANDARD)))
+            # An SVG image carries the geometry of the elements, so no MASKED render is needed.
+            if self.image_format != "svg":
+                diagram_codes.append((self.selection_mask_diagram, self.get_plantuml_code(CodeType.MASKED)))
+        if self.selection_indication_mode == SelectionIndicationMode.SERVER:
+            diagram_codes.append((self.selection_indication_diagram, self.get_plantuml_code(CodeType.SELECTED)))
+        return diagram_codes
+
+    # ----------------------------------------------------------------------------------------------
+    def update_selection_indication(self) -> bool:
+        if self.selection_indication_mode == SelectionIndicationMode.LOCAL:
+            with span("manager.compose_selection", "selection"):
+                rendered_image = self.compose_selection_indication()
+            if rendered_image is not None:
+                # A composed image has no code of its own, so the selection labels it; generating
+                # the SELECTED code for every selection change would cost as much as the composition.
+                self.selection_indication_diagram.set_rendered_image(self.get_selection_key(), rendered_image)
+                return True
+        plantuml_code = self.get_plantuml_code(CodeType.SELECTED)
+        return self.refresh_diagrams([(self.selection_indication_diagram, plantuml_code)], indicate_selection=False)
 
     # ----------------------------------------------------------------------------------------------
-    def validate_plantuml_code(self, plantuml_code: str) -> bool:
-        diagram = Diagram(self.plantuml_endpoint)
-        if not diagram.set_plantuml_code(plantuml_code):
-            print("Diagram detected invalid PlantUML code!")
+    def get_selection_key(self) -> str:
+        identifiers = ",".join(str(identifier) for identifier in sorted(self.selected_element_identifiers))
+        return f"' Selected: {identifiers}"
+
+    # ----------------------------------------------------------------------------------------------
+    def compose_selection_indication(self) -> Image.Image | None:
+        outlined_identifiers = set()
+        recolored_identifiers = set()
+        for identifier in self.selected_element_identifiers:
+            element = self.get_element_by_identifier(identifier)
+            if element is not None and element.element_type == ElementType.TRANSITION:
+                recolored_identifiers.add(identifier)
+            else:
+                outlined_identifiers.add(identifier)
+        selection_index = self.get_selection_index()
+        return compose_selection_image(self.state_diagram.rendered_image,
+                                       selection_index.labels if selection_index else None,
+                                       outlined_identifiers,
+                                       recolored_identifiers)
+
+    # ----------------------------------------------------------------------------------------------
+    def render_diagrams(self, diagram_codes: list[tuple[Diagram, str]]) -> bool:
+        rendered_images = self.render_diagram_images(diagram_codes)
+        if rendered_images is None:
             return False
-        previous_index = -1
-        for section in SECTIONS:
-            index = plantuml_code.find(section)
-            if index == -1 or index < previous_index:
-                print(f"Missing section {section} detected!")
-                return False
-            previous_index = index
+        self.commit_rendered_images(diagram_codes, rendered_images)
         return True
+
+    # ----------------------------------------------------------------------------------------------
+    def render_diagram_images(self, diagram_codes: list[tuple[Diagram, str]]) -> list | None:
+        with span("manager.render_diagrams", "render", diagrams=len(diagram_codes)):
+            futures = [self.render_executor.submit(diagram.render_image, code) for diagram, code in diagram_codes]
+            rendered_images = [future.result() for future in futures]
+        if any(rendered_image is None for rendered_image in rendered_images):
+            # The diagrams keep showing their previous images.
+            for diagram, code in diagram_codes:
+                if diagram.render_error is not None:
+                    self.report_render_error(diagram.render_error, code)
+            return None
+        return rendered_images
+
+    # ----------------------------------------------------------------------------------------------
+    def report_render_error(self, error: RenderError, code: str):
+        if isinstance(error, RenderUnavailableError):
+            print(f"WARNING: PlantUML server unavailable, diagram not updated: {error}")
+        else:
+            print(f"ERROR: failed rendering image: {error}\nCode: {code}")
+
+    # ----------------------------------------------------------------------------------------------
+    def commit_rendered_images(self, diagram_codes: list[tuple[Diagram, str]], rendered_images: list):
+        for (diagram, code), rendered_image in zip(diagram_codes, rendered_images):
+            diagram.set_rendered_image(code, rendered_image)
+
+    # ----------------------------------------------------------------------------------------------
+    def refresh_diagrams(self,
+                         diagram_codes: list[tuple[Diagram, str]],
+                         indicate_selection: bool = True,
+                         on_refreshed: Callable[[bool], None] | None = None) -> bool:
+        # With background rendering the diagrams are updated later, when the UI thread processes
+        # the completed renders; until then they keep showing the previous images. Then the
+        # outcome is passed to on_refreshed, unless the renders went obsolete.
+        if not self.visible and diagram_codes:
+            self.deferred_refresh = True
+            return True
+        if self.render_scheduler is not None and diagram_codes:
+            frame_snapshot = self.create_frame_snapshot() if self.is_visual_refresh(diagram_codes) else None
+            # Diagrams that were rendered before, e.g. after an undo, are updated from the cache at once.
+            cached_images = self.get_cached_images(diagram_codes)
+            if cached_images is not None:
+                self.render_scheduler.supersede([diagram for diagram, _ in diagram_codes])
+                return self.complete_background_refresh(diagram_codes, cached_images, indicate_selection,
+                                                        frame_snapshot, on_refreshed)
+            # Only the diagrams that were not submitted again in the meantime are delivered.
+            self.render_scheduler.submit(diagram_codes,
+                                         lambda rendered_codes, rendered_images:
+                                             self.complete_background_refresh(rendered_codes, rendered_images,
+                                                                              indicate_selection, frame_snapshot,
+                                                                              on_refreshed),
+                                         self.render_diagram_images,
+                                         lambda: self.drop_provisional_frame(frame_snapshot))
+            if frame_snapshot is not None:
+                self.pending_frame_snapshot = frame_snapshot
+                self.show_provisional_frame()
+            return True
+        return self.complete_refresh(diagram_codes, self.render_diagram_images(diagram_codes), indicate_selection)
+
+    # ----------------------------------------------------------------------------------------------
+    def complete_background_refresh(self,
+                                    diagram_codes: list[tuple[Diagram, str]],
+                                    rendered_images: list | None,
+                                    indicate_selection: bool,
+                                    frame_snapshot: FrameSnapshot | None,
+                                    on_refreshed: Callable[[bool], None] | None) -> bool:
+        refreshed = self.complete_refresh(diagram_codes, rendered_images, indicate_selection, frame_snapshot)
+        if on_refreshed is not None:
+            on_refreshed(refreshed)
+        return refreshed
+
+    # ----------------------------------------------------------------------------------------------
+    def is_visual_refresh(self, diagram_codes: list[tuple[Diagram, str]]) -> bool:
+        return any(diagram is self.state_diagram for diagram, _ in diagram_codes)
+
+    # ----------------------------------------------------------------------------------------------
+    def get_cached_images(self, diagram_codes: list[tuple[Diagram, str]]) -> list | None:
+        # The images of all diagrams from the render cache, or None when any of them is missing.
+        rendered_images = []
+        for diagram, code in diagram_codes:
+            rendered_image = diagram.render_image(code, cached_only=True)
+            if rendered_image is None:
+                return None
+            rendered_images.append(rendered_image)
+        return rendered_images
+
+    # ----------------------------------------------------------------------------------------------
+    def create_frame_snapshot(self) -> FrameSnapshot:
+        identifiers_by_shape_name = self.get_identifiers_by_shape_name() if self.image_format == "svg" else None
+        return FrameSnapshot(self.elements, identifiers_by_shape_name)
+
+    # ----------------------------------------------------------------------------------------------
+    def show_provisional_frame(self):
+        # Until the render arrives, the previous image is shown faded, with the elements that were
+        # changed or deleted since tinted. New elements have no place in it yet.
+        if self.frame_snapshot is None or self.state_diagram.rendered_image is None:
+            return
+        with span("manager.compose_provisional", "display"):
+            changed_identifiers = self.frame_snapshot.get_changed_identifiers(self.get_element_by_identifier)
+            selection_index = self.get_selection_index()
+            self.provisional_image = compose_provisional_image(self.state_diagram.rendered_image,
+                                                               selection_index.labels if selection_index else None,
+                                                               changed_identifiers)
+        if self.on_diagrams_updated is not None:
+            self.on_diagrams_updated()
+
+    # ----------------------------------------------------------------------------------------------
+    def drop_provisional_frame(self, frame_snapshot: FrameSnapshot | None):
+        # A visual refresh that failed or went obsolete shows the rendered image again, unless the
+        # provisional frame belongs to a newer refresh that is still in flight.
+        if frame_snapshot is None or frame_snapshot is not self.pending_frame_snapshot:
+            return
+        self.pending_frame_snapshot = None
+        if self.provisional_image is None:
+            return
+        self.provisional_image = None
+        if self.on_diagrams_updated is not None:
+            self.on_diagrams_updated()
+
+    # ----------------------------------------------------------------------------------------------
+    def get_display_image(self) -> Image.Image | None:
+        # The provisional frame while a render is in flight, otherwise the rendered image.
+        if self.provisional_image is not None:
+            return self.provisional_image
+        return self.state_diagram.rendered_image
+
+    # ----------------------------------------------------------------------------------------------
+    def complete_refresh(self,
+                         diagram_codes: list[tuple[Diagram, str]],
+                         rendered_images: list | None,
+                         indicate_selection: bool,
+                         frame_snapshot: FrameSnapshot | None = None) -> bool:
+        if rendered_images is None:
+            self.drop_provisional_frame(frame_snapshot)
+            return False
+        self.commit_rendered_images(diagram_codes, rendered_images)
+        # The snapshot is committed with the images, so that clicks resolve against what is shown.
+        if frame_snapshot is not None and self.is_visual_refresh(diagram_codes):
+            self.frame_snapshot = frame_snapshot
+            self.pending_frame_snapshot = None
+            self.provisional_image = None
+        if indicate_selection and self.selection_indication_mode == SelectionIndicationMode.LOCAL:
+            self.update_selection_indication()
+        if self.on_diagrams_updated is not None:
+            self.on_diagrams_updated()
+        return True
+
+    # ----------------------------------------------------------------------------------------------
+    def validate_plantuml_code(self, plantuml_code: str, check_syntax_on_server: bool = False) -> PlantUMLDocument | None:
+        with span("manager.validate", "parse"):
+            document, issues = validate_plantuml_code(plantuml_code)
+        for issue in issues:
+            print(issue)
+        if has_errors(issues):
+            return None
+        if check_syntax_on_server and not self.check_syntax_on_server(plantuml_code):
+            return None
+        return document
+
+    # ----------------------------------------------------------------------------------------------
+    def check_syntax_on_server(self, plantuml_code: str) -> bool:
+        # The outcome is cached by content, so checking the same code again costs no render.
+        cache_key = RenderCache.get_key(plantuml_code, self.render_backend.get_cache_namespace(), "syntax")
+        outcome = self.syntax_check_cache.get(cache_key)
+        if outcome is None:
+            try:
+                self.render_backend.render(plantuml_code)
+                outcome = b"valid"
+            except RenderSyntaxError as e:
+                print(f"ERROR: invalid PlantUML code: {e}")
+                outcome = b"invalid"
+            except RenderUnavailableError as e:
+                # The code passed the local validation, so it is accepted without the server.
+                print(f"WARNING: syntax not checked on server: {e}")
+                return True
+            self.syntax_check_cache.put(cache_key, outcome)
+        return outcome == b"valid"
     
     # ----------------------------------------------------------------------------------------------
     def update_diagrams(self, action: EditActionType):
+        if self.transaction_depth > 0:
+            if (self.transaction_action is None or
+                    EDIT_ACTION_STRENGTHS[action] > EDIT_ACTION_STRENGTHS[self.transaction_action]):
+                self.transaction_action = action
+            return
 
-        standard_plantuml_code = self.get_plantuml_code(CodeType.STANDARD)
-        self.add_history(standard_plantuml_code)
+        with span("manager.update_diagrams", "edit", action=action.value):
+            standard_plantuml_code = self.get_plantuml_code(CodeType.STANDARD)
+            self.add_history(standard_plantuml_code)
 
-        if action == EditActionType.NON_VISUAL:
-            return
-        
-        plantuml_code = self.get_plantuml_code(CodeType.SELECTED)
-        self.selection_indication_diagram.set_plantuml_code(plantuml_code)        
+            if action == EditActionType.NON_VISUAL:
+                return
 
-        if action == EditActionType.SELECTION:
-            return
-        
-        plantuml_code = self.get_plantuml_code(CodeType.MASKED)
-        self.selection_mask_diagram.set_plantuml_code(plantuml_code)
+            self.refresh_diagrams(self.get_diagram_codes(action))
+
+    # ----------------------------------------------------------------------------------------------
+    @contextmanager
+    def transaction(self):
+        # The updates of all changes made within the (outermost) transaction are combined into one
+        # history entry and one render of each diagram that is needed by the strongest action.
+        self.transaction_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self.transaction_depth -= 1
+            if self.transaction_depth == 0:
+                self.transaction_action = None
+                self.set_elements(self.history.get_current())
+            raise
+        self.transaction_depth -= 1
+        if self.transaction_depth == 0 and self.transaction_action is not None:
+            action, self.transaction_action = self.transaction_action, None
+            self.update_diagrams(action)
+
+    # ----------------------------------------------------------------------------------------------
+    def get_selection_index(self) -> SelectionIndex | SvgSelectionIndex | None:
+        if self.image_format == "svg":
+            return self.get_svg_selection_index()
+        mask_image = self.selection_mask_diagram.rendered_image
+        if mask_image is None:
+            return None
+        if mask_image is not self.selection_index_source:
+            with span("manager.build_selection_index", "selection"):
+                self.selection_index = SelectionIndex(mask_image, self.get_frame_identifiers())
+            self.selection_index_source = mask_image
+        return self.selection_index
+
+    # ----------------------------------------------------------------------------------------------
+    def get_svg_selection_index(self) -> SvgSelectionIndex | None:
+        geometry = self.state_diagram.svg_geometry
+        if geometry is None:
+            return None
+        if geometry is not self.selection_index_source:
+            identifiers_by_shape_name = (self.frame_snapshot.identifiers_by_shape_name if self.frame_snapshot
+                                         else self.get_identifiers_by_shape_name())
+            self.selection_index = SvgSelectionIndex(geometry, identifiers_by_shape_name,
+                                                     self.state_diagram.rendered_image.size)
+            self.selection_index_source = geometry
+        return self.selection_index
+
+    # ----------------------------------------------------------------------------------------------
+    def get_identifiers_by_shape_name(self) -> dict[str, int]:
+        identifiers_by_name = {node.get_variable_name(): node.identifier for node in self.states + self.choice_points}
+        # The links between two nodes are numbered in the order of the transitions in the code.
+        link_counts = {}
+        for transition in self.transitions:
+            pair = tuple(sorted((transition.source, transition.target)))
+            occurrence = link_counts.get(pair, 0)
+            link_counts[pair] = occurrence + 1
+            identifiers_by_name[get_link_name(transition.source, transition.target, occurrence)] = transition.identifier
+        return identifiers_by_name
+
+    # ----------------------------------------------------------------------------------------------
+    def get_frame_identifiers(self) -> list[int]:
+        # The identifiers of the elements in the shown frame.
+        if self.frame_snapshot is not None:
+            return self.frame_snapshot.get_identifiers()
+        return list(self.registry.elements_by_identifier)
+
+    # ----------------------------------------------------------------------------------------------
+    def get_frame_element(self, identifier: int):
+        # The current element for an identifier of the shown frame, or None when it was deleted.
+        element = self.get_element_by_identifier(identifier)
+        if self.frame_snapshot is not None:
+            return self.frame_snapshot.resolve(identifier, element)
+        return element
 
     # ----------------------------------------------------------------------------------------------
     def get_element_at_coordinates(self, x: int, y: int):
-        rgb_color = self.selection_mask_diagram.rendered_image.getpixel((x, y))
-        if len(rgb_color) == 4:
-            rgb_color = rgb_color[:3]
-        index = rgb_color[0] * 256 * 256 + rgb_color[1] * 256 + rgb_color[2]
-        return self.elements[index] if 0 <= index < len(self.elements) else None
+        selection_index = self.get_selection_index()
+        if selection_index is None:
+            return None
+        identifier = selection_index.get_identifier_at(x, y)
+        return None if identifier is None else self.get_frame_element(identifier)
+
+    # ----------------------------------------------------------------------------------------------
+    def get_elements_in_rectangle(self, x0: int, y0: int, x1: int, y1: int, fully_contained: bool = True) -> list:
+        selection_index = self.get_selection_index()
+        if selection_index is None:
+            return []
+        identifiers = selection_index.get_identifiers_in_rectangle(x0, y0, x1, y1, fully_contained)
+        elements = [self.get_frame_element(identifier) for identifier in identifiers]
+        return [element for element in elements if element is not None]
+
+    # ----------------------------------------------------------------------------------------------
+    def get_nearest_element(self, x: int, y: int, max_distance: int = NEAREST_ELEMENT_DISTANCE):
+        selection_index = self.get_selection_index()
+        if selection_index is None:
+            return None
+        identifier = selection_index.get_nearest_identifier(x, y, max_distance)
+        return None if identifier is None else self.get_frame_element(identifier)
 
     # ----------------------------------------------------------------------------------------------
     def add_interface(self, interface_name: str) -> Interface | None:
-        if any(interface.name == interface_name for interface in self.interfaces):
+        if self.registry.get_interface(interface_name) is not None:
             return None
-        interface = Interface(interface_name, len(self.elements))
+        interface = Interface(interface_name, self.registry.allocate_identifier())
         self.interfaces.append(interface)
-        self.elements.append(interface)
+        self.registry.add(interface)
+        self.invalidate_plantuml_code(CodeSection.INTERFACES)
         return interface
 
     # ----------------------------------------------------------------------------------------------
     def add_message(self,
                     interface_name: str,
                     message_name: str) -> Message | None:
-        if any(message.interface == interface_name and message.name == message_name for message in self.messages):
+        if self.registry.get_message(interface_name, message_name) is not None:
             return None
-        message = Message(interface_name, message_name, len(self.elements))
+        message = Message(message_name, interface_name, self.registry.allocate_identifier())
         self.messages.append(message)
-        self.elements.append(message)
+        self.registry.add(message)
+        self.invalidate_plantuml_code(CodeSection.MESSAGES)
         return message
 
     # ----------------------------------------------------------------------------------------------
     def add_state(self, 
                   state_name: str,
                   display_name: str = "") -> State | None:
-        if any(state.name == state_name for state in self.states):
+        if self.registry.get_state_by_variable_name(state_name) is not None:
             return None
-        state = State(state_name, display_name, len(self.elements))
+        state = State(state_name, display_name, self.registry.allocate_identifier())
         self.states.append(state)
-        self.elements.append(state)
+        self.registry.add(state)
+        self.invalidate_plantuml_code(CodeSection.STATES)
         return state
 
     # ----------------------------------------------------------------------------------------------
     def add_choice_point(self, 
                          choice_point_name: str,
                          question: str = "") -> ChoicePoint | None:
-        if any(choice_point.name == choice_point_name for choice_point in self.choice_points):
+        if self.registry.get_choice_point_by_variable_name(f"CP_{choice_point_name}") is not None:
             return None
-        choice_point = ChoicePoint(choice_point_name, question, len(self.elements))
+        choice_point = ChoicePoint(choice_point_name, question, self.registry.allocate_identifier())
         self.choice_points.append(choice_point)
-        self.elements.append(choice_point)
+        self.registry.add(choice_point)
+        self.invalidate_plantuml_code(CodeSection.CHOICE_POINTS)
         return choice_point
 
     # ----------------------------------------------------------------------------------------------
     def add_transition(self, 
-                       source_state: State | ChoicePoint,
-                       target_state: State | ChoicePoint, 
-                       messages: set[Message] = set()) -> Transition:
-
-
+                       source_state: State | ChoicePoint | str,
+                       target_state: State | ChoicePoint | str, 
+                       messages: Iterable[Message | str] = ()) -> Transition:
         existing_transition = self.get_transition(source_state, target_state)
-        
-        
-        
-        
-        
-        
-        
-        
-        
-        
-        
-        
         if existing_transition is not None:
             return existing_transition
 
-
-        
-        transition = Transition(source_state, 
-                                target_state,
+        # Transitions refer to their source, target and messages by PlantUML variable names.
+        message_variable_names = [message if isinstance(message, str) else f"${message.get_variable_name()}"
+                                  for message in messages]
+        transition = Transition(self.get_node_variable_name(source_state), 
+                                self.get_node_variable_name(target_state),
                                 ConnectorType.LEFT,
                                 1,
-                                messages, 
-                                len(self.elements))
+                                message_variable_names, 
+                                self.registry.allocate_identifier())
         self.transitions.append(transition)
-        self.elements.append(transition)
+        self.registry.add(transition)
+        self.invalidate_plantuml_code(CodeSection.TRANSITIONS)
         return transition
 
     # ----------------------------------------------------------------------------------------------
@@ -413,17 +764,17 @@ class PlantUMLManager:
                      state: State,
                      new_name: str = None,
                      new_display_name: str = None) -> bool:
-        if any(other_state.name == new_name and other_state != state for other_state in self.states):
+        if new_name is not None and self.registry.get_state_by_variable_name(new_name) not in (None, state):
             return False
         if new_name is not None:
-            for transition in self.transitions:
-                if transition.source_name == state.name:
-                    transition.source_name = new_name
-                elif transition.target_name == state.name:
-                    transition.target_name = new_name
+            old_variable_name = state.get_variable_name()
+            self.registry.unindex_names(state)
             state.name = new_name
+            self.registry.index_names(state)
+            self.rename_transition_node(old_variable_name, state.get_variable_name())
         if new_display_name is not None:
             state.display_name = new_display_name
+        self.invalidate_plantuml_code(CodeSection.STATES)
         return True
 
     # ----------------------------------------------------------------------------------------------
@@ -431,15 +782,18 @@ class PlantUMLManager:
                             choice_point: ChoicePoint, 
                             new_name: str = None, 
                             new_question: str = None) -> bool:
-        if any(other_choice_point.name == new_name and other_choice_point != choice_point for other_choice_point in self.choice_points):
+        if (new_name is not None and
+                self.registry.get_choice_point_by_variable_name(f"CP_{new_name}") not in (None, choice_point)):
             return False
         if new_name is not None:
-            for transition in self.transitions:
-                if transition.source_name == choice_point.name:
-                    transition.source_name = new_name
+            old_variable_name = choice_point.get_variable_name()
+            self.registry.unindex_names(choice_point)
             choice_point.name = new_name
+            self.registry.index_names(choice_point)
+            self.rename_transition_node(old_variable_name, choice_point.get_variable_name())
         if new_question is not None:
             choice_point.question = new_question
+        self.invalidate_plantuml_code(CodeSection.CHOICE_POINTS)
         return True
 
     # ----------------------------------------------------------------------------------------------
@@ -453,9 +807,23 @@ class PlantUMLManager:
         if new_connector_length is not None:
             transition.connector_length = new_connector_length
         if new_messages is not None:
+            self.registry.unindex_names(transition)
             transition.messages = new_messages
+            self.registry.index_names(transition)
+        self.invalidate_plantuml_code(CodeSection.TRANSITIONS)
         return True
 
+    # ----------------------------------------------------------------------------------------------
+    def rename_transition_node(self, old_variable_name: str, new_variable_name: str):
+        for transition in self.registry.get_transitions_touching(old_variable_name):
+            self.registry.unindex_names(transition)
+            if transition.source == old_variable_name:
+                transition.source = new_variable_name
+            if transition.target == old_variable_name:
+                transition.target = new_variable_name
+            self.registry.index_names(transition)
+        self.invalidate_plantuml_code(CodeSection.TRANSITIONS)
+
     # ----------------------------------------------------------------------------------------------
     def select_elements(self, elements : list):
         identifiers = set()
@@ -493,122 +861,167 @@ class PlantUMLManager:
         else:
             for element in self.elements:
                 if element.element_type == element_type:
-                    self.selected_element_identifiers.remove(element.identifier)
+                    self.selected_element_identifiers.discard(element.identifier)
         self.update_diagrams(EditActionType.SELECTION)
 
     # ----------------------------------------------------------------------------------------------
     def notify_selection_change(self):
-        plantuml_code = self.get_plantuml_code(CodeType.SELECTED)
-        self.selection_indication_diagram.set_plantuml_code(plantuml_code)
+        self.update_selection_indication()
 
     # ----------------------------------------------------------------------------------------------
     def delete_elements(self, elements : list):
-        for element in elements:
-            match element.element_type:
-                case ElementType.INTERFACE:
-                    self.delete_interface(element)
-                case ElementType.MESSAGE:
-                    self.delete_message(element)
-                case ElementType.STATE:
-                    self.delete_state(element)
-                case ElementType.CHOICE_POINT:
-                    self.delete_choice_point(element)
-                case ElementType.TRANSITION:
-                    self.delete_transition(element)
-        self.update_diagrams(EditActionType.VISUAL)
+        with self.transaction():
+            for element in elements:
+                # An element may already be deleted along with an earlier one, e.g. a transition of a state.
+                if self.get_element_by_identifier(element.identifier) is not element:
+                    continue
+                match element.element_type:
+                    case ElementType.INTERFACE:
+                        self.delete_interface(element)
+                    case ElementType.MESSAGE:
+                        self.delete_message(element)
+                    case ElementType.STATE:
+                        self.delete_state(element)
+                    case ElementType.CHOICE_POINT:
+                        self.delete_choice_point(element)
+                    case ElementType.TRANSITION:
+                        self.delete_transition(element)
 
     # ----------------------------------------------------------------------------------------------
     def delete_interface(self, interface: Interface):
         self.interfaces.remove(interface)
-        for message in self.messages:
-            if message.interface == interface.name:
-                self.delete_message(message)
+        self.remove_element(interface)
+        self.invalidate_plantuml_code(CodeSection.INTERFACES)
+        for message in self.get_messages_by_interface(interface):
+            self.delete_message(message)
         self.update_diagrams(EditActionType.NON_VISUAL)
 
     # ----------------------------------------------------------------------------------------------
     def delete_message(self, message: Message):
         action = EditActionType.NON_VISUAL
         self.messages.remove(message)
-        for transition in self.transitions:
-            if message.get_variable_name() in transition.messages:
-                transition.messages.remove(message)
-                action = EditActionType.VISUAL
+        self.remove_element(message)
+        self.invalidate_plantuml_code(CodeSection.MESSAGES, CodeSection.TRANSITIONS)
+        message_variable_name = f"${message.get_variable_name()}"
+        for transition in self.registry.get_transitions_with_message(message_variable_name):
+            # The remaining messages keep their order, so the code of the transition stays the same.
+            remaining_messages = [name for name in transition.messages if name != message_variable_name]
+            self.update_transition(transition, new_messages=remaining_messages)
+            action = EditActionType.VISUAL
         self.update_diagrams(action)
 
     # ----------------------------------------------------------------------------------------------
     def delete_state(self, state: State):
         self.states.remove(state)
-        for transition in self.transitions:
-            if transition.source_name == state.name or transition.target_name == state.name:
-                self.delete_transition(transition)
+        self.remove_element(state)
+        self.invalidate_plantuml_code(CodeSection.STATES, CodeSection.TRANSITIONS)
+        self.remove_transitions(self.registry.get_transitions_touching(state.get_variable_name()))
         self.update_diagrams(EditActionType.VISUAL)
 
     # ----------------------------------------------------------------------------------------------
     def delete_choice_point(self, choice_point: ChoicePoint):
         self.choice_points.remove(choice_point)
-        for transition in self.transitions:
-            if transition.source_name == choice_point.name:
-                self.delete_transition(transition)
+        self.remove_element(choice_point)
+        self.invalidate_plantuml_code(CodeSection.CHOICE_POINTS, CodeSection.TRANSITIONS)
+        self.remove_transitions(self.registry.get_transitions_touching(choice_point.get_variable_name()))
         self.update_diagrams(EditActionType.VISUAL)
 
     # ----------------------------------------------------------------------------------------------
     def delete_transition(self, transition: Transition):
-        self.transitions.remove(transition)
+        self.remove_transitions([transition])
         self.update_diagrams(EditActionType.VISUAL)
 
+    # ----------------------------------------------------------------------------------------------
+    def remove_transitions(self, transitions: list[Transition]):
+        if not transitions:
+            return
+        # The list is filtered in one pass, instead of calling remove() for each transition.
+        removed_identifiers = set()
+        for transition in transitions:
+            self.remove_element(transition)
+            removed_identifiers.add(transition.identifier)
+        self.transitions[:] = [transition for transition in self.transitions
+                               if transition.identifier not in removed_identifiers]
+        self.invalidate_plantuml_code(CodeSection.TRANSITIONS)
+
+    # ----------------------------------------------------------------------------------------------
+    def remove_element(self, element: Element):
+        self.registry.remove(element)
+        self.selected_element_identifiers.discard(element.identifier)
+
     # ----------------------------------------------------------------------------------------------
     def add_history(self, plantuml_code: str):
-        self.history.append(plantuml_code)
-        self.current_history_index += 1
-        self.history = self.history[:self.current_history_index+1]
+        with span("manager.add_history", "edit"):
+            self.history.add(plantuml_code)
 
     # ----------------------------------------------------------------------------------------------
     def undo(self):
-        if self.current_history_index > 0:
-            self.current_history_index -= 1
-            self.set_plantuml_code(self.history[self.current_history_index])
+        plantuml_code = self.history.undo()
+        if plantuml_code is not None:
+            self.set_plantuml_code(plantuml_code)
 
     # ----------------------------------------------------------------------------------------------
     def redo(self):
-        if self.current_history_index == len(self.history):
-            return
-        self.current_history_index += 1
-        self.set_plantuml_code(self.history[self.current_history_index])
+        plantuml_code = self.history.redo()
+        if plantuml_code is not None:
+            self.set_plantuml_code(plantuml_code)
 
     # ----------------------------------------------------------------------------------------------
     def get_plantuml_code(self, code_type: CodeType) -> str:
-        if code_type == CodeType.MASKED:
-            plantuml_code = HEADER_MASKED_PLANTUML_CODE
-        else:
-            plantuml_code = HEADER_PLANTUML_CODE
-        
-        plantuml_code += DEFAULT_INTERFACES_PLANTUML_CODE + DEFAULT_MESSAGES_PLANTUML_CODE
-        
-        plantuml_code += "\n" + self.get_interfaces_plantuml_code()
-        plantuml_code += "\n" + self.get_messages_plantuml_code()
-        plantuml_code += "\n" + self.get_component_plantuml_code(code_type)
-        plantuml_code += "\n" + self.get_states_plantuml_code(code_type)
-        plantuml_code += "\n" + self.get_choice_points_plantuml_code(code_type)
-        plantuml_code += "\n" + self.get_transitions_plantuml_code(code_type)
-
-        plantuml_code += "\n" + FOOTER_PLANTUML_CODE
+        with span("manager.get_plantuml_code", "codegen"):
+            return self.create_plantuml_code(code_type)
+
+    # ----------------------------------------------------------------------------------------------
+    def create_plantuml_code(self, code_type: CodeType) -> str:
+        header_plantuml_code = HEADER_MASKED_PLANTUML_CODE if code_type == CodeType.MASKED else HEADER_PLANTUML_CODE
+        return "\n".join([header_plantuml_code + DEFAULT_INTERFACES_PLANTUML_CODE + DEFAULT_MESSAGES_PLANTUML_CODE,
+                          self.get_interfaces_plantuml_code(),
+                          self.get_messages_plantuml_code(),
+                          self.get_component_plantuml_code(code_type),
+                          self.get_states_plantuml_code(code_type),
+                          self.get_choice_points_plantuml_code(code_type),
+                          self.get_transitions_plantuml_code(code_type),
+                          FOOTER_PLANTUML_CODE])
+
+    # ----------------------------------------------------------------------------------------------
+    def invalidate_plantuml_code(self, *sections: CodeSection):
+        if not sections:
+            self.section_code_cache.clear()
+            return
+        for cache_key in list(self.section_code_cache):
+            if cache_key[0] in sections:
+                del self.section_code_cache[cache_key]
+
+    # ----------------------------------------------------------------------------------------------
+    def get_section_plantuml_code(self, section: CodeSection, code_type: CodeType | None, create_plantuml_code) -> str:
+        # The SELECTED code also depends on the selection, so that is stored along with it. So is the
+        # revision of the elements, which also catches changes that were made to elements directly.
+        selection = frozenset(self.selected_element_identifiers) if code_type == CodeType.SELECTED else None
+        revision = get_element_revision(CODE_SECTION_ELEMENT_CLASSES[section])
+        cached = self.section_code_cache.get((section, code_type))
+        if cached is not None and cached[0] == selection and cached[1] == revision:
+            return cached[2]
+        plantuml_code = create_plantuml_code(code_type)
+        self.section_code_cache[(section, code_type)] = (selection, revision, plantuml_code)
         return plantuml_code
 
+    # ----------------------------------------------------------------------------------------------
+    def get_element_code_type(self, element: Element, code_type: CodeType) -> CodeType:
+        if code_type == CodeType.SELECTED and element.identifier not in self.selected_element_identifiers:
+            return CodeType.STANDARD
+        return code_type
+
     # ----------------------------------------------------------------------------------------------
     def get_interfaces_plantuml_code(self) -> str:
-        plantuml_code = INTERFACES_PLANTUML_CODE
-        for interface in self.interfaces:
-            plantuml_code += f"{interface.get_plantuml_code()}\n"
-        return plantuml_code
+        return self.get_section_plantuml_code(CodeSection.INTERFACES, None, lambda code_type: "".join(
+            [INTERFACES_PLANTUML_CODE] + [f"{interface.get_plantuml_code()}\n" for interface in self.interfaces
+                                          if interface.name not in ("Timer", "Logical")]))
 
     # ----------------------------------------------------------------------------------------------
     def get_messages_plantuml_code(self) -> str:
-        plantuml_code = MESSAGES_PLANTUML_CODE
-        for message in self.messages:
-            if message.name == "Timeout" or message.name == "No" or message.name == "Yes":
-                continue
-            plantuml_code += f"{message.get_plantuml_code()}\n"
-        return plantuml_code
+        return self.get_section_plantuml_code(CodeSection.MESSAGES, None, lambda code_type: "".join(
+            [MESSAGES_PLANTUML_CODE] + [f"{message.get_plantuml_code()}\n" for message in self.messages
+                                        if message.name not in ("Timeout", "No", "Yes")]))
 
     # ----------------------------------------------------------------------------------------------
     def get_component_plantuml_code(self, code_type: CodeType) -> str:
@@ -621,36 +1034,25 @@ class PlantUMLManager:
 
     # ----------------------------------------------------------------------------------------------
     def get_states_plantuml_code(self, code_type: CodeType) -> str:
-        plantuml_code = STATES_PLANTUML_CODE
-        for state in self.states:
-            if state.name == "START":
-                continue
-            state_code_type = CodeType.SELECTED if code_type == CodeType.SELECTED and state.identifier in self.selected_element_identifiers else code_type
-            plantuml_code += f"{state.get_plantuml_code(state_code_type)}\n"
-        return plantuml_code
+        return self.get_section_plantuml_code(CodeSection.STATES, code_type, lambda code_type: "".join(
+            [STATES_PLANTUML_CODE] + [f"{state.get_plantuml_code(self.get_element_code_type(state, code_type))}\n"
+                                      for state in self.states if state.name != "START"]))
 
     # ----------------------------------------------------------------------------------------------
     def get_choice_points_plantuml_code(self, code_type: CodeType) -> str:
-        plantuml_code = CHOICE_POINTS_PLANTUML_CODE
-        for choice_point in self.choice_points:
-            choice_point_code_type = CodeType.SELECTED if code_type == CodeType.SELECTED and choice_point.identifier in self.selected_element_identifiers else code_type
-            plantuml_code += f"{choice_point.get_plantuml_code(choice_point_code_type)}\n"
-        return plantuml_code
+        return self.get_section_plantuml_code(CodeSection.CHOICE_POINTS, code_type, lambda code_type: "".join(
+            [CHOICE_POINTS_PLANTUML_CODE] + [f"{choice_point.get_plantuml_code(self.get_element_code_type(choice_point, code_type))}\n"
+                                             for choice_point in self.choice_points]))
 
     # ----------------------------------------------------------------------------------------------
     def get_transitions_plantuml_code(self, code_type: CodeType) -> str:
-        plantuml_code = TRANSITIONS_PLANTUML_CODE
-        for transition in self.transitions:
-            transition_code_type = CodeType.SELECTED if code_type == CodeType.SELECTED and transition.identifier in self.selected_element_identifiers else code_type
-            plantuml_code += f"{transition.get_plantuml_code(transition_code_type)}\n"
-        return plantuml_code
+        return self.get_section_plantuml_code(CodeSection.TRANSITIONS, code_type, lambda code_type: "".join(
+            [TRANSITIONS_PLANTUML_CODE] + [f"{transition.get_plantuml_code(self.get_element_code_type(transition, code_type))}\n"
+                                           for transition in self.transitions]))
     
     # ----------------------------------------------------------------------------------------------
     def get_element_by_identifier(self, identifier: int):
-        for element in self.elements:
-            if element.identifier == identifier:
-                return element
-        return None
+        return self.registry.get_element_by_identifier(identifier)
     
     # ----------------------------------------------------------------------------------------------
     def get_elements_by_type(self, element_type: ElementType) -> list:
@@ -662,10 +1064,7 @@ class PlantUMLManager:
     
     # ----------------------------------------------------------------------------------------------
     def get_interface(self, name: str) -> Interface | None:
-        for interface in self.interfaces:
-            if interface.name == name:
-                return interface
-        return None
+        return self.registry.get_interface(name)
     
     # ----------------------------------------------------------------------------------------------
     def get_message(self, name: str) -> Message | None:
@@ -684,10 +1083,7 @@ class PlantUMLManager:
     
     # ----------------------------------------------------------------------------------------------
     def get_message_by_variable_name(self, variable_name: str) -> Message | None:
-        for message in self.messages:
-            if message.get_variable_name() == variable_name:
-                return message
-        return None
+        return self.registry.get_message_by_variable_name(variable_name)
     
     # ----------------------------------------------------------------------------------------------
     def get_state(self, name: str) -> State | None:
@@ -698,10 +1094,7 @@ class PlantUMLManager:
     
     # ----------------------------------------------------------------------------------------------
     def get_state_by_variable_name(self, variable_name: str) -> State | None:
-        for state in self.states:
-            if state.get_variable_name() == variable_name:
-                return state
-        return None
+        return self.registry.get_state_by_variable_name(variable_name)
     
     # ----------------------------------------------------------------------------------------------
     def get_choice_point(self, question: str) -> ChoicePoint | None:
@@ -712,10 +1105,7 @@ class PlantUMLManager:
     
     # ----------------------------------------------------------------------------------------------
     def get_choice_point_by_variable_name(self, variable_name: str) -> ChoicePoint | None:
-        for choice_point in self.choice_points:
-            if choice_point.get_variable_name() == variable_name:
-                return choice_point
-        return None
+        return self.registry.get_choice_point_by_variable_name(variable_name)
     
     # ----------------------------------------------------------------------------------------------
     def get_element_by_variable_name(self, variable_name: str) -> Element | None:
@@ -732,23 +1122,37 @@ class PlantUMLManager:
 
     # ----------------------------------------------------------------------------------------------
     def get_transition(self, 
-                       source_state: State | ChoicePoint,
-                       target_state: State | ChoicePoint) -> Transition | None:
-        for transition in self.transitions:
-            if transition.source_state == source_state and transition.target_state == target_state:
+                       source_state: State | ChoicePoint | str,
+                       target_state: State | ChoicePoint | str) -> Transition | None:
+        target_variable_name = self.get_node_variable_name(target_state)
+        for transition in self.registry.get_transitions_from(self.get_node_variable_name(source_state)):
+            if transition.target == target_variable_name:
                 return transition
         return None
 
+    # ----------------------------------------------------------------------------------------------
+    def get_transitions(self, source: str | None = None, target: str | None = None) -> list[Transition]:
+        if source is None and target is None:
+            return list(self.transitions)
+        if target is None:
+            return self.registry.get_transitions_from(source)
+        if source is None:
+            return self.registry.get_transitions_to(target)
+        return [transition for transition in self.registry.get_transitions_from(source) if transition.target == target]
+
+    # ----------------------------------------------------------------------------------------------
+    @staticmethod
+    def get_node_variable_name(node: State | ChoicePoint | str) -> str:
+        return node if isinstance(node, str) else node.get_variable_name()
+
     # ----------------------------------------------------------------------------------------------
     def find_handled_messages(self, source: State | ChoicePoint ) -> list[Message]:
-        state_variable_name = source.get_variable_name()
         messages = []
-        for transition in self.transitions:
-            if transition.source == state_variable_name:
-                for message_variable_name in transition.messages:
-                    message = self.get_message_by_variable_name(message_variable_name)
-                    if message is not None:
-                        messages.append(message)
+        for transition in self.registry.get_transitions_from(source.get_variable_name()):
+            for message_variable_name in transition.messages:
+                message = self.get_message_by_variable_name(message_variable_name)
+                if message is not None:
+                    messages.append(message)
         return messages
     
     # ----------------------------------------------------------------------------------------------
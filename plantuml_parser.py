@@ -0,0 +1,185 @@
+# --------------------------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------------------------
+from elements import Element, Interface, Message, State, ChoicePoint, Transition
+
+from typing import Iterable, TextIO
+
+# --------------------------------------------------------------------------------------------------
+# Constants
+# --------------------------------------------------------------------------------------------------
+
+SECTION_START_INDICATOR = "'== "
+SECTION_END_INDICATOR = " =="
+
+FORMATTING_SECTION = "Formatting"
+DEFAULT_INTERFACES_SECTION = "Default interfaces"
+DEFAULT_MESSAGES_SECTION = "Default messages"
+INTERFACES_SECTION = "Interfaces"
+MESSAGES_SECTION = "Messages"
+COMPONENT_SECTION = "Component"
+STATES_SECTION = "States"
+CHOICE_POINTS_SECTION = "Choice-points"
+TRANSITIONS_SECTION = "Transitions"
+FOOTER_SECTION = "Footer"
+
+# The sections of the PlantUML code, in the order in which they must appear.
+SECTION_ORDER = [FORMATTING_SECTION, DEFAULT_INTERFACES_SECTION, DEFAULT_MESSAGES_SECTION, INTERFACES_SECTION,
+                 MESSAGES_SECTION, COMPONENT_SECTION, STATES_SECTION, CHOICE_POINTS_SECTION, TRANSITIONS_SECTION,
+                 FOOTER_SECTION]
+
+# The element class that parses the lines of each element section.
+SECTION_ELEMENT_CLASSES = {
+    INTERFACES_SECTION: Interface,
+    MESSAGES_SECTION: Message,
+    STATES_SECTION: State,
+    CHOICE_POINTS_SECTION: ChoicePoint,
+    TRANSITIONS_SECTION: Transition,
+}
+
+# --------------------------------------------------------------------------------------------------
+# Exceptions
+# --------------------------------------------------------------------------------------------------
+
+class PlantUMLParseError(Exception):
+
+    # ----------------------------------------------------------------------------------------------
+    def __init__(self, message: str, line_number: int, line: str = ""):
+        super().__init__(f"line {line_number}: {message}")
+        self.description = message
+        self.line_number = line_number
+        self.line = line
+
+# --------------------------------------------------------------------------------------------------
+# PlantUMLDocument
+# --------------------------------------------------------------------------------------------------
+
+class PlantUMLDocument:
+
+    # ----------------------------------------------------------------------------------------------
+    # The elements found in the sections of the PlantUML code, together with the line (number) of
+    # each element and the line number of the headers. Line numbers are 1-based.
+    # ----------------------------------------------------------------------------------------------
+
+    def __init__(self):
+        self.interfaces = []
+        self.messages = []
+        self.component_name = None
+        self.states = []
+        self.choice_points = []
+        self.transitions = []
+        self.section_line_numbers = {}
+        self.section_order = []
+        self.element_line_numbers = {}
+        self.element_lines = {}
+        self.line_count = 0
+        self.section_elements = {
+            INTERFACES_SECTION: self.interfaces,
+            MESSAGES_SECTION: self.messages,
+            STATES_SECTION: self.states,
+            CHOICE_POINTS_SECTION: self.choice_points,
+            TRANSITIONS_SECTION: self.transitions,
+        }
+
+    # ----------------------------------------------------------------------------------------------
+    def get_section_elements(self, section_name: str) -> list | None:
+        return self.section_elements.get(section_name)
+
+    # ----------------------------------------------------------------------------------------------
+    def get_line_number(self, element: Element) -> int | None:
+        return self.element_line_numbers.get(element)
+
+    # ----------------------------------------------------------------------------------------------
+    def get_line(self, element: Element) -> str | None:
+        return self.element_lines.get(element)
+
+# --------------------------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------------------------
+
+def get_section_name(line: str) -> str | None:
+    if line.startswith(SECTION_START_INDICATOR) and line.endswith(SECTION_END_INDICATOR):
+        return line[len(SECTION_START_INDICATOR):-len(SECTION_END_INDICATOR)]
+    return None
+
+# --------------------------------------------------------------------------------------------------
+def get_lines(source: str | TextIO | Iterable[str]) -> Iterable[str]:
+    # A string is walked line by line without splitting it into a list first.
+    if isinstance(source, str):
+        start = 0
+        while start <= len(source):
+            end = source.find("\n", start)
+            if end == -1:
+                yield source[start:]
+                return
+            yield source[start:end]
+            start = end + 1
+        return
+    for line in source:
+        yield line.rstrip("\r\n")
+
+# --------------------------------------------------------------------------------------------------
+def parse_plantuml_code(source: str | TextIO | Iterable[str]) -> PlantUMLDocument:
+    document = PlantUMLDocument()
+    section_name = None
+    # The elements of a section run from its header up to the first empty line or next header.
+    in_elements = False
+    # The (line number, line) pairs of the element section being read, parsed in one batch at its end.
+    section_lines = []
+
+    for line_number, line in enumerate(get_lines(source), start=1):
+        document.line_count = line_number
+        line = line.rstrip("\r")
+
+        header_section_name = get_section_name(line)
+        if header_section_name is not None:
+            parse_element_section(document, section_name, section_lines)
+            section_name = header_section_name
+            document.section_order.append((section_name, line_number))
+            # Only the first occurrence of a section is used, like str.find() did.
+            in_elements = section_name not in document.section_line_numbers
+            document.section_line_numbers.setdefault(section_name, line_number)
+            continue
+        if line == "" or line.startswith(SECTION_START_INDICATOR):
+            parse_element_section(document, section_name, section_lines)
+            in_elements = False
+            continue
+        if not in_elements:
+            continue
+
+        if section_name == COMPONENT_SECTION:
+            parse_component_line(document, line, line_number)
+            in_elements = False
+            continue
+
+        if section_name in SECTION_ELEMENT_CLASSES:
+            section_lines.append((line_number, line))
+
+    parse_element_section(document, section_name, section_lines)
+    return document
+
+# --------------------------------------------------------------------------------------------------
+def parse_component_line(document: PlantUMLDocument, line: str, line_number: int):
+    parts = line.split('"')
+    if len(parts) < 3:
+        raise PlantUMLParseError("component name must be quoted", line_number, line)
+    document.component_name = parts[1]
+
+# --------------------------------------------------------------------------------------------------
+def parse_element_section(document: PlantUMLDocument, section_name: str | None, section_lines: list):
+    # All lines of the section are parsed by one sweep of the compiled pattern of the element class.
+    # The lines are cleared, so that the next section starts empty.
+    if not section_lines:
+        return
+    element_class = SECTION_ELEMENT_CLASSES[section_name]
+    parsed_elements = element_class.from_plantuml_section("\n".join([line for _, line in section_lines]))
+    elements = document.get_section_elements(section_name)
+    for line_index, (line_number, line) in enumerate(section_lines):
+        if line_index >= len(parsed_elements) or parsed_elements[line_index][0] != line_index:
+            # The first line that did not match is reported.
+            raise PlantUMLParseError(f"invalid {element_class.__name__.lower()}", line_number, line)
+        element = parsed_elements[line_index][1]
+        elements.append(element)
+        document.element_line_numbers[element] = line_number
+        document.element_lines[element] = line
+    section_lines.clear()
@@ -0,0 +1,89 @@
+# --------------------------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------------------------
+from plantuml import deflate_and_encode
+
+import atexit
+import subprocess
+import time
+import urllib.request
+
+# --------------------------------------------------------------------------------------------------
+# Constants
+# --------------------------------------------------------------------------------------------------
+
+PLANTUML_JAR = "plantuml.jar"
+
+SERVER_STARTUP_TIMEOUT = 30.0
+SERVER_PROBE_INTERVAL = 0.1
+SERVER_PROBE_TIMEOUT = 2.0
+
+PROBE_PLANTUML_CODE = """@startuml
+@enduml"""
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# --------------------------------------------------------------------------------------------------
+# PlantUMLServer
+# --------------------------------------------------------------------------------------------------
+
+class PlantUMLServer:
+
+    # ----------------------------------------------------------------------------------------------
+    # Constructor
+    # ----------------------------------------------------------------------------------------------
+
+    def __init__(self, port: int, jar_path: str = PLANTUML_JAR):
+        self.port = port
+        self.jar_path = jar_path
+        self.process = None
+        self.attached = False
+
+    # ----------------------------------------------------------------------------------------------
+    def get_endpoint(self, image_format: str = "png") -> str:
+        return f"http://localhost:{self.port}/{image_format}/"
+
+    # ----------------------------------------------------------------------------------------------
+    def is_ready(self, timeout: float = SERVER_PROBE_TIMEOUT) -> bool:
+        url = self.get_endpoint() + deflate_and_encode(PROBE_PLANTUML_CODE)
+        try:
+            with urllib.request.urlopen(url, timeout=timeout) as response:
+                return response.status == 200 and response.read(len(PNG_SIGNATURE)) == PNG_SIGNATURE
+        except (OSError, ValueError):
+            return False
+
+    # ----------------------------------------------------------------------------------------------
+    def start(self, timeout: float = SERVER_STARTUP_TIMEOUT) -> bool:
+        if self.is_ready():
+            self.attached = True
+            return True
+
+        command = ["java", "-jar", self.jar_path, f"-picoweb:{self.port}"]
+        try:
+            self.process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except OSError as e:
+            print(f"ERROR: failed starting PlantUML server: {e}")
+            return False
+        atexit.register(self.stop)
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                print(f"ERROR: PlantUML server exited with code {self.process.returncode}")
+                return False
+            if self.is_ready():
+                return True
+            time.sleep(SERVER_PROBE_INTERVAL)
+
+        print(f"ERROR: PlantUML server not ready after {timeout} seconds")
+        return False
+
+    # ----------------------------------------------------------------------------------------------
+    def stop(self):
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
@@ -0,0 +1,154 @@
+# --------------------------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------------------------
+from plantuml_parser import PlantUMLDocument, PlantUMLParseError, parse_plantuml_code
+from plantuml_parser import SECTION_ORDER, COMPONENT_SECTION
+
+from enum import Enum
+from typing import Iterable, TextIO
+import re
+
+# --------------------------------------------------------------------------------------------------
+# Constants
+# --------------------------------------------------------------------------------------------------
+
+DEFAULT_INTERFACE_NAMES = {"Timer", "Logical"}
+DEFAULT_MESSAGE_VARIABLE_NAMES = {"Timer_Timeout", "Logical_No", "Logical_Yes"}
+# The diagrams refer to the default messages by their bare names as well.
+DEFAULT_MESSAGE_NAMES = {"Timeout", "No", "Yes"}
+START_STATE_NAME = "START"
+
+# The syntax of a line of each kind of element, as it is written by the get_plantuml_code() methods
+# in elements.py. Variables may be written with or without "$".
+INTERFACE_PATTERN = re.compile(r'!\$?\w+\s*=\s*\w+\s*')
+MESSAGE_PATTERN = re.compile(r'!\$?\w+_\w+\s*=\s*(?:\$?\w+\s*\+\s*":"\s*\+\s*)?\w+\s*')
+STATE_PATTERN = re.compile(r'state\s+\w+(?:\s+as\s+"[^"]*")?(?:\s+#\S+)?\s*')
+CHOICE_POINT_PATTERN = re.compile(r'state\s+CP_\w+\s+as\s+"[^"]*"(?:\s+#\S+)?\s*')
+TRANSITION_PATTERN = re.compile(r'\w+ -+(?:up|down|left|right)?-*> \w+(?: : \S.*)?')
+
+# --------------------------------------------------------------------------------------------------
+# Enums
+# --------------------------------------------------------------------------------------------------
+
+class ValidationSeverity(Enum):
+    ERROR = "error"
+    WARNING = "warning"
+
+# --------------------------------------------------------------------------------------------------
+# ValidationIssue
+# --------------------------------------------------------------------------------------------------
+
+class ValidationIssue:
+
+    # ----------------------------------------------------------------------------------------------
+    def __init__(self, severity: ValidationSeverity, message: str, line_number: int | None = None):
+        self.severity = severity
+        self.message = message
+        self.line_number = line_number
+
+    # ----------------------------------------------------------------------------------------------
+    def __str__(self) -> str:
+        location = f"line {self.line_number}: " if self.line_number is not None else ""
+        return f"{self.severity.name}: {location}{self.message}"
+
+# --------------------------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------------------------
+
+def has_errors(issues: list[ValidationIssue]) -> bool:
+    return any(issue.severity == ValidationSeverity.ERROR for issue in issues)
+
+# --------------------------------------------------------------------------------------------------
+def validate_plantuml_code(source: str | TextIO | Iterable[str]) -> tuple[PlantUMLDocument | None,
+                                                                           list[ValidationIssue]]:
+    try:
+        document = parse_plantuml_code(source)
+    except PlantUMLParseError as e:
+        return None, [ValidationIssue(ValidationSeverity.ERROR, e.description, e.line_number)]
+    return document, validate_plantuml_document(document)
+
+# --------------------------------------------------------------------------------------------------
+def validate_plantuml_document(document: PlantUMLDocument) -> list[ValidationIssue]:
+    issues = []
+    validate_section_order(document, issues)
+    validate_element_syntax(document, issues)
+    validate_references(document, issues)
+    return sorted(issues, key=lambda issue: issue.line_number or 0)
+
+# --------------------------------------------------------------------------------------------------
+def validate_section_order(document: PlantUMLDocument, issues: list[ValidationIssue]):
+    previous_position = -1
+    for section_name, line_number in document.section_order:
+        if section_name not in SECTION_ORDER:
+            continue
+        if document.section_line_numbers[section_name] != line_number:
+            issues.append(ValidationIssue(ValidationSeverity.ERROR, f"duplicate section '{section_name}'", line_number))
+            continue
+        position = SECTION_ORDER.index(section_name)
+        if position < previous_position:
+            issues.append(ValidationIssue(ValidationSeverity.ERROR,
+                                          f"section '{section_name}' must come before section "
+                                          f"'{SECTION_ORDER[previous_position]}'", line_number))
+        previous_position = max(previous_position, position)
+
+    for section_name in SECTION_ORDER:
+        if section_name not in document.section_line_numbers:
+            issues.append(ValidationIssue(ValidationSeverity.ERROR, f"missing section '{section_name}'"))
+    if COMPONENT_SECTION in document.section_line_numbers and document.component_name is None:
+        issues.append(ValidationIssue(ValidationSeverity.ERROR, "missing component",
+                                      document.section_line_numbers[COMPONENT_SECTION]))
+
+# --------------------------------------------------------------------------------------------------
+def validate_element_syntax(document: PlantUMLDocument, issues: list[ValidationIssue]):
+    for elements, pattern, kind in [(document.interfaces, INTERFACE_PATTERN, "interface"),
+                                    (document.messages, MESSAGE_PATTERN, "message"),
+                                    (document.states, STATE_PATTERN, "state"),
+                                    (document.choice_points, CHOICE_POINT_PATTERN, "choice-point"),
+                                    (document.transitions, TRANSITION_PATTERN, "transition")]:
+        for element in elements:
+            if not pattern.fullmatch(document.get_line(element)):
+                issues.append(ValidationIssue(ValidationSeverity.ERROR, f"invalid {kind} syntax",
+                                              document.get_line_number(element)))
+
+# --------------------------------------------------------------------------------------------------
+def validate_references(document: PlantUMLDocument, issues: list[ValidationIssue]):
+    # The default interfaces and messages may be defined again, but nothing else may be.
+    interface_names = set()
+    for interface in document.interfaces:
+        add_definition(interface_names, interface.name, "interface", document.get_line_number(interface), issues)
+    interface_names |= DEFAULT_INTERFACE_NAMES
+
+    message_variable_names = set()
+    for message in document.messages:
+        add_definition(message_variable_names, message.get_variable_name(), "message",
+                       document.get_line_number(message), issues)
+        if message.interface not in interface_names:
+            issues.append(ValidationIssue(ValidationSeverity.ERROR, f"undefined interface '{message.interface}'",
+                                          document.get_line_number(message)))
+    message_variable_names |= DEFAULT_MESSAGE_VARIABLE_NAMES | DEFAULT_MESSAGE_NAMES
+
+    node_variable_names = {START_STATE_NAME}
+    for node in document.states + document.choice_points:
+        add_definition(node_variable_names, node.get_variable_name(), "state", document.get_line_number(node), issues)
+
+    for transition in document.transitions:
+        line_number = document.get_line_number(transition)
+        for endpoint in (transition.source, transition.target):
+            if endpoint not in node_variable_names:
+                issues.append(ValidationIssue(ValidationSeverity.ERROR, f"undefined state '{endpoint}'", line_number))
+        # PlantUML shows an undefined variable as plain text, so this does not break the diagram.
+        for message_variable_name in get_message_variable_names(transition.messages):
+            if message_variable_name.removeprefix("$") not in message_variable_names:
+                issues.append(ValidationIssue(ValidationSeverity.WARNING,
+                                              f"undefined message '{message_variable_name}'", line_number))
+
+# --------------------------------------------------------------------------------------------------
+def add_definition(names: set, name: str, kind: str, line_number: int, issues: list[ValidationIssue]):
+    if name in names:
+        issues.append(ValidationIssue(ValidationSeverity.ERROR, f"duplicate {kind} '{name}'", line_number))
+    names.add(name)
+
+# --------------------------------------------------------------------------------------------------
+def get_message_variable_names(messages: set[str]) -> list[str]:
+    # Several messages of one transition are separated by a literal "\n" in the label.
+    return [name for messages_text in messages for name in messages_text.split("\\n") if name]
@@ -0,0 +1,424 @@
+# --------------------------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------------------------
+from plantuml import PlantUML
+from plantuml_server import PlantUMLServer
+from svg_geometry import is_svg_rasterization_available
+
+from enum import Enum
+from urllib.parse import urlsplit
+import atexit
+import httplib2
+import queue
+import random
+import subprocess
+import threading
+import time
+
+# --------------------------------------------------------------------------------------------------
+# Constants
+# --------------------------------------------------------------------------------------------------
+
+PLANTUML_JAR = "plantuml.jar"
+PLANTUML_PORT = 9000
+PIPE_WORKER_COUNT = 2
+PIPE_DELIMITER = b"___PLANTUML_DIAGRAM_DELIMITER___"
+PIPE_READ_SIZE = 65536
+
+# Retries of a render with exponential backoff and full jitter, all within the render deadline.
+RENDER_DEADLINE = 30.0
+RENDER_REQUEST_TIMEOUT = 10.0
+RETRY_MAX_ATTEMPTS = 6
+RETRY_BASE_DELAY = 0.05
+RETRY_MAX_DELAY = 2.0
+
+# Limits per PlantUML server, shared by all backends that render on that server.
+SERVER_MAX_IN_FLIGHT = 4
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_TIMEOUT = 10.0
+
+# HTTP statuses that indicate a busy or temporarily unavailable server.
+RETRYABLE_HTTP_STATUSES = {429, 502, 503, 504}
+
+# --------------------------------------------------------------------------------------------------
+# Enums
+# --------------------------------------------------------------------------------------------------
+
+class RenderBackendType(Enum):
+    HTTP = "http"
+    PIPE = "pipe"
+
+# --------------------------------------------------------------------------------------------------
+# Exceptions
+# --------------------------------------------------------------------------------------------------
+
+class RenderError(Exception):
+    pass
+
+class RenderSyntaxError(RenderError):
+    pass
+
+class RenderUnavailableError(RenderError):
+    pass
+
+class RenderTimeoutError(RenderUnavailableError):
+    pass
+
+class RenderCircuitOpenError(RenderUnavailableError):
+    pass
+
+# --------------------------------------------------------------------------------------------------
+# CircuitBreaker
+# --------------------------------------------------------------------------------------------------
+
+class CircuitBreaker:
+
+    # ----------------------------------------------------------------------------------------------
+    # After failure_threshold consecutive failures the circuit opens and requests fail right away.
+    # After reset_timeout one trial request is let through; its outcome closes or re-opens it.
+    # ----------------------------------------------------------------------------------------------
+
+    def __init__(self,
+                 failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failure_count = 0
+        self.opened_at = None
+        self.trial_in_progress = False
+        self.lock = threading.Lock()
+
+    # ----------------------------------------------------------------------------------------------
+    def is_open(self) -> bool:
+        with self.lock:
+            return self.opened_at is not None
+
+    # ----------------------------------------------------------------------------------------------
+    def allow_request(self) -> bool:
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.trial_in_progress or time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.trial_in_progress = True
+            return True
+
+    # ----------------------------------------------------------------------------------------------
+    def record_success(self):
+        with self.lock:
+            self.failure_count = 0
+            self.opened_at = None
+            self.trial_in_progress = False
+
+    # ----------------------------------------------------------------------------------------------
+    def record_failure(self):
+        with self.lock:
+            self.failure_count += 1
+            if self.trial_in_progress or self.failure_count >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial_in_progress = False
+
+# --------------------------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------------------------
+
+server_limits = {}
+server_limits_lock = threading.Lock()
+
+def get_server_limits(plantuml_endpoint: str) -> tuple[threading.BoundedSemaphore, CircuitBreaker]:
+    server = urlsplit(plantuml_endpoint).netloc
+    with server_limits_lock:
+        if server not in server_limits:
+            server_limits[server] = (threading.BoundedSemaphore(SERVER_MAX_IN_FLIGHT), CircuitBreaker())
+        return server_limits[server]
+
+# --------------------------------------------------------------------------------------------------
+def get_retry_delay(attempt: int) -> float:
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+# --------------------------------------------------------------------------------------------------
+# Base class
+# --------------------------------------------------------------------------------------------------
+
+class RenderBackend:
+
+    # ----------------------------------------------------------------------------------------------
+    def __init__(self, image_format: str):
+        self.image_format = image_format
+
+    # ----------------------------------------------------------------------------------------------
+    def get_cache_namespace(self) -> str:
+        raise NotImplementedError
+
+    # ----------------------------------------------------------------------------------------------
+    def render(self, code: str) -> bytes:
+        raise NotImplementedError
+
+    # ----------------------------------------------------------------------------------------------
+    def close(self):
+        pass
+
+# --------------------------------------------------------------------------------------------------
+# HttpRenderBackend
+# --------------------------------------------------------------------------------------------------
+
+class HttpRenderBackend(RenderBackend):
+
+    # ----------------------------------------------------------------------------------------------
+    def __init__(self, plantuml_endpoint: str, deadline: float = RENDER_DEADLINE):
+        super().__init__(plantuml_endpoint.rstrip("/").rsplit("/", 1)[-1])
+        self.plantuml_endpoint = plantuml_endpoint
+        self.deadline = deadline
+        self.semaphore, self.circuit_breaker = get_server_limits(plantuml_endpoint)
+        # httplib2 connections are not thread-safe, so each thread gets its own client.
+        self.clients = threading.local()
+
+    # ----------------------------------------------------------------------------------------------
+    def get_cache_namespace(self) -> str:
+        return self.plantuml_endpoint
+
+    # ----------------------------------------------------------------------------------------------
+    def get_client(self) -> PlantUML:
+        client = getattr(self.clients, "client", None)
+        if client is None:
+            client = PlantUML(url=self.plantuml_endpoint, http_opts={"timeout": RENDER_REQUEST_TIMEOUT})
+            self.clients.client = client
+        return client
+
+    # ----------------------------------------------------------------------------------------------
+    def render(self, code: str) -> bytes:
+        end_time = time.monotonic() + self.deadline
+        last_error = None
+        for attempt in range(RETRY_MAX_ATTEMPTS):
+            if attempt > 0:
+                delay = get_retry_delay(attempt)
+                if time.monotonic() + delay >= end_time:
+                    break
+                time.sleep(delay)
+            if not self.circuit_breaker.allow_request():
+                raise RenderCircuitOpenError(f"PlantUML server {self.plantuml_endpoint} keeps failing")
+            if not self.semaphore.acquire(timeout=max(end_time - time.monotonic(), 0)):
+                raise RenderTimeoutError(f"PlantUML server {self.plantuml_endpoint} is too busy")
+            try:
+                raw_image_data = self.request(code)
+            except RenderUnavailableError as e:
+                self.circuit_breaker.record_failure()
+                last_error = e
+                continue
+            except RenderSyntaxError:
+                # The server itself is fine.
+                self.circuit_breaker.record_success()
+                raise
+            except RenderError:
+                # E.g. an unexpected HTTP status; it is not retried, but a failed trial must
+                # still re-open the circuit.
+                self.circuit_breaker.record_failure()
+                raise
+            finally:
+                self.semaphore.release()
+            self.circuit_breaker.record_success()
+            return raw_image_data
+        raise RenderTimeoutError(f"rendering failed within the retry budget: {last_error}") from last_error
+
+    # ----------------------------------------------------------------------------------------------
+    def request(self, code: str) -> bytes:
+        client = self.get_client()
+        try:
+            response, content = client.http.request(client.get_url(code), **client.request_opts)
+        except (httplib2.HttpLib2Error, OSError) as e:
+            # E.g. a refused or reset connection (errno 54 on macOS) or a timeout.
+            raise RenderUnavailableError(e) from e
+        if response.status == 200:
+            return content
+        if response.status in RETRYABLE_HTTP_STATUSES:
+            raise RenderUnavailableError(f"HTTP {response.status}: {response.reason}")
+        if response.status == 400:
+            raise RenderSyntaxError(response.get("x-plantuml-diagram-error", "invalid PlantUML code"))
+        raise RenderError(f"HTTP {response.status}: {response.reason}")
+
+# --------------------------------------------------------------------------------------------------
+# PipeWorker
+# --------------------------------------------------------------------------------------------------
+
+class PipeWorker:
+
+    # ----------------------------------------------------------------------------------------------
+    # The standard output is read by a thread of its own, so that a render can wait for it with a
+    # deadline; a blocking read of a hanging JVM would otherwise never return.
+    # ----------------------------------------------------------------------------------------------
+
+    def __init__(self, jar_path: str, image_format: str):
+        self.image_format = image_format
+        self.process = subprocess.Popen(self.get_command(jar_path, image_format),
+                                        stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE,
+                                        stderr=subprocess.DEVNULL)
+        self.buffer = b""
+        self.chunks = queue.Queue()
+        self.reader = threading.Thread(target=self.read_output, name="PipeWorkerReader", daemon=True)
+        self.reader.start()
+
+    # ----------------------------------------------------------------------------------------------
+    @staticmethod
+    def get_command(jar_path: str, image_format: str) -> list[str]:
+        return ["java", "-Djava.awt.headless=true", "-jar", jar_path,
+                "-pipe", f"-t{image_format}", "-pipeNoStderr",
+                "-pipedelimitor", PIPE_DELIMITER.decode("ascii")]
+
+    # ----------------------------------------------------------------------------------------------
+    def read_output(self):
+        # An empty chunk marks the end of the output, i.e. the process exited.
+        while True:
+            try:
+                chunk = self.process.stdout.read1(PIPE_READ_SIZE)
+            except (OSError, ValueError):
+                chunk = b""
+            self.chunks.put(chunk)
+            if not chunk:
+                return
+
+    # ----------------------------------------------------------------------------------------------
+    def is_alive(self) -> bool:
+        return self.process.poll() is None
+
+    # ----------------------------------------------------------------------------------------------
+    def render(self, code: str, deadline: float = RENDER_DEADLINE) -> bytes:
+        end_time = time.monotonic() + deadline
+        self.process.stdin.write(code.encode("utf-8") + b"\n")
+        self.process.stdin.flush()
+
+        while PIPE_DELIMITER not in self.buffer:
+            try:
+                chunk = self.chunks.get(timeout=max(end_time - time.monotonic(), 0))
+            except queue.Empty:
+                # The output of the hanging render may still come, so the worker cannot be reused.
+                self.kill()
+                raise RenderTimeoutError(f"PlantUML pipe worker did not render within {deadline} seconds")
+            if not chunk:
+                raise RenderUnavailableError("PlantUML pipe worker exited")
+            self.buffer += chunk
+
+        output, self.buffer = self.buffer.split(PIPE_DELIMITER, 1)
+        self.buffer = self.buffer.lstrip(b"\r\n")
+        return self.get_image_data(output)
+
+    # ----------------------------------------------------------------------------------------------
+    def get_image_data(self, output: bytes) -> bytes:
+        if self.image_format == "svg":
+            image_end = output.rfind(b"</svg>")
+            image_end = image_end + len(b"</svg>") if image_end != -1 else -1
+        else:
+            image_end = output.rfind(b"IEND")
+            # The IEND chunk type is followed by its 4 byte CRC.
+            image_end = image_end + 8 if image_end != -1 else -1
+        image_data = output[:image_end] if image_end != -1 else b""
+        error_output = output[image_end:].strip() if image_end != -1 else output.strip()
+        if error_output.startswith(b"ERROR") or image_data.startswith(b"ERROR"):
+            raise RenderSyntaxError(error_output.decode("utf-8", errors="replace"))
+        if not image_data:
+            raise RenderError("PlantUML pipe worker returned no image")
+        return image_data
+
+    # ----------------------------------------------------------------------------------------------
+    def stop(self):
+        if not self.is_alive():
+            return
+        self.process.stdin.close()
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+    # ----------------------------------------------------------------------------------------------
+    def kill(self):
+        self.process.kill()
+        self.process.wait()
+
+# --------------------------------------------------------------------------------------------------
+# PipeRenderBackend
+# --------------------------------------------------------------------------------------------------
+
+class PipeRenderBackend(RenderBackend):
+
+    # ----------------------------------------------------------------------------------------------
+    def __init__(self,
+                 jar_path: str = PLANTUML_JAR,
+                 worker_count: int = PIPE_WORKER_COUNT,
+                 image_format: str = "png",
+                 deadline: float = RENDER_DEADLINE):
+        super().__init__(image_format)
+        self.jar_path = jar_path
+        self.deadline = deadline
+        self.workers = []
+        self.idle_workers = queue.Queue()
+        for _ in range(worker_count):
+            worker = self.create_worker()
+            self.workers.append(worker)
+            self.idle_workers.put(worker)
+        atexit.register(self.close)
+
+    # ----------------------------------------------------------------------------------------------
+    def get_cache_namespace(self) -> str:
+        return f"pipe:{self.jar_path}"
+
+    # ----------------------------------------------------------------------------------------------
+    def render(self, code: str) -> bytes:
+        worker = self.idle_workers.get()
+        try:
+            return worker.render(code, self.deadline)
+        except (OSError, RenderError) as e:
+            # A worker that broke down, timed out or lost track of the output cannot be reused.
+            if not worker.is_alive() or worker.buffer:
+                worker = self.replace_worker(worker)
+            if isinstance(e, OSError):
+                raise RenderUnavailableError(e) from e
+            raise
+        finally:
+            self.idle_workers.put(worker)
+
+    # ----------------------------------------------------------------------------------------------
+    def create_worker(self) -> PipeWorker:
+        return PipeWorker(self.jar_path, self.image_format)
+
+    # ----------------------------------------------------------------------------------------------
+    def replace_worker(self, worker: PipeWorker) -> PipeWorker:
+        worker.stop()
+        new_worker = self.create_worker()
+        self.workers[self.workers.index(worker)] = new_worker
+        return new_worker
+
+    # ----------------------------------------------------------------------------------------------
+    def close(self):
+        for worker in self.workers:
+            worker.stop()
+
+# --------------------------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------------------------
+
+def get_supported_image_format(image_format: str) -> str:
+    if image_format == "svg" and not is_svg_rasterization_available():
+        print("WARNING: cairosvg is not installed, falling back to PNG images")
+        return "png"
+    return image_format
+
+# --------------------------------------------------------------------------------------------------
+def start_plantuml_server(port: int, jar_path: str = PLANTUML_JAR) -> PlantUMLServer:
+    plantuml_server = PlantUMLServer(port, jar_path)
+    if not plantuml_server.start():
+        print(f"ERROR: no PlantUML server available on port {port}")
+    return plantuml_server
+
+# --------------------------------------------------------------------------------------------------
+def create_render_backend(render_backend_type: RenderBackendType,
+                          render_concurrency: int,
+                          image_format: str,
+                          port: int = PLANTUML_PORT,
+                          jar_path: str = PLANTUML_JAR) -> tuple[RenderBackend, PlantUMLServer | None]:
+    # The server is returned too, as the caller stops it; the pipe backend needs none.
+    match render_backend_type:
+        case RenderBackendType.PIPE:
+            return PipeRenderBackend(jar_path, render_concurrency, image_format), None
+        case RenderBackendType.HTTP:
+            plantuml_server = start_plantuml_server(port, jar_path)
+            return HttpRenderBackend(plantuml_server.get_endpoint(image_format)), plantuml_server
@@ -0,0 +1,116 @@
+# --------------------------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------------------------
+from collections import OrderedDict
+import hashlib
+import os
+import threading
+
+# --------------------------------------------------------------------------------------------------
+# Constants
+# --------------------------------------------------------------------------------------------------
+
+DEFAULT_MEMORY_CACHE_SIZE = 64
+DISK_CACHE_FILE_EXTENSION = ".bin"
+
+# --------------------------------------------------------------------------------------------------
+# RenderCache
+# --------------------------------------------------------------------------------------------------
+
+class RenderCache:
+
+    # ----------------------------------------------------------------------------------------------
+    # Constructor
+    # ----------------------------------------------------------------------------------------------
+
+    def __init__(self, max_entries: int = DEFAULT_MEMORY_CACHE_SIZE, directory: str | None = None):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+
+    # ----------------------------------------------------------------------------------------------
+    @staticmethod
+    def get_key(code: str, endpoint: str, image_format: str) -> str:
+        key_source = f"{endpoint}\n{image_format}\n{code}"
+        return hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+
+    # ----------------------------------------------------------------------------------------------
+    def get(self, key: str) -> bytes | None:
+        with self.lock:
+            data = self.entries.get(key)
+            if data is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return data
+        data = self.read_from_disk(key)
+        with self.lock:
+            if data is not None:
+                self.store_in_memory(key, data)
+                self.disk_hits += 1
+                return data
+            self.misses += 1
+        return None
+
+    # ----------------------------------------------------------------------------------------------
+    def put(self, key: str, data: bytes):
+        with self.lock:
+            self.store_in_memory(key, data)
+        self.write_to_disk(key, data)
+
+    # ----------------------------------------------------------------------------------------------
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.disk_hits = 0
+            self.misses = 0
+
+    # ----------------------------------------------------------------------------------------------
+    def get_statistics(self) -> dict:
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "entries": len(self.entries),
+            }
+
+    # ----------------------------------------------------------------------------------------------
+    def store_in_memory(self, key: str, data: bytes):
+        self.entries[key] = data
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    # ----------------------------------------------------------------------------------------------
+    def get_disk_path(self, key: str) -> str:
+        return os.path.join(self.directory, key + DISK_CACHE_FILE_EXTENSION)
+
+    # ----------------------------------------------------------------------------------------------
+    def read_from_disk(self, key: str) -> bytes | None:
+        if self.directory is None:
+            return None
+        try:
+            with open(self.get_disk_path(key), "rb") as file:
+                return file.read()
+        except OSError:
+            return None
+
+    # ----------------------------------------------------------------------------------------------
+    def write_to_disk(self, key: str, data: bytes):
+        if self.directory is None:
+            return
+        path = self.get_disk_path(key)
+        temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporary_path, "wb") as file:
+                file.write(data)
+            os.replace(temporary_path, path)
+        except OSError as e:
+            print(f"WARNING: failed writing render cache entry: {e}")
@@ -0,0 +1,164 @@
+# --------------------------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------------------------
+from diagram import Diagram
+
+from collections import deque
+from typing import Callable
+import queue
+import threading
+
+# --------------------------------------------------------------------------------------------------
+# Constants
+# --------------------------------------------------------------------------------------------------
+
+# How often (in milliseconds) the UI thread should call process_completions().
+RENDER_POLL_INTERVAL = 20
+
+# --------------------------------------------------------------------------------------------------
+# RenderRequest
+# --------------------------------------------------------------------------------------------------
+
+class RenderRequest:
+
+    # ----------------------------------------------------------------------------------------------
+    def __init__(self,
+                 diagram_codes: list[tuple[Diagram, str]],
+                 generations: dict[Diagram, int],
+                 on_complete: Callable,
+                 render_function: Callable | None = None,
+                 on_obsolete: Callable | None = None):
+        self.diagram_codes = diagram_codes
+        self.generations = generations
+        self.on_complete = on_complete
+        self.render_function = render_function
+        self.on_obsolete = on_obsolete
+
+# --------------------------------------------------------------------------------------------------
+# RenderScheduler
+# --------------------------------------------------------------------------------------------------
+
+class RenderScheduler:
+
+    # ----------------------------------------------------------------------------------------------
+    # Renders are done on a worker thread and delivered on the thread that calls
+    # process_completions(), i.e. the UI thread. Every submit increments the generation of the
+    # diagrams it renders, so a diagram of a request is obsolete as soon as a newer request renders
+    # it. Obsolete diagrams are skipped before rendering and dropped before delivery; the diagrams
+    # of the request that are still current are rendered and delivered. A request of which all
+    # diagrams are obsolete is dropped, which is reported on the UI thread too.
+    # One scheduler can serve several managers, each submitting with its own render function.
+    # ----------------------------------------------------------------------------------------------
+
+    def __init__(self, render_function: Callable[[list[tuple[Diagram, str]]], list | None] | None = None):
+        self.render_function = render_function
+        self.generations = {}
+        self.pending_requests = deque()
+        self.completions = queue.Queue()
+        self.busy = False
+        self.closed = False
+        self.condition = threading.Condition()
+        self.worker = threading.Thread(target=self.run, name="RenderScheduler", daemon=True)
+        self.worker.start()
+
+    # ----------------------------------------------------------------------------------------------
+    def submit(self,
+               diagram_codes: list[tuple[Diagram, str]],
+               on_complete: Callable[[list[tuple[Diagram, str]], list | None], None],
+               render_function: Callable[[list[tuple[Diagram, str]]], list | None] | None = None,
+               on_obsolete: Callable[[], None] | None = None):
+        with self.condition:
+            for diagram, _ in diagram_codes:
+                self.generations[diagram] = self.generations.get(diagram, 0) + 1
+            generations = {diagram: self.generations[diagram] for diagram, _ in diagram_codes}
+            self.pending_requests.append(RenderRequest(diagram_codes, generations, on_complete,
+                                                       render_function, on_obsolete))
+            self.condition.notify()
+
+    # ----------------------------------------------------------------------------------------------
+    def supersede(self, diagrams: list[Diagram]):
+        # Makes the renders of the diagrams obsolete without submitting a new one, e.g. because the
+        # diagrams were updated from the render cache.
+        with self.condition:
+            for diagram in diagrams:
+                self.generations[diagram] = self.generations.get(diagram, 0) + 1
+
+    # ----------------------------------------------------------------------------------------------
+    def forget(self, diagrams: list[Diagram]):
+        # Drops the generations and pending requests of diagrams that are no longer used, e.g. of a
+        # closed manager. A render of them that is running is obsolete, as after supersede().
+        with self.condition:
+            for diagram in diagrams:
+                self.generations.pop(diagram, None)
+            self.pending_requests = deque(request for request in self.pending_requests
+                                          if any(diagram not in diagrams for diagram, _ in request.diagram_codes))
+
+    # ----------------------------------------------------------------------------------------------
+    def get_current_indexes(self, request: RenderRequest) -> list[int]:
+        # The indexes in the diagram codes of the request of the diagrams that are still current.
+        with self.condition:
+            return [index for index, (diagram, _) in enumerate(request.diagram_codes)
+                    if self.generations.get(diagram) == request.generations[diagram]]
+
+    # ----------------------------------------------------------------------------------------------
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending_requests and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+                request = self.pending_requests.popleft()
+                self.busy = True
+            try:
+                current_indexes = self.get_current_indexes(request)
+                if current_indexes:
+                    diagram_codes = [request.diagram_codes[index] for index in current_indexes]
+                    render_function = request.render_function or self.render_function
+                    self.completions.put((request, current_indexes, render_function(diagram_codes)))
+                elif request.on_obsolete is not None:
+                    self.completions.put((request, [], None))
+            finally:
+                with self.condition:
+                    self.busy = False
+                    self.condition.notify_all()
+
+    # ----------------------------------------------------------------------------------------------
+    def process_completions(self) -> int:
+        delivered = 0
+        while True:
+            try:
+                request, rendered_indexes, rendered_images = self.completions.get_nowait()
+            except queue.Empty:
+                return delivered
+            # A newer request may have been submitted for some of the diagrams while they were rendered.
+            current_indexes = set(self.get_current_indexes(request))
+            delivered_positions = [position for position, index in enumerate(rendered_indexes)
+                                   if index in current_indexes]
+            if not delivered_positions:
+                if request.on_obsolete is not None:
+                    request.on_obsolete()
+                continue
+            diagram_codes = [request.diagram_codes[rendered_indexes[position]] for position in delivered_positions]
+            if rendered_images is not None:
+                rendered_images = [rendered_images[position] for position in delivered_positions]
+            request.on_complete(diagram_codes, rendered_images)
+            delivered += 1
+
+    # ----------------------------------------------------------------------------------------------
+    def is_idle(self) -> bool:
+        with self.condition:
+            return not self.pending_requests and not self.busy and self.completions.empty()
+
+    # ----------------------------------------------------------------------------------------------
+    def wait_until_rendered(self, timeout: float | None = None) -> bool:
+        with self.condition:
+            return self.condition.wait_for(lambda: not self.pending_requests and not self.busy, timeout)
+
+    # ----------------------------------------------------------------------------------------------
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.pending_requests.clear()
+            self.condition.notify_all()
+        self.worker.join(timeout=5)
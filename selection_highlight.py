@@ -0,0 +1,94 @@
+# --------------------------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------------------------
+from PIL import Image
+import numpy as np
+
+# --------------------------------------------------------------------------------------------------
+# Constants
+# --------------------------------------------------------------------------------------------------
+
+HIGHLIGHT_COLOR = (255, 0, 0)
+HIGHLIGHT_OPACITY = 0.85
+HIGHLIGHT_OUTLINE_WIDTH = 2
+
+# A provisional frame is faded towards white, with the changed elements tinted.
+PROVISIONAL_FADE = 0.3
+PROVISIONAL_COLOR = (255, 160, 0)
+PROVISIONAL_OPACITY = 0.5
+
+# --------------------------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------------------------
+
+def dilate(mask: np.ndarray, radius: int) -> np.ndarray:
+    # A square structuring element is separable, so two passes of 1D shifts suffice.
+    result = mask.copy()
+    for offset in range(1, radius + 1):
+        result[offset:, :] |= mask[:-offset, :]
+        result[:-offset, :] |= mask[offset:, :]
+    horizontal = result.copy()
+    for offset in range(1, radius + 1):
+        result[:, offset:] |= horizontal[:, :-offset]
+        result[:, :-offset] |= horizontal[:, offset:]
+    return result
+
+# --------------------------------------------------------------------------------------------------
+def select_identifiers(labels: np.ndarray, identifiers: set) -> np.ndarray:
+    if not identifiers:
+        return np.zeros(labels.shape, dtype=bool)
+    return np.isin(labels, np.fromiter(identifiers, dtype=labels.dtype, count=len(identifiers)))
+
+# --------------------------------------------------------------------------------------------------
+def compose_selection_image(standard_image: Image.Image | None,
+                            labels: np.ndarray | None,
+                            outlined_identifiers: set,
+                            recolored_identifiers: set = frozenset()) -> Image.Image | None:
+    if standard_image is None or labels is None or standard_image.size != (labels.shape[1], labels.shape[0]):
+        return None
+
+    composed = np.array(standard_image.convert("RGB"))
+    if not outlined_identifiers and not recolored_identifiers:
+        return Image.fromarray(composed)
+
+    highlight = np.array(HIGHLIGHT_COLOR, dtype=np.float32)
+
+    # Shapes get a band along their border, like the "#line:FF0000;line.bold" of the SELECTED code.
+    outlined = select_identifiers(labels, outlined_identifiers)
+    outline = dilate(outlined, HIGHLIGHT_OUTLINE_WIDTH) & dilate(~outlined, 1)
+    if outline.any():
+        pixels = composed[outline].astype(np.float32)
+        composed[outline] = (pixels + (highlight - pixels) * HIGHLIGHT_OPACITY).astype(np.uint8)
+
+    # Arrows are much thinner than their mask, so only the dark pixels inside the mask are tinted.
+    recolored = dilate(select_identifiers(labels, recolored_identifiers), 1)
+    if recolored.any():
+        pixels = composed[recolored].astype(np.float32)
+        darkness = 1 - pixels.mean(axis=1, keepdims=True) / 255
+        composed[recolored] = (pixels + (highlight - pixels) * darkness).astype(np.uint8)
+
+    return Image.fromarray(composed)
+
+# --------------------------------------------------------------------------------------------------
+def compose_provisional_image(standard_image: Image.Image | None,
+                              labels: np.ndarray | None,
+                              changed_identifiers: set) -> Image.Image | None:
+    # The previous image, shown while the render of an edit is in flight. Without labels that fit
+    # the image only the fading is done.
+    if standard_image is None:
+        return None
+
+    composed = np.array(standard_image.convert("RGB"))
+    fade = int(PROVISIONAL_FADE * 256)
+    composed += ((255 - composed.astype(np.uint16)) * fade >> 8).astype(np.uint8)
+
+    if labels is None or standard_image.size != (labels.shape[1], labels.shape[0]):
+        return Image.fromarray(composed)
+
+    changed = dilate(select_identifiers(labels, changed_identifiers), 1)
+    if changed.any():
+        color = np.array(PROVISIONAL_COLOR, dtype=np.float32)
+        pixels = composed[changed].astype(np.float32)
+        composed[changed] = (pixels + (color - pixels) * PROVISIONAL_OPACITY).astype(np.uint8)
+
+    return Image.fromarray(composed)
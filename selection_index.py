@@ -0,0 +1,231 @@
+# --------------------------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------------------------
+from elements import MASK_CHANNEL_BITS, MASK_CHANNEL_TOLERANCE, MASK_CODE_MODULUS, MASK_CODE_MULTIPLIER
+from elements import get_mask_level_value, get_mask_value_level
+from svg_geometry import SvgGeometry
+
+from PIL import Image
+import math
+import numpy as np
+
+# --------------------------------------------------------------------------------------------------
+# Constants
+# --------------------------------------------------------------------------------------------------
+
+NO_IDENTIFIER = -1
+
+CHANNEL_LEVELS = np.array([get_mask_value_level(value) for value in range(256)], dtype=np.int32)
+BLENDED_VALUES = np.array([abs(value - get_mask_level_value(get_mask_value_level(value))) > MASK_CHANNEL_TOLERANCE
+                           for value in range(256)])
+RED_CODES = CHANNEL_LEVELS << (2 * MASK_CHANNEL_BITS)
+GREEN_CODES = CHANNEL_LEVELS << MASK_CHANNEL_BITS
+BLUE_CODES = CHANNEL_LEVELS
+
+# --------------------------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------------------------
+
+def get_mask_codes(rgb: np.ndarray) -> np.ndarray:
+    # Vectorised counterpart of get_mask_identifier() in elements.py, stopping at the code.
+    red, green, blue = (rgb[..., channel] for channel in range(3))
+    codes = RED_CODES[red] | GREEN_CODES[green] | BLUE_CODES[blue]
+    blended = BLENDED_VALUES[red] | BLENDED_VALUES[green] | BLENDED_VALUES[blue]
+    codes[blended] = MASK_CODE_MODULUS
+    return codes
+
+# --------------------------------------------------------------------------------------------------
+def get_code_lookup_table(valid_identifiers: np.ndarray) -> np.ndarray:
+    lookup_table = np.full(MASK_CODE_MODULUS + 1, NO_IDENTIFIER, dtype=np.int32)
+    valid_identifiers = valid_identifiers[(valid_identifiers >= 0) & (valid_identifiers < MASK_CODE_MODULUS)]
+    lookup_table[valid_identifiers * MASK_CODE_MULTIPLIER % MASK_CODE_MODULUS] = valid_identifiers
+    return lookup_table
+
+# --------------------------------------------------------------------------------------------------
+# FrameSnapshot
+# --------------------------------------------------------------------------------------------------
+
+class FrameSnapshot:
+
+    # ----------------------------------------------------------------------------------------------
+    # The elements as they were when the code of a frame was generated, i.e. what the image and
+    # mask of the frame show. While the next render is in flight, the identifiers found in the
+    # shown mask are resolved through the snapshot, so that a click never lands on an element that
+    # took over the identifier, e.g. after an undo renumbered the elements.
+    # ----------------------------------------------------------------------------------------------
+
+    def __init__(self, elements: list, identifiers_by_shape_name: dict[str, int] | None = None):
+        self.elements_by_identifier = {element.identifier: element for element in elements}
+        self.element_codes = {element.identifier: element.get_plantuml_code() for element in elements}
+        self.identifiers_by_shape_name = identifiers_by_shape_name
+
+    # ----------------------------------------------------------------------------------------------
+    def get_identifiers(self) -> list[int]:
+        return list(self.elements_by_identifier)
+
+    # ----------------------------------------------------------------------------------------------
+    def is_unchanged(self, identifier: int, current_element) -> bool:
+        return (current_element is not None and identifier in self.element_codes and
+                current_element.get_plantuml_code() == self.element_codes[identifier])
+
+    # ----------------------------------------------------------------------------------------------
+    def resolve(self, identifier: int, current_element):
+        # The element shown under the identifier if it still exists: the same object, possibly
+        # edited since, or an element with the same code, e.g. after the code was loaded again.
+        frame_element = self.elements_by_identifier.get(identifier)
+        if frame_element is None or current_element is None:
+            return None
+        if current_element is frame_element or self.is_unchanged(identifier, current_element):
+            return current_element
+        return None
+
+    # ----------------------------------------------------------------------------------------------
+    def get_changed_identifiers(self, get_current_element) -> set[int]:
+        # The elements of the frame that were edited or deleted since.
+        return {identifier for identifier in self.elements_by_identifier
+                if not self.is_unchanged(identifier, get_current_element(identifier))}
+
+# --------------------------------------------------------------------------------------------------
+# SelectionIndex
+# --------------------------------------------------------------------------------------------------
+
+class SelectionIndex:
+
+    # ----------------------------------------------------------------------------------------------
+    # Constructor
+    # ----------------------------------------------------------------------------------------------
+
+    def __init__(self, mask_image: Image.Image, identifiers: list[int]):
+        self.labels = self.get_labels(mask_image, np.array(sorted(set(identifiers)), dtype=np.int64))
+        self.identifiers, self.pixel_counts, self.bounding_boxes = self.get_statistics(self.labels)
+        self.rows = {identifier: row for row, identifier in enumerate(self.identifiers.tolist())}
+
+    # ----------------------------------------------------------------------------------------------
+    @staticmethod
+    def get_labels(mask_image: Image.Image, valid_identifiers: np.ndarray) -> np.ndarray:
+        # A pixel is only labelled when its colour is an exact mask colour within the channel tolerance.
+        # Blended edge pixels are not snapped to a nearby identifier, since a blend of two colours may
+        # be close to the colour of a third element; they become background, like colours of unknown
+        # identifiers. A point on such an edge can still be resolved with get_nearest_identifier().
+        codes = get_mask_codes(np.asarray(mask_image.convert("RGB")))
+        return get_code_lookup_table(valid_identifiers)[codes]
+
+    # ----------------------------------------------------------------------------------------------
+    @staticmethod
+    def get_statistics(labels: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        ys, xs = np.nonzero(labels != NO_IDENTIFIER)
+        pixel_labels = labels[ys, xs]
+        order = np.argsort(pixel_labels, kind="stable")
+        pixel_labels, ys, xs = pixel_labels[order], ys[order], xs[order]
+        if len(pixel_labels) == 0:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int64), np.empty((0, 4), dtype=np.int64)
+
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(pixel_labels)) + 1))
+        identifiers = pixel_labels[starts]
+        pixel_counts = np.diff(np.append(starts, len(pixel_labels)))
+        bounding_boxes = np.stack([np.minimum.reduceat(xs, starts),
+                                   np.minimum.reduceat(ys, starts),
+                                   np.maximum.reduceat(xs, starts) + 1,
+                                   np.maximum.reduceat(ys, starts) + 1], axis=1)
+        return identifiers, pixel_counts, bounding_boxes
+
+    # ----------------------------------------------------------------------------------------------
+    def get_size(self) -> tuple[int, int]:
+        return self.labels.shape[1], self.labels.shape[0]
+
+    # ----------------------------------------------------------------------------------------------
+    def get_identifier_at(self, x: int, y: int) -> int | None:
+        if not (0 <= y < self.labels.shape[0] and 0 <= x < self.labels.shape[1]):
+            return None
+        identifier = int(self.labels[y, x])
+        return None if identifier == NO_IDENTIFIER else identifier
+
+    # ----------------------------------------------------------------------------------------------
+    def get_bounding_box(self, identifier: int) -> tuple[int, int, int, int] | None:
+        row = self.rows.get(identifier)
+        return None if row is None else tuple(self.bounding_boxes[row].tolist())
+
+    # ----------------------------------------------------------------------------------------------
+    def get_pixel_count(self, identifier: int) -> int:
+        row = self.rows.get(identifier)
+        return 0 if row is None else int(self.pixel_counts[row])
+
+    # ----------------------------------------------------------------------------------------------
+    def get_identifiers_in_rectangle(self,
+                                     x0: int, y0: int, x1: int, y1: int,
+                                     fully_contained: bool = True) -> list[int]:
+        x0, x1 = sorted((x0, x1))
+        y0, y1 = sorted((y0, y1))
+        boxes = self.bounding_boxes
+        if fully_contained:
+            inside = (boxes[:, 0] >= x0) & (boxes[:, 1] >= y0) & (boxes[:, 2] <= x1) & (boxes[:, 3] <= y1)
+            return self.identifiers[inside].tolist()
+        window = self.labels[max(y0, 0):max(y1, 0), max(x0, 0):max(x1, 0)]
+        identifiers = np.unique(window)
+        return identifiers[identifiers != NO_IDENTIFIER].tolist()
+
+    # ----------------------------------------------------------------------------------------------
+    def get_nearest_identifier(self, x: int, y: int, max_distance: int) -> int | None:
+        identifier = self.get_identifier_at(x, y)
+        if identifier is not None:
+            return identifier
+        left, top = max(x - max_distance, 0), max(y - max_distance, 0)
+        window = self.labels[top:y + max_distance + 1, left:x + max_distance + 1]
+        ys, xs = np.nonzero(window != NO_IDENTIFIER)
+        if len(ys) == 0:
+            return None
+        distances = (xs + left - x) ** 2 + (ys + top - y) ** 2
+        nearest = distances.argmin()
+        if distances[nearest] > max_distance ** 2:
+            return None
+        return int(window[ys[nearest], xs[nearest]])
+
+# --------------------------------------------------------------------------------------------------
+# SvgSelectionIndex
+# --------------------------------------------------------------------------------------------------
+
+class SvgSelectionIndex:
+
+    # ----------------------------------------------------------------------------------------------
+    # The same queries as SelectionIndex, answered from the geometry of an SVG render instead of a
+    # MASKED render. The labels are only drawn when the selection highlight needs them.
+    # ----------------------------------------------------------------------------------------------
+
+    def __init__(self, geometry: SvgGeometry, identifiers_by_name: dict[str, int], size: tuple[int, int]):
+        self.geometry = geometry
+        self.identifiers_by_name = identifiers_by_name
+        self.names_by_identifier = {identifier: name for name, identifier in identifiers_by_name.items()}
+        self.names = set(identifiers_by_name)
+        self.size = size
+        self.label_image = None
+
+    # ----------------------------------------------------------------------------------------------
+    @property
+    def labels(self) -> np.ndarray:
+        if self.label_image is None:
+            self.label_image = self.geometry.draw_labels(self.identifiers_by_name, self.size, NO_IDENTIFIER)
+        return self.label_image
+
+    # ----------------------------------------------------------------------------------------------
+    def get_size(self) -> tuple[int, int]:
+        return self.size
+
+    # ----------------------------------------------------------------------------------------------
+    def get_identifier_at(self, x: int, y: int) -> int | None:
+        return self.identifiers_by_name.get(self.geometry.get_name_at(x, y, self.names))
+
+    # ----------------------------------------------------------------------------------------------
+    def get_bounding_box(self, identifier: int) -> tuple[int, int, int, int] | None:
+        box = self.geometry.get_bounding_box(self.names_by_identifier.get(identifier))
+        return None if box is None else (math.floor(box[0]), math.floor(box[1]), math.ceil(box[2]), math.ceil(box[3]))
+
+    # ----------------------------------------------------------------------------------------------
+    def get_identifiers_in_rectangle(self,
+                                     x0: int, y0: int, x1: int, y1: int,
+                                     fully_contained: bool = True) -> list[int]:
+        names = self.geometry.get_names_in_rectangle(x0, y0, x1, y1, fully_contained)
+        return sorted(self.identifiers_by_name[name] for name in names if name in self.identifiers_by_name)
+
+    # ----------------------------------------------------------------------------------------------
+    def get_nearest_identifier(self, x: int, y: int, max_distance: int) -> int | None:
+        return self.identifiers_by_name.get(self.geometry.get_nearest_name(x, y, max_distance, self.names))
@@ -0,0 +1,414 @@
+# --------------------------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------------------------
+from PIL import Image, ImageDraw
+import io
+import math
+import re
+import xml.etree.ElementTree as ElementTree
+import numpy as np
+
+# cairosvg is optional; without it SVG output cannot be displayed, only measured.
+try:
+    import cairosvg
+except ImportError:
+    cairosvg = None
+
+# --------------------------------------------------------------------------------------------------
+# Constants
+# --------------------------------------------------------------------------------------------------
+
+SVG_NAMESPACE = "{http://www.w3.org/2000/svg}"
+
+# The key under which Diagram attaches the geometry to the image rasterized from the same SVG.
+SVG_GEOMETRY_INFO_KEY = "svg_geometry"
+
+GEOMETRY_GRID_CELL_SIZE = 64
+
+# A link is hit within this distance of its line, which matches the thickness=8 of the MASKED code.
+LINK_HIT_DISTANCE = 4
+
+BEZIER_SEGMENTS = 8
+ELLIPSE_SEGMENTS = 16
+
+# The part of the font size that a text extends below its baseline.
+TEXT_DESCENT = 0.3
+
+ENTITY_GROUP_CLASSES = {"entity", "start_entity", "end_entity", "cluster"}
+
+PATH_TOKEN_PATTERN = re.compile(r'[MmLlHhVvCcQqZz]|[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+ENTITY_COMMENT_PATTERN = re.compile(r'(?:entity|class|cluster)\s+(\S+)\s*$')
+LINK_COMMENT_PATTERN = re.compile(r'link\s+(\S+)\s+to\s+(\S+)\s*$')
+
+# --------------------------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------------------------
+
+def is_svg_rasterization_available() -> bool:
+    return cairosvg is not None
+
+# --------------------------------------------------------------------------------------------------
+def rasterize_svg(svg_data: bytes) -> Image.Image:
+    if cairosvg is None:
+        raise RuntimeError("cairosvg is required to rasterize SVG images")
+    return Image.open(io.BytesIO(cairosvg.svg2png(bytestring=svg_data)))
+
+# --------------------------------------------------------------------------------------------------
+def get_entity_name(name: str) -> str:
+    # Nested states may be qualified by their parents; the variable names in elements.py are not.
+    return name.rsplit(".", 1)[-1]
+
+# --------------------------------------------------------------------------------------------------
+def get_link_name(entity_name_1: str, entity_name_2: str, occurrence: int) -> str:
+    # PlantUML may swap the ends of a link (e.g. for "-up->"), so the key does not depend on the order.
+    first, second = sorted((entity_name_1, entity_name_2))
+    return f"{first}--{second}#{occurrence}"
+
+# --------------------------------------------------------------------------------------------------
+def get_length(value: str | None) -> float:
+    if not value:
+        return 0.0
+    return float(re.match(r'[-+]?(?:\d+\.?\d*|\.\d+)', value.strip()).group(0))
+
+# --------------------------------------------------------------------------------------------------
+def get_segment_distance(x: float, y: float, start: tuple, end: tuple) -> float:
+    (x0, y0), (x1, y1) = start, end
+    dx, dy = x1 - x0, y1 - y0
+    length_squared = dx * dx + dy * dy
+    t = 0.0 if length_squared == 0 else max(0.0, min(1.0, ((x - x0) * dx + (y - y0) * dy) / length_squared))
+    return math.hypot(x - (x0 + t * dx), y - (y0 + t * dy))
+
+# --------------------------------------------------------------------------------------------------
+def get_path_points(path_data: str) -> list[list[tuple[float, float]]]:
+    # Curves are flattened, so a path becomes one or more polylines.
+    polylines = []
+    points = []
+    tokens = PATH_TOKEN_PATTERN.findall(path_data)
+    x = y = start_x = start_y = 0.0
+    command = None
+    index = 0
+
+    def read(count: int) -> list[float]:
+        nonlocal index
+        values = [float(token) for token in tokens[index:index + count]]
+        index += count
+        return values
+
+    while index < len(tokens):
+        if tokens[index].isalpha():
+            command = tokens[index]
+            index += 1
+        if command is None:
+            break
+        relative = command.islower()
+        offset_x, offset_y = (x, y) if relative else (0.0, 0.0)
+        match command.upper():
+            case "M":
+                if len(points) > 1:
+                    polylines.append(points)
+                x, y = (value + offset for value, offset in zip(read(2), (offset_x, offset_y)))
+                start_x, start_y = x, y
+                points = [(x, y)]
+                # Further coordinate pairs of a move are lines.
+                command = "l" if relative else "L"
+            case "L":
+                x, y = (value + offset for value, offset in zip(read(2), (offset_x, offset_y)))
+                points.append((x, y))
+            case "H":
+                x = read(1)[0] + offset_x
+                points.append((x, y))
+            case "V":
+                y = read(1)[0] + offset_y
+                points.append((x, y))
+            case "C" | "Q":
+                count = 6 if command.upper() == "C" else 4
+                values = read(count)
+                controls = [(x, y)] + [(values[i] + offset_x, values[i + 1] + offset_y) for i in range(0, count, 2)]
+                for step in range(1, BEZIER_SEGMENTS + 1):
+                    points.append(get_bezier_point(controls, step / BEZIER_SEGMENTS))
+                x, y = controls[-1]
+            case "Z":
+                points.append((start_x, start_y))
+                x, y = start_x, start_y
+                command = None
+            case _:
+                index += 1
+    if len(points) > 1:
+        polylines.append(points)
+    return polylines
+
+# --------------------------------------------------------------------------------------------------
+def get_bezier_point(controls: list[tuple[float, float]], t: float) -> tuple[float, float]:
+    while len(controls) > 1:
+        controls = [((1 - t) * x0 + t * x1, (1 - t) * y0 + t * y1)
+                    for (x0, y0), (x1, y1) in zip(controls, controls[1:])]
+    return controls[0]
+
+# --------------------------------------------------------------------------------------------------
+def get_polygon_points(points: str) -> list[tuple[float, float]]:
+    values = [float(value) for value in re.findall(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?', points)]
+    return list(zip(values[0::2], values[1::2]))
+
+# --------------------------------------------------------------------------------------------------
+def get_ellipse_points(cx: float, cy: float, rx: float, ry: float) -> list[tuple[float, float]]:
+    return [(cx + rx * math.cos(2 * math.pi * step / ELLIPSE_SEGMENTS),
+             cy + ry * math.sin(2 * math.pi * step / ELLIPSE_SEGMENTS)) for step in range(ELLIPSE_SEGMENTS)]
+
+# --------------------------------------------------------------------------------------------------
+def get_rectangle_points(x: float, y: float, width: float, height: float) -> list[tuple[float, float]]:
+    return [(x, y), (x + width, y), (x + width, y + height), (x, y + height)]
+
+# --------------------------------------------------------------------------------------------------
+def get_element_shapes(name: str, element: ElementTree.Element) -> list:
+    tag = element.tag.removeprefix(SVG_NAMESPACE)
+    get = element.attrib.get
+    match tag:
+        case "rect":
+            return [SvgShape(name, get_rectangle_points(get_length(get("x")), get_length(get("y")),
+                                                        get_length(get("width")), get_length(get("height"))), True)]
+        case "ellipse" | "circle":
+            radius = get_length(get("r"))
+            return [SvgShape(name, get_ellipse_points(get_length(get("cx")), get_length(get("cy")),
+                                                      get_length(get("rx")) or radius,
+                                                      get_length(get("ry")) or radius), True)]
+        case "polygon":
+            points = get_polygon_points(get("points", ""))
+            return [SvgShape(name, points, True)] if len(points) > 2 else []
+        case "polyline":
+            points = get_polygon_points(get("points", ""))
+            return [SvgShape(name, points, False)] if len(points) > 1 else []
+        case "line":
+            return [SvgShape(name, [(get_length(get("x1")), get_length(get("y1"))),
+                                    (get_length(get("x2")), get_length(get("y2")))], False)]
+        case "path":
+            return [SvgShape(name, points, False) for points in get_path_points(get("d", ""))]
+        case "text":
+            # The text runs from its anchor at the baseline, which is good enough to click on a label.
+            font_size = get_length(get("font-size")) or 12
+            text_length = get_length(get("textLength")) or 0.6 * font_size * len("".join(element.itertext()))
+            x, y = get_length(get("x")), get_length(get("y"))
+            return [SvgShape(name, get_rectangle_points(x, y - font_size, text_length,
+                                                        font_size * (1 + TEXT_DESCENT)), True)]
+    return []
+
+# --------------------------------------------------------------------------------------------------
+# SvgShape
+# --------------------------------------------------------------------------------------------------
+
+class SvgShape:
+
+    # ----------------------------------------------------------------------------------------------
+    # A filled shape is hit inside its polygon, a line is hit within LINK_HIT_DISTANCE of it.
+    # ----------------------------------------------------------------------------------------------
+
+    def __init__(self, name: str, points: list[tuple[float, float]], filled: bool):
+        self.name = name
+        self.points = points
+        self.filled = filled
+        margin = 0 if filled else LINK_HIT_DISTANCE
+        xs = [x for x, _ in points]
+        ys = [y for _, y in points]
+        self.bounding_box = (min(xs) - margin, min(ys) - margin, max(xs) + margin, max(ys) + margin)
+        self.area = self.get_area() if filled else 0.0
+
+    # ----------------------------------------------------------------------------------------------
+    def get_area(self) -> float:
+        return abs(sum(x0 * y1 - x1 * y0 for (x0, y0), (x1, y1) in zip(self.points, self.points[1:] + self.points[:1]))) / 2
+
+    # ----------------------------------------------------------------------------------------------
+    def get_edges(self) -> list[tuple[tuple, tuple]]:
+        edges = list(zip(self.points, self.points[1:]))
+        if self.filled:
+            edges.append((self.points[-1], self.points[0]))
+        return edges
+
+    # ----------------------------------------------------------------------------------------------
+    def contains(self, x: float, y: float) -> bool:
+        if self.filled:
+            inside = False
+            for (x0, y0), (x1, y1) in self.get_edges():
+                if (y0 > y) != (y1 > y) and x < x0 + (y - y0) * (x1 - x0) / (y1 - y0):
+                    inside = not inside
+            return inside
+        return self.get_distance(x, y) <= LINK_HIT_DISTANCE
+
+    # ----------------------------------------------------------------------------------------------
+    def get_distance(self, x: float, y: float) -> float:
+        if self.filled and self.contains(x, y):
+            return 0.0
+        distance = min(get_segment_distance(x, y, start, end) for start, end in self.get_edges())
+        return distance if self.filled else max(distance - LINK_HIT_DISTANCE, 0.0)
+
+# --------------------------------------------------------------------------------------------------
+# SvgGeometry
+# --------------------------------------------------------------------------------------------------
+
+class SvgGeometry:
+
+    # ----------------------------------------------------------------------------------------------
+    # The shapes of the entities and links in a PlantUML SVG image, named after the variable names
+    # in elements.py. The shapes are kept in a uniform grid, so a point query only tests the shapes
+    # in one cell. Where shapes overlap, the smallest one wins, e.g. a state over its component.
+    # ----------------------------------------------------------------------------------------------
+
+    def __init__(self, shapes: list[SvgShape], width: int, height: int):
+        self.shapes = shapes
+        self.width = width
+        self.height = height
+        self.shapes_by_name = {}
+        self.grid = {}
+        for shape in shapes:
+            self.shapes_by_name.setdefault(shape.name, []).append(shape)
+            for cell in self.get_cells(*shape.bounding_box):
+                self.grid.setdefault(cell, []).append(shape)
+
+    # ----------------------------------------------------------------------------------------------
+    @classmethod
+    def from_svg(cls, svg_data: bytes | str):
+        try:
+            root = ElementTree.fromstring(svg_data, ElementTree.XMLParser(
+                target=ElementTree.TreeBuilder(insert_comments=True)))
+        except ElementTree.ParseError as e:
+            raise ValueError(f"invalid SVG: {e}") from e
+        width, height = cls.get_size(root)
+        shapes = []
+        cls.collect_shapes(root, None, {}, shapes)
+        return cls(shapes, width, height)
+
+    # ----------------------------------------------------------------------------------------------
+    @staticmethod
+    def get_size(root: ElementTree.Element) -> tuple[int, int]:
+        width, height = get_length(root.get("width")), get_length(root.get("height"))
+        if (not width or not height) and root.get("viewBox"):
+            _, _, width, height = (float(value) for value in root.get("viewBox").replace(",", " ").split())
+        return math.ceil(width), math.ceil(height)
+
+    # ----------------------------------------------------------------------------------------------
+    @classmethod
+    def collect_shapes(cls, parent: ElementTree.Element, name: str | None, link_counts: dict, shapes: list):
+        # Newer PlantUML versions name the groups with data-entity attributes, older versions
+        # precede the shapes of an entity or link with a comment.
+        for element in parent:
+            if element.tag is ElementTree.Comment:
+                name = cls.get_comment_name(element.text or "", link_counts, name)
+                continue
+            if element.tag.removeprefix(SVG_NAMESPACE) == "g":
+                group_name = cls.get_group_name(element, link_counts)
+                cls.collect_shapes(element, group_name or name, link_counts, shapes)
+                continue
+            if name is not None:
+                shapes.extend(get_element_shapes(name, element))
+
+    # ----------------------------------------------------------------------------------------------
+    @staticmethod
+    def get_group_name(group: ElementTree.Element, link_counts: dict) -> str | None:
+        group_class = group.get("class")
+        if group_class in ENTITY_GROUP_CLASSES and group.get("data-entity"):
+            return get_entity_name(group.get("data-entity"))
+        if group_class == "link" and group.get("data-entity-1") and group.get("data-entity-2"):
+            return SvgGeometry.count_link(get_entity_name(group.get("data-entity-1")),
+                                          get_entity_name(group.get("data-entity-2")), link_counts)
+        return None
+
+    # ----------------------------------------------------------------------------------------------
+    @staticmethod
+    def get_comment_name(comment: str, link_counts: dict, name: str | None) -> str | None:
+        # The comment may start with an MD5 line, the description is on the last line.
+        description = comment.strip().rsplit("\n", 1)[-1]
+        link_match = LINK_COMMENT_PATTERN.match(description)
+        if link_match:
+            return SvgGeometry.count_link(get_entity_name(link_match.group(1)),
+                                          get_entity_name(link_match.group(2)), link_counts)
+        entity_match = ENTITY_COMMENT_PATTERN.match(description)
+        if entity_match:
+            return get_entity_name(entity_match.group(1))
+        return name
+
+    # ----------------------------------------------------------------------------------------------
+    @staticmethod
+    def count_link(entity_name_1: str, entity_name_2: str, link_counts: dict) -> str:
+        pair = tuple(sorted((entity_name_1, entity_name_2)))
+        occurrence = link_counts.get(pair, 0)
+        link_counts[pair] = occurrence + 1
+        return get_link_name(entity_name_1, entity_name_2, occurrence)
+
+    # ----------------------------------------------------------------------------------------------
+    def get_cells(self, x0: float, y0: float, x1: float, y1: float) -> list[tuple[int, int]]:
+        return [(column, row)
+                for column in range(math.floor(x0 / GEOMETRY_GRID_CELL_SIZE), math.floor(x1 / GEOMETRY_GRID_CELL_SIZE) + 1)
+                for row in range(math.floor(y0 / GEOMETRY_GRID_CELL_SIZE), math.floor(y1 / GEOMETRY_GRID_CELL_SIZE) + 1)]
+
+    # ----------------------------------------------------------------------------------------------
+    def get_candidates(self, x0: float, y0: float, x1: float, y1: float) -> list[SvgShape]:
+        candidates = {}
+        for cell in self.get_cells(x0, y0, x1, y1):
+            for shape in self.grid.get(cell, []):
+                candidates[id(shape)] = shape
+        return list(candidates.values())
+
+    # ----------------------------------------------------------------------------------------------
+    def get_names(self) -> list[str]:
+        return list(self.shapes_by_name)
+
+    # ----------------------------------------------------------------------------------------------
+    def get_bounding_box(self, name: str) -> tuple[float, float, float, float] | None:
+        shapes = self.shapes_by_name.get(name)
+        if not shapes:
+            return None
+        boxes = [shape.bounding_box for shape in shapes]
+        return (min(box[0] for box in boxes), min(box[1] for box in boxes),
+                max(box[2] for box in boxes), max(box[3] for box in boxes))
+
+    # ----------------------------------------------------------------------------------------------
+    def get_name_at(self, x: float, y: float, names: set | None = None) -> str | None:
+        hits = [shape for shape in self.get_candidates(x, y, x, y)
+                if (names is None or shape.name in names) and shape.contains(x, y)]
+        return min(hits, key=lambda shape: shape.area).name if hits else None
+
+    # ----------------------------------------------------------------------------------------------
+    def get_names_in_rectangle(self,
+                               x0: float, y0: float, x1: float, y1: float,
+                               fully_contained: bool = True) -> list[str]:
+        x0, x1 = sorted((x0, x1))
+        y0, y1 = sorted((y0, y1))
+        names = set()
+        if fully_contained:
+            for name in self.shapes_by_name:
+                box = self.get_bounding_box(name)
+                if box[0] >= x0 and box[1] >= y0 and box[2] <= x1 and box[3] <= y1:
+                    names.add(name)
+        else:
+            for shape in self.get_candidates(x0, y0, x1, y1):
+                box = shape.bounding_box
+                if box[0] <= x1 and box[2] >= x0 and box[1] <= y1 and box[3] >= y0:
+                    names.add(shape.name)
+        return sorted(names)
+
+    # ----------------------------------------------------------------------------------------------
+    def get_nearest_name(self, x: float, y: float, max_distance: float, names: set | None = None) -> str | None:
+        name = self.get_name_at(x, y, names)
+        if name is not None:
+            return name
+        nearest_name, nearest_distance = None, max_distance
+        for shape in self.get_candidates(x - max_distance, y - max_distance, x + max_distance, y + max_distance):
+            if names is not None and shape.name not in names:
+                continue
+            distance = shape.get_distance(x, y)
+            if distance <= nearest_distance:
+                nearest_name, nearest_distance = shape.name, distance
+        return nearest_name
+
+    # ----------------------------------------------------------------------------------------------
+    def draw_labels(self, identifiers_by_name: dict[str, int], size: tuple[int, int], background: int) -> np.ndarray:
+        # A label image like the one decoded from the MASKED render, for the selection highlight.
+        labels_image = Image.new("I", size, background)
+        draw = ImageDraw.Draw(labels_image)
+        shapes = [shape for shape in self.shapes if shape.name in identifiers_by_name]
+        # The smallest shapes are drawn last, so they are on top, like in get_name_at().
+        for shape in sorted(shapes, key=lambda shape: -shape.area):
+            identifier = identifiers_by_name[shape.name]
+            if shape.filled:
+                draw.polygon(shape.points, fill=identifier)
+            else:
+                draw.line(shape.points, fill=identifier, width=2 * LINK_HIT_DISTANCE, joint="curve")
+        return np.asarray(labels_image, dtype=np.int32)
@@ -0,0 +1,194 @@
+from benchmark import BenchmarkManager, StubRenderBackend
+from element_registry import ElementRegistry
+from plantuml_manager import PlantUMLManager
+
+# --------------------------------------------------------------------------------------------------
+# The indexes of the registry of a manager are compared with those of a registry that is built
+# from scratch from the element lists of the manager.
+# --------------------------------------------------------------------------------------------------
+
+def create_manager() -> PlantUMLManager:
+    plantuml_manager = BenchmarkManager(StubRenderBackend())
+    with open("diagrams/node.puml", "r") as file:
+        assert plantuml_manager.load_diagram(file.read())
+    return plantuml_manager
+
+# --------------------------------------------------------------------------------------------------
+def get_indexes(registry: ElementRegistry) -> dict:
+    # The elements are compared by identity, the groups of transitions as sets.
+    return {
+        "elements_by_identifier": {key: id(element) for key, element in registry.elements_by_identifier.items()},
+        "interfaces_by_name": {key: id(element) for key, element in registry.interfaces_by_name.items()},
+        "messages_by_key": {key: id(element) for key, element in registry.messages_by_key.items()},
+        "messages_by_variable_name": {key: id(element) for key, element in registry.messages_by_variable_name.items()},
+        "states_by_variable_name": {key: id(element) for key, element in registry.states_by_variable_name.items()},
+        "choice_points_by_variable_name": {key: id(element)
+                                           for key, element in registry.choice_points_by_variable_name.items()},
+        "transitions_by_source": {key: set(group) for key, group in registry.transitions_by_source.items()},
+        "transitions_by_target": {key: set(group) for key, group in registry.transitions_by_target.items()},
+        "transitions_by_message": {key: set(group) for key, group in registry.transitions_by_message.items()},
+    }
+
+# --------------------------------------------------------------------------------------------------
+def check_registry(plantuml_manager: PlantUMLManager):
+    expected_registry = ElementRegistry()
+    for element in (plantuml_manager.interfaces + plantuml_manager.messages + plantuml_manager.states +
+                    plantuml_manager.choice_points + plantuml_manager.transitions):
+        expected_registry.add(element)
+    indexes = get_indexes(plantuml_manager.registry)
+    expected_indexes = get_indexes(expected_registry)
+    for name, expected_index in expected_indexes.items():
+        assert indexes[name] == expected_index, name
+
+# --------------------------------------------------------------------------------------------------
+def get_transition_codes(transitions: list) -> set[str]:
+    return {transition.get_plantuml_code() for transition in transitions}
+
+# --------------------------------------------------------------------------------------------------
+def test_load():
+    plantuml_manager = create_manager()
+    check_registry(plantuml_manager)
+    assert len(plantuml_manager.registry) == len(plantuml_manager.elements)
+    plantuml_manager.cleanup()
+
+# --------------------------------------------------------------------------------------------------
+def test_add():
+    plantuml_manager = create_manager()
+    interface = plantuml_manager.add_interface("Power")
+    message = plantuml_manager.add_message("Power", "Off")
+    state = plantuml_manager.add_state("Sleeping", "Sleeping")
+    choice_point = plantuml_manager.add_choice_point("Charged", "Is it\\ncharged?")
+    transition = plantuml_manager.add_transition("Connecting", state, [message])
+    plantuml_manager.add_transition(state, choice_point)
+    check_registry(plantuml_manager)
+
+    assert plantuml_manager.get_interface("Power") is interface
+    assert plantuml_manager.get_message_by_variable_name("$Power_Off") is message
+    assert plantuml_manager.get_state_by_variable_name("Sleeping") is state
+    assert plantuml_manager.get_choice_point_by_variable_name("CP_Charged") is choice_point
+    assert plantuml_manager.get_transition("Connecting", state) is transition
+    assert plantuml_manager.registry.get_transitions_with_message("$Power_Off") == [transition]
+
+    # Adding an element that exists changes nothing.
+    assert plantuml_manager.add_interface("Power") is None
+    assert plantuml_manager.add_state("Sleeping") is None
+    assert plantuml_manager.add_transition("Connecting", state) is transition
+    check_registry(plantuml_manager)
+    plantuml_manager.cleanup()
+
+# --------------------------------------------------------------------------------------------------
+def test_delete_cascade():
+    plantuml_manager = create_manager()
+    state = plantuml_manager.get_state_by_variable_name("ServerConnected")
+    plantuml_manager.delete_elements([state])
+    check_registry(plantuml_manager)
+    assert plantuml_manager.get_state_by_variable_name("ServerConnected") is None
+    assert plantuml_manager.registry.get_transitions_touching("ServerConnected") == []
+    assert all("ServerConnected" not in (transition.source, transition.target)
+               for transition in plantuml_manager.transitions)
+
+    choice_point = plantuml_manager.get_choice_point_by_variable_name("CP_Whitelisted")
+    plantuml_manager.delete_elements([choice_point])
+    check_registry(plantuml_manager)
+    assert plantuml_manager.registry.get_transitions_touching("CP_Whitelisted") == []
+
+    # Deleting an interface deletes its messages, which are removed from the transitions.
+    interface = plantuml_manager.get_interface("RTx")
+    plantuml_manager.delete_elements([interface])
+    check_registry(plantuml_manager)
+    assert plantuml_manager.registry.get_transitions_with_message("$RTx_ConnectReq") == []
+    assert all(not message.startswith("$RTx_")
+               for transition in plantuml_manager.transitions for message in transition.messages)
+    plantuml_manager.cleanup()
+
+# --------------------------------------------------------------------------------------------------
+def test_rename():
+    plantuml_manager = create_manager()
+    state = plantuml_manager.get_state_by_variable_name("Connecting")
+    touching_identifiers = {transition.identifier
+                            for transition in plantuml_manager.registry.get_transitions_touching("Connecting")}
+    assert plantuml_manager.update_state(state, new_name="Pairing")
+    check_registry(plantuml_manager)
+    assert plantuml_manager.get_state_by_variable_name("Connecting") is None
+    assert plantuml_manager.get_state_by_variable_name("Pairing") is state
+    assert plantuml_manager.registry.get_transitions_touching("Connecting") == []
+    assert {transition.identifier
+            for transition in plantuml_manager.registry.get_transitions_touching("Pairing")} == touching_identifiers
+
+    # A name that is taken is refused.
+    assert not plantuml_manager.update_state(state, new_name="Advertising")
+    check_registry(plantuml_manager)
+
+    choice_point = plantuml_manager.get_choice_point_by_variable_name("CP_Whitelisted")
+    assert plantuml_manager.update_choice_point(choice_point, new_name="Allowed")
+    check_registry(plantuml_manager)
+    assert plantuml_manager.registry.get_transitions_touching("CP_Whitelisted") == []
+    assert len(plantuml_manager.registry.get_transitions_touching("CP_Allowed")) == 3
+
+    transition = plantuml_manager.get_transition("Advertising", "Advertising")
+    plantuml_manager.update_transition(transition, new_messages=["$RTx_DisconnectInd"])
+    check_registry(plantuml_manager)
+    assert transition not in plantuml_manager.registry.get_transitions_with_message("$Timeout")
+    assert transition in plantuml_manager.registry.get_transitions_with_message("$RTx_DisconnectInd")
+    plantuml_manager.cleanup()
+
+# --------------------------------------------------------------------------------------------------
+def test_undo_and_redo():
+    plantuml_manager = create_manager()
+    original_transitions = get_transition_codes(plantuml_manager.get_transitions())
+    plantuml_manager.delete_elements([plantuml_manager.get_state_by_variable_name("Advertising")])
+    deleted_transitions = get_transition_codes(plantuml_manager.get_transitions())
+    assert deleted_transitions < original_transitions
+
+    plantuml_manager.undo()
+    check_registry(plantuml_manager)
+    assert get_transition_codes(plantuml_manager.get_transitions()) == original_transitions
+    assert len(plantuml_manager.registry.get_transitions_touching("Advertising")) == 6
+
+    plantuml_manager.redo()
+    check_registry(plantuml_manager)
+    assert get_transition_codes(plantuml_manager.get_transitions()) == deleted_transitions
+    assert plantuml_manager.registry.get_transitions_touching("Advertising") == []
+    plantuml_manager.cleanup()
+
+# --------------------------------------------------------------------------------------------------
+def test_get_transitions_touching():
+    plantuml_manager = create_manager()
+    registry = plantuml_manager.registry
+    # The self-transition of Advertising is returned once.
+    touching = registry.get_transitions_touching("Advertising")
+    assert len(touching) == len({transition.identifier for transition in touching}) == 6
+    assert get_transition_codes(touching) == get_transition_codes(
+        [transition for transition in plantuml_manager.transitions
+         if "Advertising" in (transition.source, transition.target)])
+    assert len(registry.get_transitions_from("Advertising")) == 2
+    assert len(registry.get_transitions_to("Advertising")) == 5
+    assert registry.get_transitions_touching("Unknown") == []
+    plantuml_manager.cleanup()
+
+# --------------------------------------------------------------------------------------------------
+def test_get_transitions():
+    # Without a source or target all transitions are returned, in order, not an empty list.
+    plantuml_manager = create_manager()
+    transitions = plantuml_manager.get_transitions()
+    assert transitions == plantuml_manager.transitions
+    assert len(transitions) == 9
+    transitions.clear()
+    assert len(plantuml_manager.transitions) == 9
+
+    assert len(plantuml_manager.get_transitions(source="ServerConnected")) == 2
+    assert len(plantuml_manager.get_transitions(target="ServerConnected")) == 2
+    assert len(plantuml_manager.get_transitions("Connecting", "Advertising")) == 1
+    assert plantuml_manager.get_transitions("Connecting", "CP_Whitelisted") == []
+    plantuml_manager.cleanup()
+
+# --------------------------------------------------------------------------------------------------
+if __name__ == "__main__":
+    test_load()
+    test_add()
+    test_delete_cascade()
+    test_rename()
+    test_undo_and_redo()
+    test_get_transitions_touching()
+    test_get_transitions()
+    print("OK")
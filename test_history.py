@@ -0,0 +1,124 @@
+from history import History
+
+import random
+
+# --------------------------------------------------------------------------------------------------
+# The history is compared with a plain list of the codes that were added.
+# --------------------------------------------------------------------------------------------------
+
+def create_codes(count: int, seed: int = 1) -> list[str]:
+    # Each code is an edit of the previous one: a line is changed, inserted or removed.
+    generator = random.Random(seed)
+    lines = ["@startuml", "START -> Idle", "Idle -> Running : $Start", "Running -> Idle : $Stop", "@enduml"]
+    codes = []
+    for number in range(count):
+        position = generator.randrange(1, len(lines))
+        action = generator.choice(["change", "insert", "remove"]) if len(lines) > 3 else "insert"
+        if action == "change":
+            lines[position] = f"State{number} -> Idle"
+        elif action == "insert":
+            lines.insert(position, f"Idle -> State{number} : $Message{number}")
+        else:
+            del lines[position]
+        codes.append("\n".join(lines))
+    return codes
+
+# --------------------------------------------------------------------------------------------------
+def check_sizes(history: History):
+    assert history.size == sum(entry.size for entry in history.entries)
+    assert history.entries[0].is_checkpoint
+
+# --------------------------------------------------------------------------------------------------
+def test_checkpoint_and_delta_reconstruction():
+    codes = create_codes(50)
+    history = History(checkpoint_interval=4)
+    for code in codes:
+        history.add(code)
+    assert any(entry.is_checkpoint for entry in list(history.entries)[1:])
+    assert any(not entry.is_checkpoint for entry in history.entries)
+    assert [history[index] for index in range(len(history))] == codes
+    assert history.get_current() == codes[-1]
+    check_sizes(history)
+
+# --------------------------------------------------------------------------------------------------
+def test_undo_and_redo():
+    codes = create_codes(10)
+    history = History(checkpoint_interval=3)
+    for code in codes:
+        history.add(code)
+    for index in reversed(range(len(codes) - 1)):
+        assert history.undo() == codes[index]
+    assert history.undo() is None
+    for index in range(1, len(codes)):
+        assert history.redo() == codes[index]
+    assert history.redo() is None
+
+# --------------------------------------------------------------------------------------------------
+def test_add_after_undo_truncates_redo():
+    codes = create_codes(12)
+    history = History(checkpoint_interval=4)
+    for code in codes[:10]:
+        history.add(code)
+    history.undo()
+    history.undo()
+    history.undo()
+    history.add(codes[10])
+    history.add(codes[11])
+    expected_codes = codes[:7] + codes[10:]
+    assert len(history) == len(expected_codes)
+    assert history.redo() is None
+    assert [history[index] for index in range(len(history))] == expected_codes
+    check_sizes(history)
+
+# --------------------------------------------------------------------------------------------------
+def test_eviction_by_entries():
+    codes = create_codes(40)
+    history = History(max_entries=10, checkpoint_interval=4)
+    for code in codes:
+        history.add(code)
+        check_sizes(history)
+    assert len(history) == 10
+    assert history.current_index == 9
+    assert [history[index] for index in range(len(history))] == codes[-10:]
+
+    # Undo stops at the oldest entry that is kept.
+    for _ in range(9):
+        assert history.undo() is not None
+    assert history.get_current() == codes[-10]
+    assert history.undo() is None
+
+# --------------------------------------------------------------------------------------------------
+def test_eviction_by_bytes():
+    codes = create_codes(60)
+    history = History(max_bytes=2000, checkpoint_interval=4)
+    for code in codes:
+        history.add(code)
+        check_sizes(history)
+        assert history.size <= history.max_bytes or len(history) == 1
+    assert len(history) < len(codes)
+    assert [history[index] for index in range(len(history))] == codes[-len(history):]
+
+# --------------------------------------------------------------------------------------------------
+def test_eviction_after_undo():
+    codes = create_codes(20)
+    history = History(max_entries=8, checkpoint_interval=3)
+    for code in codes[:8]:
+        history.add(code)
+    for _ in range(4):
+        history.undo()
+    for code in codes[8:]:
+        history.add(code)
+    expected_codes = (codes[:4] + codes[8:])[-8:]
+    assert [history[index] for index in range(len(history))] == expected_codes
+    assert history.get_current() == codes[-1]
+    check_sizes(history)
+
+# --------------------------------------------------------------------------------------------------
+if __name__ == "__main__":
+    test_checkpoint_and_delta_reconstruction()
+    test_undo_and_redo()
+    test_add_after_undo_truncates_redo()
+    test_eviction_by_entries()
+    test_eviction_by_bytes()
+    test_eviction_after_undo()
+    print("OK")
@@ -0,0 +1,79 @@
+from element_registry import ElementRegistry
+from elements import MASK_CODE_MODULUS, MASK_CHANNEL_TOLERANCE, MASK_RESERVED_COLORS, MASK_RESERVED_IDENTIFIERS
+from elements import get_mask_color, get_mask_identifier
+from selection_index import get_code_lookup_table, get_mask_codes, NO_IDENTIFIER
+
+import numpy as np
+
+# --------------------------------------------------------------------------------------------------
+# The colours PlantUML uses when no colour is given: lines, the fill of the component, the text
+# (hidden in the mask, but anti-aliased edges may remain) and the background.
+# --------------------------------------------------------------------------------------------------
+
+PLANTUML_DEFAULT_COLORS = ["181818", "202020", "F1F1F1", "FEFECE", "FFFFFF", "A80036", "E2E2F0"]
+
+# --------------------------------------------------------------------------------------------------
+def get_rgb_color(mask_color: str) -> tuple[int, int, int]:
+    return tuple(int(mask_color[index:index + 2], 16) for index in (0, 2, 4))
+
+# --------------------------------------------------------------------------------------------------
+def get_allocatable_identifiers() -> list[int]:
+    registry = ElementRegistry()
+    identifiers = []
+    while registry.next_identifier < MASK_CODE_MODULUS:
+        identifiers.append(registry.allocate_identifier())
+    return [identifier for identifier in identifiers if identifier < MASK_CODE_MODULUS]
+
+# --------------------------------------------------------------------------------------------------
+def test_every_identifier_round_trips():
+    identifiers = get_allocatable_identifiers()
+    assert len(identifiers) == MASK_CODE_MODULUS - len(MASK_RESERVED_IDENTIFIERS)
+    mask_colors = [get_mask_color(identifier) for identifier in identifiers]
+    assert len(set(mask_colors)) == len(mask_colors)
+    for identifier, mask_color in zip(identifiers, mask_colors):
+        assert get_mask_identifier(get_rgb_color(mask_color)) == identifier
+
+# --------------------------------------------------------------------------------------------------
+def test_vectorised_decoding_matches():
+    identifiers = np.array(get_allocatable_identifiers())
+    rgb = np.array([get_rgb_color(get_mask_color(identifier)) for identifier in identifiers], dtype=np.uint8)
+    lookup_table = get_code_lookup_table(identifiers)
+    assert (lookup_table[get_mask_codes(rgb)] == identifiers).all()
+
+# --------------------------------------------------------------------------------------------------
+def test_tolerance():
+    # A value within the tolerance of a level still decodes, a value further off is a blended pixel.
+    for identifier in [1, 2, 100, 5000]:
+        red, green, blue = get_rgb_color(get_mask_color(identifier))
+        for offset in range(-MASK_CHANNEL_TOLERANCE, MASK_CHANNEL_TOLERANCE + 1):
+            assert get_mask_identifier((red, min(max(green + offset, 0), 255), blue)) == identifier
+    assert get_mask_identifier((0, 4, 0)) is None
+
+# --------------------------------------------------------------------------------------------------
+def test_default_colors_are_never_live():
+    reserved_colors = {"%02X%02X%02X" % rgb_color for rgb_color in MASK_RESERVED_COLORS}
+    assert reserved_colors <= set(PLANTUML_DEFAULT_COLORS)
+    allocatable_identifiers = set(get_allocatable_identifiers())
+    lookup_table = get_code_lookup_table(np.array(sorted(allocatable_identifiers)))
+    for default_color in PLANTUML_DEFAULT_COLORS:
+        rgb_color = get_rgb_color(default_color)
+        assert get_mask_identifier(rgb_color) not in allocatable_identifiers
+        code = get_mask_codes(np.array([rgb_color], dtype=np.uint8))
+        assert lookup_table[code][0] == NO_IDENTIFIER
+
+# --------------------------------------------------------------------------------------------------
+def test_allocation_skips_reserved_identifiers():
+    registry = ElementRegistry()
+    for reserved_identifier in sorted(MASK_RESERVED_IDENTIFIERS):
+        registry.next_identifier = reserved_identifier - 1
+        assert registry.allocate_identifier() == reserved_identifier - 1
+        assert registry.allocate_identifier() == reserved_identifier + 1
+
+# --------------------------------------------------------------------------------------------------
+if __name__ == "__main__":
+    test_every_identifier_round_trips()
+    test_vectorised_decoding_matches()
+    test_tolerance()
+    test_default_colors_are_never_live()
+    test_allocation_skips_reserved_identifiers()
+    print("OK")
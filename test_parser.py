@@ -0,0 +1,140 @@
+from benchmark import BenchmarkManager, StubRenderBackend, get_diagram_code
+from plantuml_manager import CodeType
+from plantuml_parser import PlantUMLParseError, parse_plantuml_code
+from plantuml_validator import has_errors, validate_plantuml_code
+
+import io
+
+# --------------------------------------------------------------------------------------------------
+# The transitions of diagrams/node.puml as the line by line parser of the original manager
+# generated them: "-->" is read as a transition to the right.
+# --------------------------------------------------------------------------------------------------
+
+NODE_TRANSITIONS_PLANTUML_CODE = [
+    "START -> Advertising",
+    "Advertising -> Advertising : $Timeout",
+    "Advertising -> CP_Whitelisted : $RTx_ConnectReq\\n$RTx_ConnectedInd",
+    "CP_Whitelisted -> Connecting : $Yes",
+    "CP_Whitelisted --up-> Advertising : $No",
+    "Connecting -> Advertising : $Timeout",
+    "Connecting -> ServerConnected : $RTx_ConnectedInd",
+    "ServerConnected -> Advertising : $RTx_DisconnectInd\\n$Timeout",
+    "ServerConnected -> ServerConnected : $RTx_ConnectedInd",
+]
+
+# --------------------------------------------------------------------------------------------------
+def read_diagram(file_name: str) -> str:
+    with open(f"diagrams/{file_name}", "r") as file:
+        return file.read()
+
+# --------------------------------------------------------------------------------------------------
+def get_round_trip_codes(plantuml_code: str) -> tuple[str, str]:
+    # The code generated after loading the code, and after loading that generated code again.
+    plantuml_manager = BenchmarkManager(StubRenderBackend())
+    try:
+        plantuml_manager.set_elements(plantuml_code)
+        generated_plantuml_code = plantuml_manager.get_plantuml_code(CodeType.STANDARD)
+        plantuml_manager.set_elements(generated_plantuml_code)
+        return generated_plantuml_code, plantuml_manager.get_plantuml_code(CodeType.STANDARD)
+    finally:
+        plantuml_manager.cleanup()
+
+# --------------------------------------------------------------------------------------------------
+def test_node_diagram():
+    document = parse_plantuml_code(read_diagram("node.puml"))
+    assert document.component_name == "Component Name"
+    assert [interface.name for interface in document.interfaces] == ["RTx"]
+    assert [message.name for message in document.messages] == ["ConnectReq", "ConnectedInd", "DisconnectInd"]
+    assert [state.name for state in document.states] == ["Advertising", "Connecting", "ServerConnected"]
+    assert document.states[2].display_name == "Server\\nConnected"
+    assert [choice_point.name for choice_point in document.choice_points] == ["Whitelisted"]
+    assert [transition.get_plantuml_code() for transition in document.transitions] == NODE_TRANSITIONS_PLANTUML_CODE
+
+# --------------------------------------------------------------------------------------------------
+def test_multi_message_transitions():
+    document = parse_plantuml_code(read_diagram("node.puml"))
+    transition = document.transitions[2]
+    assert transition.messages == ("$RTx_ConnectReq", "$RTx_ConnectedInd")
+    assert document.get_line_number(transition) == 43
+    assert document.get_line(transition) == "Advertising --> CP_Whitelisted : $RTx_ConnectReq\\n$RTx_ConnectedInd"
+    assert document.transitions[7].messages == ("$RTx_DisconnectInd", "$Timeout")
+
+# --------------------------------------------------------------------------------------------------
+def test_node_round_trip():
+    generated_plantuml_code, regenerated_plantuml_code = get_round_trip_codes(read_diagram("node.puml"))
+    assert regenerated_plantuml_code == generated_plantuml_code
+    for transition_plantuml_code in NODE_TRANSITIONS_PLANTUML_CODE:
+        assert f"\n{transition_plantuml_code}\n" in generated_plantuml_code
+    # The default interfaces and the start state are not written to the element sections.
+    assert generated_plantuml_code.count("!$Timer = Timer") == 1
+    assert 'as "START"' not in generated_plantuml_code
+
+# --------------------------------------------------------------------------------------------------
+def test_generated_round_trip():
+    for size, seed in [(1, 1), (10, 2), (50, 3)]:
+        plantuml_code = get_diagram_code(size, seed)
+        document = parse_plantuml_code(plantuml_code)
+        assert len(document.states) == size
+        generated_plantuml_code, regenerated_plantuml_code = get_round_trip_codes(plantuml_code)
+        assert regenerated_plantuml_code == generated_plantuml_code
+        assert len(parse_plantuml_code(generated_plantuml_code).transitions) == len(document.transitions)
+
+# --------------------------------------------------------------------------------------------------
+def test_empty_diagram():
+    plantuml_code = read_diagram("empty.puml")
+    document = parse_plantuml_code(plantuml_code)
+    assert document.component_name == "Component Name"
+    assert not (document.interfaces or document.messages or document.states or
+                document.choice_points or document.transitions)
+    generated_plantuml_code, regenerated_plantuml_code = get_round_trip_codes(plantuml_code)
+    assert regenerated_plantuml_code == generated_plantuml_code
+    assert parse_plantuml_code("").line_count == 1
+
+# --------------------------------------------------------------------------------------------------
+def test_crlf_input():
+    plantuml_code = read_diagram("node.puml")
+    expected_plantuml_code = [transition.get_plantuml_code()
+                              for transition in parse_plantuml_code(plantuml_code).transitions]
+    crlf_plantuml_code = plantuml_code.replace("\n", "\r\n")
+    for source in [crlf_plantuml_code, io.StringIO(crlf_plantuml_code, newline=""), crlf_plantuml_code.splitlines(True)]:
+        document = parse_plantuml_code(source)
+        assert [transition.get_plantuml_code() for transition in document.transitions] == expected_plantuml_code
+        assert document.states[2].display_name == "Server\\nConnected"
+        assert document.get_line_number(document.transitions[2]) == 43
+
+# --------------------------------------------------------------------------------------------------
+def test_error_line_number():
+    plantuml_code = read_diagram("node.puml").replace("state Connecting\n", "state Connecting\nnot a state\n")
+    try:
+        parse_plantuml_code(plantuml_code)
+        assert False, "the invalid line was not reported"
+    except PlantUMLParseError as e:
+        assert e.line_number == 35
+        assert e.line == "not a state"
+        assert str(e) == "line 35: invalid state"
+
+    _, issues = validate_plantuml_code(plantuml_code)
+    assert [issue.line_number for issue in issues] == [35]
+
+# --------------------------------------------------------------------------------------------------
+def test_missing_section():
+    plantuml_code = read_diagram("node.puml").replace("'== Choice-points ==\n", "")
+    document = parse_plantuml_code(plantuml_code)
+    assert document.choice_points == []
+    assert "Choice-points" not in document.section_line_numbers
+
+    _, issues = validate_plantuml_code(plantuml_code)
+    assert has_errors(issues)
+    assert "ERROR: missing section 'Choice-points'" in [str(issue) for issue in issues]
+
+# --------------------------------------------------------------------------------------------------
+if __name__ == "__main__":
+    test_node_diagram()
+    test_multi_message_transitions()
+    test_node_round_trip()
+    test_generated_round_trip()
+    test_empty_diagram()
+    test_crlf_input()
+    test_error_line_number()
+    test_missing_section()
+    print("OK")
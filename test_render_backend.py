@@ -0,0 +1,107 @@
+from render_backend import CircuitBreaker, HttpRenderBackend, PipeRenderBackend, PipeWorker, PIPE_DELIMITER
+from render_backend import RenderError, RenderCircuitOpenError, RenderTimeoutError
+
+import sys
+import time
+
+# --------------------------------------------------------------------------------------------------
+# A backend whose requests answer with the given outcomes instead of asking a PlantUML server.
+# --------------------------------------------------------------------------------------------------
+
+class FakeHttpRenderBackend(HttpRenderBackend):
+
+    def __init__(self, outcomes: list):
+        super().__init__("http://test-circuit-breaker:1/png")
+        self.circuit_breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+        self.outcomes = outcomes
+
+    def request(self, code: str) -> bytes:
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+# --------------------------------------------------------------------------------------------------
+# A pipe worker running a Python script instead of PlantUML. It answers every line with an image,
+# except the lines that contain "hang".
+# --------------------------------------------------------------------------------------------------
+
+FAKE_IMAGE = b"\x89PNG fake image IEND\xaeB`\x82"
+
+FAKE_PIPE_SCRIPT = f"""
+import sys
+for line in sys.stdin:
+    if "hang" not in line:
+        sys.stdout.buffer.write({FAKE_IMAGE!r} + b"\\n" + {PIPE_DELIMITER!r} + b"\\n")
+        sys.stdout.flush()
+"""
+
+class FakePipeWorker(PipeWorker):
+
+    @staticmethod
+    def get_command(jar_path: str, image_format: str) -> list[str]:
+        return [sys.executable, "-c", FAKE_PIPE_SCRIPT]
+
+class FakePipeRenderBackend(PipeRenderBackend):
+
+    def create_worker(self) -> PipeWorker:
+        return FakePipeWorker(self.jar_path, self.image_format)
+
+# --------------------------------------------------------------------------------------------------
+def test_failed_trial_reopens_circuit():
+    # Half-open -> HTTP 500 -> open again -> trial succeeds -> closed.
+    backend = FakeHttpRenderBackend([RenderError("HTTP 500: Internal Server Error"), b"image"])
+    backend.circuit_breaker.record_failure()
+    assert backend.circuit_breaker.is_open()
+
+    try:
+        backend.render("@startuml\n@enduml")
+        assert False, "the HTTP 500 was not raised"
+    except RenderError as e:
+        assert not isinstance(e, RenderCircuitOpenError)
+    assert backend.circuit_breaker.is_open()
+    assert not backend.circuit_breaker.trial_in_progress
+
+    assert backend.render("@startuml\n@enduml") == b"image"
+    assert not backend.circuit_breaker.is_open()
+
+# --------------------------------------------------------------------------------------------------
+def test_open_circuit_fails_right_away():
+    backend = FakeHttpRenderBackend([b"image"])
+    backend.circuit_breaker.reset_timeout = 60.0
+    backend.circuit_breaker.record_failure()
+    try:
+        backend.render("@startuml\n@enduml")
+        assert False, "the open circuit let a request through"
+    except RenderCircuitOpenError:
+        pass
+    assert backend.outcomes == [b"image"]
+
+# --------------------------------------------------------------------------------------------------
+def test_hanging_pipe_worker_times_out():
+    backend = FakePipeRenderBackend(worker_count=1, deadline=0.5)
+    try:
+        assert backend.render("@startuml") == FAKE_IMAGE
+        hanging_worker = backend.workers[0]
+
+        start_time = time.monotonic()
+        try:
+            backend.render("@startuml hang")
+            assert False, "the hanging render did not time out"
+        except RenderTimeoutError:
+            pass
+        assert time.monotonic() - start_time < 5
+        assert not hanging_worker.is_alive()
+
+        # The worker was replaced, so the next render works again.
+        assert backend.workers[0] is not hanging_worker
+        assert backend.render("@startuml") == FAKE_IMAGE
+    finally:
+        backend.close()
+
+# --------------------------------------------------------------------------------------------------
+if __name__ == "__main__":
+    test_failed_trial_reopens_circuit()
+    test_open_circuit_fails_right_away()
+    test_hanging_pipe_worker_times_out()
+    print("OK")
@@ -0,0 +1,238 @@
+# --------------------------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------------------------
+from collections import deque
+import json
+import os
+import threading
+import time
+
+# --------------------------------------------------------------------------------------------------
+# Constants
+# --------------------------------------------------------------------------------------------------
+
+# Setting this environment variable to a file name enables tracing from the start.
+TRACE_ENVIRONMENT_VARIABLE = "STATE_DIAGRAM_TRACE"
+
+# The oldest events are dropped beyond this number, so that tracing can be left on.
+TRACE_MAX_EVENTS = 100000
+
+# Histogram buckets are powers of two microseconds; the last bucket holds everything above.
+HISTOGRAM_BUCKET_COUNT = 32
+
+# --------------------------------------------------------------------------------------------------
+# Histogram
+# --------------------------------------------------------------------------------------------------
+
+class Histogram:
+
+    # ----------------------------------------------------------------------------------------------
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.minimum = None
+        self.maximum = None
+        self.buckets = [0] * HISTOGRAM_BUCKET_COUNT
+
+    # ----------------------------------------------------------------------------------------------
+    def add(self, microseconds: int):
+        self.count += 1
+        self.total += microseconds
+        self.minimum = microseconds if self.minimum is None else min(self.minimum, microseconds)
+        self.maximum = microseconds if self.maximum is None else max(self.maximum, microseconds)
+        self.buckets[min(microseconds.bit_length(), HISTOGRAM_BUCKET_COUNT - 1)] += 1
+
+    # ----------------------------------------------------------------------------------------------
+    def get_percentile(self, percentile: float) -> int:
+        # The upper bound of the bucket in which the percentile falls.
+        rank = percentile / 100 * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.buckets):
+            cumulative += bucket_count
+            if cumulative >= rank and bucket_count:
+                return min(1 << index, self.maximum)
+        return self.maximum or 0
+
+    # ----------------------------------------------------------------------------------------------
+    def get_statistics(self) -> dict:
+        return {
+            "count": self.count,
+            "total_ms": self.total / 1000,
+            "mean_ms": self.total / self.count / 1000 if self.count else 0.0,
+            "min_ms": (self.minimum or 0) / 1000,
+            "max_ms": (self.maximum or 0) / 1000,
+            "p50_ms": self.get_percentile(50) / 1000,
+            "p95_ms": self.get_percentile(95) / 1000,
+            "buckets_us": {1 << index if index else 0: bucket_count
+                           for index, bucket_count in enumerate(self.buckets) if bucket_count},
+        }
+
+# --------------------------------------------------------------------------------------------------
+# Span
+# --------------------------------------------------------------------------------------------------
+
+class Span:
+
+    # ----------------------------------------------------------------------------------------------
+    def __init__(self, tracer, name: str, category: str, arguments: dict):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.arguments = arguments
+        self.start = 0
+
+    # ----------------------------------------------------------------------------------------------
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    # ----------------------------------------------------------------------------------------------
+    def __exit__(self, exception_type, exception, traceback):
+        self.tracer.add_span(self, time.perf_counter_ns())
+        return False
+
+# --------------------------------------------------------------------------------------------------
+# NullSpan
+# --------------------------------------------------------------------------------------------------
+
+class NullSpan:
+
+    # ----------------------------------------------------------------------------------------------
+    # Returned when tracing is off, so that a disabled span costs no more than a check and a call.
+    # ----------------------------------------------------------------------------------------------
+
+    def __enter__(self):
+        return self
+
+    # ----------------------------------------------------------------------------------------------
+    def __exit__(self, exception_type, exception, traceback):
+        return False
+
+NULL_SPAN = NullSpan()
+
+# --------------------------------------------------------------------------------------------------
+# Tracer
+# --------------------------------------------------------------------------------------------------
+
+class Tracer:
+
+    # ----------------------------------------------------------------------------------------------
+    # Collects spans as Chrome trace events, a histogram of the durations per span name, and
+    # counters. Spans may be recorded from any thread, e.g. from the render workers.
+    # ----------------------------------------------------------------------------------------------
+
+    def __init__(self, max_events: int = TRACE_MAX_EVENTS):
+        self.enabled = False
+        self.events = deque(maxlen=max_events)
+        self.histograms = {}
+        self.counters = {}
+        self.thread_names = {}
+        self.origin = time.perf_counter_ns()
+        self.lock = threading.Lock()
+
+    # ----------------------------------------------------------------------------------------------
+    def enable(self):
+        self.enabled = True
+
+    # ----------------------------------------------------------------------------------------------
+    def disable(self):
+        self.enabled = False
+
+    # ----------------------------------------------------------------------------------------------
+    def clear(self):
+        with self.lock:
+            self.events.clear()
+            self.histograms.clear()
+            self.counters.clear()
+            self.thread_names.clear()
+            self.origin = time.perf_counter_ns()
+
+    # ----------------------------------------------------------------------------------------------
+    def span(self, name: str, category: str = "", **arguments) -> Span | NullSpan:
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, category, arguments)
+
+    # ----------------------------------------------------------------------------------------------
+    def count(self, name: str, value: int = 1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    # ----------------------------------------------------------------------------------------------
+    def add_span(self, span: Span, end: int):
+        duration = (end - span.start) // 1000
+        thread = threading.current_thread()
+        event = {
+            "name": span.name,
+            "cat": span.category,
+            "ph": "X",
+            "ts": (span.start - self.origin) / 1000,
+            "dur": duration,
+            "pid": os.getpid(),
+            "tid": thread.ident,
+        }
+        if span.arguments:
+            event["args"] = span.arguments
+        with self.lock:
+            self.events.append(event)
+            self.thread_names.setdefault(thread.ident, thread.name)
+            histogram = self.histograms.get(span.name)
+            if histogram is None:
+                histogram = self.histograms[span.name] = Histogram()
+            histogram.add(duration)
+
+    # ----------------------------------------------------------------------------------------------
+    def get_statistics(self) -> dict:
+        with self.lock:
+            return {
+                "counters": dict(self.counters),
+                "histograms": {name: histogram.get_statistics() for name, histogram in self.histograms.items()},
+            }
+
+    # ----------------------------------------------------------------------------------------------
+    def print_statistics(self):
+        statistics = self.get_statistics()
+        print(f"{'span':<32}{'count':>8}{'total ms':>12}{'mean ms':>10}{'p95 ms':>10}{'max ms':>10}")
+        for name, histogram in sorted(statistics["histograms"].items(), key=lambda item: -item[1]["total_ms"]):
+            print(f"{name:<32}{histogram['count']:>8}{histogram['total_ms']:>12.2f}{histogram['mean_ms']:>10.2f}"
+                  f"{histogram['p95_ms']:>10.2f}{histogram['max_ms']:>10.2f}")
+        for name, value in sorted(statistics["counters"].items()):
+            print(f"{name:<32}{value:>8}")
+
+    # ----------------------------------------------------------------------------------------------
+    def export_chrome_trace(self, path: str):
+        # The JSON object format of the Trace Event Format, as loaded by chrome://tracing and Perfetto.
+        with self.lock:
+            events = list(self.events)
+            thread_names = dict(self.thread_names)
+            counters = dict(self.counters)
+        process_id = os.getpid()
+        events += [{"name": "thread_name", "ph": "M", "pid": process_id, "tid": thread_id, "args": {"name": name}}
+                   for thread_id, name in thread_names.items()]
+        if counters:
+            timestamp = (time.perf_counter_ns() - self.origin) / 1000
+            events.append({"name": "counters", "ph": "C", "ts": timestamp, "pid": process_id, "args": counters})
+        with open(path, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms",
+                       "otherData": self.get_statistics()}, file)
+
+# --------------------------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------------------------
+
+tracer = Tracer()
+if os.environ.get(TRACE_ENVIRONMENT_VARIABLE):
+    tracer.enable()
+
+# --------------------------------------------------------------------------------------------------
+def span(name: str, category: str = "", **arguments) -> Span | NullSpan:
+    if not tracer.enabled:
+        return NULL_SPAN
+    return Span(tracer, name, category, arguments)
+
+# --------------------------------------------------------------------------------------------------
+def count(name: str, value: int = 1):
+    if tracer.enabled:
+        tracer.count(name, value)
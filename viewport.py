@@ -0,0 +1,267 @@
+# --------------------------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------------------------
+from tracing import span, count
+
+from collections import OrderedDict
+from PIL import Image, ImageTk
+import math
+import tkinter as tk
+
+# --------------------------------------------------------------------------------------------------
+# Constants
+# --------------------------------------------------------------------------------------------------
+
+# The viewport is covered by square tiles; only the visible ones are converted to Tk images.
+TILE_SIZE = 256
+
+# The converted tiles of about this many viewports are kept, so that panning back is instant.
+TILE_CACHE_VIEWPORTS = 3
+
+# Levels are halved until they fit in this size; smaller zooms scale the smallest level.
+PYRAMID_MIN_SIZE = 128
+
+ZOOM_MIN = 0.05
+ZOOM_MAX = 8.0
+ZOOM_STEP = 1.25
+
+# At least this many pixels of the image stay in view when panning.
+PAN_MARGIN = 64
+
+TILE_TAG = "viewport_tile"
+
+# --------------------------------------------------------------------------------------------------
+# ImagePyramid
+# --------------------------------------------------------------------------------------------------
+
+class ImagePyramid:
+
+    # ----------------------------------------------------------------------------------------------
+    # Level 0 is the rendered image and every next level has half its width and height. A level is
+    # made from the previous one when it is first needed, so each level is built once per render.
+    # ----------------------------------------------------------------------------------------------
+
+    def __init__(self, image: Image.Image):
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        self.levels = [image]
+        self.size = image.size
+
+    # ----------------------------------------------------------------------------------------------
+    def get_level_count(self) -> int:
+        largest_side = max(self.size)
+        if largest_side <= PYRAMID_MIN_SIZE:
+            return 1
+        return math.ceil(math.log2(largest_side / PYRAMID_MIN_SIZE)) + 1
+
+    # ----------------------------------------------------------------------------------------------
+    def get_level(self, level: int) -> Image.Image:
+        while len(self.levels) <= level:
+            with span("viewport.build_level", "display", level=len(self.levels)):
+                self.levels.append(self.levels[-1].reduce(2))
+        return self.levels[level]
+
+    # ----------------------------------------------------------------------------------------------
+    def get_level_for_zoom(self, zoom: float) -> int:
+        # The smallest level that still has at least the resolution of the zoom, so that tiles are
+        # only ever scaled down from it, by less than a factor 2.
+        if zoom >= 1:
+            return 0
+        return min(int(math.log2(1 / zoom)), self.get_level_count() - 1)
+
+    # ----------------------------------------------------------------------------------------------
+    def get_zoomed_size(self, zoom: float) -> tuple[int, int]:
+        return max(round(self.size[0] * zoom), 1), max(round(self.size[1] * zoom), 1)
+
+    # ----------------------------------------------------------------------------------------------
+    def get_tile(self, zoom: float, column: int, row: int, tile_size: int = TILE_SIZE) -> Image.Image | None:
+        # The tile at (column, row) of the image scaled by zoom, or None when it is outside the image.
+        zoomed_width, zoomed_height = self.get_zoomed_size(zoom)
+        left, top = column * tile_size, row * tile_size
+        if column < 0 or row < 0 or left >= zoomed_width or top >= zoomed_height:
+            return None
+        right, bottom = min(left + tile_size, zoomed_width), min(top + tile_size, zoomed_height)
+
+        level = self.get_level_for_zoom(zoom)
+        level_image = self.get_level(level)
+        scale_x = level_image.width / zoomed_width
+        scale_y = level_image.height / zoomed_height
+        box = (left * scale_x, top * scale_y, right * scale_x, bottom * scale_y)
+        resample = Image.Resampling.BILINEAR if zoom < 1 else Image.Resampling.NEAREST
+        return level_image.resize((right - left, bottom - top), resample, box=box)
+
+# --------------------------------------------------------------------------------------------------
+# TiledViewport
+# --------------------------------------------------------------------------------------------------
+
+class TiledViewport:
+
+    # ----------------------------------------------------------------------------------------------
+    # Shows an image on a canvas at a zoom and scroll offset. The offset is the position of the
+    # top-left corner of the canvas in the zoomed image. Only the tiles in view are converted to
+    # Tk images, and the number of converted tiles kept is bounded by the size of the viewport, so
+    # the memory of the Tk images does not grow with the size of the diagram.
+    # ----------------------------------------------------------------------------------------------
+
+    def __init__(self, canvas: tk.Canvas, tile_size: int = TILE_SIZE):
+        self.canvas = canvas
+        self.tile_size = tile_size
+        self.pyramid = None
+        self.zoom = 1.0
+        self.offset_x = 0
+        self.offset_y = 0
+        self.tile_cache = OrderedDict()
+        self.tile_items = {}
+        self.drag_start = None
+
+        self.canvas.bind("<Configure>", lambda event: self.update())
+        self.canvas.bind("<ButtonPress-1>", self.on_drag_start)
+        self.canvas.bind("<B1-Motion>", self.on_drag)
+        self.canvas.bind("<MouseWheel>", self.on_mouse_wheel)
+        self.canvas.bind("<Button-4>", lambda event: self.zoom_at(ZOOM_STEP, event.x, event.y))
+        self.canvas.bind("<Button-5>", lambda event: self.zoom_at(1 / ZOOM_STEP, event.x, event.y))
+
+    # ----------------------------------------------------------------------------------------------
+    def set_image(self, image: Image.Image | None):
+        # A new render keeps the zoom and scroll position; only the tiles are made again.
+        with span("viewport.set_image", "display"):
+            self.pyramid = ImagePyramid(image) if image is not None else None
+            self.clear_tiles()
+            self.update()
+
+    # ----------------------------------------------------------------------------------------------
+    def clear_tiles(self):
+        self.remove_tile_items()
+        self.tile_cache.clear()
+
+    # ----------------------------------------------------------------------------------------------
+    def remove_tile_items(self):
+        # The converted tiles stay in the cache; only the canvas items are removed.
+        self.canvas.delete(TILE_TAG)
+        self.tile_items.clear()
+
+    # ----------------------------------------------------------------------------------------------
+    def get_viewport_size(self) -> tuple[int, int]:
+        # Before the canvas is mapped its width and height are 1, so the requested size is used.
+        width = self.canvas.winfo_width()
+        height = self.canvas.winfo_height()
+        if width <= 1 or height <= 1:
+            width, height = int(self.canvas.cget("width")), int(self.canvas.cget("height"))
+        return width, height
+
+    # ----------------------------------------------------------------------------------------------
+    def get_visible_tiles(self) -> list[tuple[int, int]]:
+        width, height = self.get_viewport_size()
+        first_column, first_row = self.offset_x // self.tile_size, self.offset_y // self.tile_size
+        last_column = (self.offset_x + width - 1) // self.tile_size
+        last_row = (self.offset_y + height - 1) // self.tile_size
+        zoomed_width, zoomed_height = self.pyramid.get_zoomed_size(self.zoom)
+        return [(column, row)
+                for row in range(max(first_row, 0), min(last_row, (zoomed_height - 1) // self.tile_size) + 1)
+                for column in range(max(first_column, 0), min(last_column, (zoomed_width - 1) // self.tile_size) + 1)]
+
+    # ----------------------------------------------------------------------------------------------
+    def get_tile_image(self, column: int, row: int) -> ImageTk.PhotoImage:
+        key = (self.zoom, column, row)
+        tile_image = self.tile_cache.get(key)
+        if tile_image is not None:
+            self.tile_cache.move_to_end(key)
+            count("viewport.tile_cache_hits")
+            return tile_image
+        with span("viewport.tile_convert", "display"):
+            tile_image = ImageTk.PhotoImage(self.pyramid.get_tile(self.zoom, column, row, self.tile_size))
+        self.tile_cache[key] = tile_image
+        return tile_image
+
+    # ----------------------------------------------------------------------------------------------
+    def update(self):
+        if self.pyramid is None:
+            self.remove_tile_items()
+            return
+        with span("viewport.update", "display"):
+            self.clamp_offset()
+            visible_tiles = self.get_visible_tiles()
+            for tile in list(self.tile_items):
+                if tile not in visible_tiles:
+                    self.canvas.delete(self.tile_items.pop(tile))
+            for column, row in visible_tiles:
+                x = column * self.tile_size - self.offset_x
+                y = row * self.tile_size - self.offset_y
+                item = self.tile_items.get((column, row))
+                if item is None:
+                    self.tile_items[(column, row)] = self.canvas.create_image(
+                        x, y, anchor=tk.NW, image=self.get_tile_image(column, row), tags=TILE_TAG)
+                else:
+                    # A tile in view is the most recently used, so trimming never drops its image.
+                    self.tile_cache.move_to_end((self.zoom, column, row))
+                    self.canvas.coords(item, x, y)
+            self.trim_tile_cache(len(visible_tiles))
+
+    # ----------------------------------------------------------------------------------------------
+    def trim_tile_cache(self, visible_tile_count: int):
+        # The least recently shown tiles are dropped; the tiles in view were just used, so they stay
+        # and Tk never draws a tile whose image is gone.
+        while len(self.tile_cache) > max(visible_tile_count * TILE_CACHE_VIEWPORTS, 1):
+            self.tile_cache.popitem(last=False)
+
+    # ----------------------------------------------------------------------------------------------
+    def clamp_offset(self):
+        width, height = self.get_viewport_size()
+        zoomed_width, zoomed_height = self.pyramid.get_zoomed_size(self.zoom)
+        self.offset_x = min(max(self.offset_x, PAN_MARGIN - width), zoomed_width - PAN_MARGIN)
+        self.offset_y = min(max(self.offset_y, PAN_MARGIN - height), zoomed_height - PAN_MARGIN)
+
+    # ----------------------------------------------------------------------------------------------
+    def set_zoom(self, zoom: float, x: int = 0, y: int = 0):
+        # The image point under the canvas point (x, y) stays in place.
+        zoom = min(max(zoom, ZOOM_MIN), ZOOM_MAX)
+        if self.pyramid is None or zoom == self.zoom:
+            self.zoom = zoom
+            return
+        image_x, image_y = self.canvas_to_image(x, y)
+        self.zoom = zoom
+        self.offset_x = round(image_x * zoom) - x
+        self.offset_y = round(image_y * zoom) - y
+        self.remove_tile_items()
+        self.update()
+
+    # ----------------------------------------------------------------------------------------------
+    def zoom_at(self, factor: float, x: int, y: int):
+        self.set_zoom(self.zoom * factor, x, y)
+
+    # ----------------------------------------------------------------------------------------------
+    def zoom_to_fit(self):
+        if self.pyramid is None:
+            return
+        width, height = self.get_viewport_size()
+        self.zoom = min(max(min(width / self.pyramid.size[0], height / self.pyramid.size[1]), ZOOM_MIN), ZOOM_MAX)
+        self.offset_x = self.offset_y = 0
+        self.remove_tile_items()
+        self.update()
+
+    # ----------------------------------------------------------------------------------------------
+    def pan(self, dx: int, dy: int):
+        self.offset_x += dx
+        self.offset_y += dy
+        self.update()
+
+    # ----------------------------------------------------------------------------------------------
+    def canvas_to_image(self, x: int, y: int) -> tuple[int, int]:
+        # Canvas coordinates to coordinates of the rendered image, e.g. for hit-testing.
+        return int((x + self.offset_x) / self.zoom), int((y + self.offset_y) / self.zoom)
+
+    # ----------------------------------------------------------------------------------------------
+    def on_drag_start(self, event):
+        self.drag_start = (event.x, event.y)
+
+    # ----------------------------------------------------------------------------------------------
+    def on_drag(self, event):
+        if self.drag_start is None:
+            return
+        start_x, start_y = self.drag_start
+        self.drag_start = (event.x, event.y)
+        self.pan(start_x - event.x, start_y - event.y)
+
+    # ----------------------------------------------------------------------------------------------
+    def on_mouse_wheel(self, event):
+        self.zoom_at(ZOOM_STEP if event.delta > 0 else 1 / ZOOM_STEP, event.x, event.y)
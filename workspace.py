@@ -0,0 +1,129 @@
+# --------------------------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------------------------
+from plantuml_manager import PlantUMLManager, PLANTUML_PORT, RENDER_CONCURRENCY
+from render_backend import RenderBackend, RenderBackendType, create_render_backend, get_supported_image_format
+from render_cache import RenderCache
+from render_scheduler import RenderScheduler
+
+from concurrent.futures import ThreadPoolExecutor
+
+# --------------------------------------------------------------------------------------------------
+# Constants
+# --------------------------------------------------------------------------------------------------
+
+# The cache is shared by all components, so it holds more entries than the cache of one manager.
+WORKSPACE_RENDER_CACHE_SIZE = 256
+
+# --------------------------------------------------------------------------------------------------
+# Workspace
+# --------------------------------------------------------------------------------------------------
+
+class Workspace:
+
+    # ----------------------------------------------------------------------------------------------
+    # Holds the models of many components at once. There is one PlantUML server (or pool of pipe
+    # workers), one render cache, one render executor and, with background rendering, one render
+    # scheduler, which are lent to the PlantUMLManager of every component. Only the shown
+    # component renders; the others defer their renders until they are shown.
+    # ----------------------------------------------------------------------------------------------
+
+    def __init__(self,
+                 render_backend_type: RenderBackendType = RenderBackendType.HTTP,
+                 render_concurrency: int = RENDER_CONCURRENCY,
+                 render_cache_directory: str | None = None,
+                 background_rendering: bool = False,
+                 image_format: str = "png",
+                 port: int = PLANTUML_PORT,
+                 **manager_arguments):
+        self.image_format = get_supported_image_format(image_format)
+        self.port = port
+        self.plantuml_server = None
+
+        self.render_backend = self.create_render_backend(render_backend_type, render_concurrency)
+        self.render_cache = RenderCache(WORKSPACE_RENDER_CACHE_SIZE, render_cache_directory)
+        self.render_executor = ThreadPoolExecutor(max_workers=render_concurrency)
+        self.render_scheduler = RenderScheduler() if background_rendering else None
+        self.manager_arguments = manager_arguments
+
+        self.managers = {}
+        self.shown_name = None
+
+    # ----------------------------------------------------------------------------------------------
+    def create_render_backend(self,
+                              render_backend_type: RenderBackendType,
+                              render_concurrency: int) -> RenderBackend:
+        render_backend, self.plantuml_server = create_render_backend(render_backend_type, render_concurrency,
+                                                                     self.image_format, self.port)
+        return render_backend
+
+    # ----------------------------------------------------------------------------------------------
+    def open_component(self, name: str, plantuml_code: str | None = None) -> PlantUMLManager | None:
+        # The component is opened hidden, so loading it costs no render until it is shown.
+        if name in self.managers:
+            print(f"WARNING: component '{name}' is already open")
+            return self.managers[name]
+        plantuml_manager = PlantUMLManager(render_backend=self.render_backend,
+                                           render_cache=self.render_cache,
+                                           render_executor=self.render_executor,
+                                           render_scheduler=self.render_scheduler,
+                                           visible=False,
+                                           **self.manager_arguments)
+        if plantuml_code is not None and not plantuml_manager.load_diagram(plantuml_code):
+            plantuml_manager.cleanup()
+            return None
+        self.managers[name] = plantuml_manager
+        return plantuml_manager
+
+    # ----------------------------------------------------------------------------------------------
+    def get_component(self, name: str) -> PlantUMLManager | None:
+        return self.managers.get(name)
+
+    # ----------------------------------------------------------------------------------------------
+    def get_component_names(self) -> list[str]:
+        return list(self.managers)
+
+    # ----------------------------------------------------------------------------------------------
+    def get_shown_component(self) -> PlantUMLManager | None:
+        return self.managers.get(self.shown_name)
+
+    # ----------------------------------------------------------------------------------------------
+    def show_component(self, name: str) -> PlantUMLManager | None:
+        # The previously shown component is hidden; the newly shown one renders what it deferred.
+        plantuml_manager = self.managers.get(name)
+        if plantuml_manager is None:
+            print(f"ERROR: component '{name}' is not open")
+            return None
+        shown_manager = self.get_shown_component()
+        if shown_manager is not None and shown_manager is not plantuml_manager:
+            shown_manager.set_visible(False)
+        self.shown_name = name
+        plantuml_manager.set_visible(True)
+        return plantuml_manager
+
+    # ----------------------------------------------------------------------------------------------
+    def close_component(self, name: str):
+        plantuml_manager = self.managers.pop(name, None)
+        if plantuml_manager is None:
+            return
+        if self.shown_name == name:
+            self.shown_name = None
+        plantuml_manager.cleanup()
+
+    # ----------------------------------------------------------------------------------------------
+    def process_completions(self) -> int:
+        # Delivers the finished renders of all components; to be called on the UI thread.
+        if self.render_scheduler is None:
+            return 0
+        return self.render_scheduler.process_completions()
+
+    # ----------------------------------------------------------------------------------------------
+    def cleanup(self):
+        for name in list(self.managers):
+            self.close_component(name)
+        if self.render_scheduler is not None:
+            self.render_scheduler.close()
+        self.render_executor.shutdown(wait=False)
+        self.render_backend.close()
+        if self.plantuml_server is not None:
+            self.plantuml_server.stop()